@@ -0,0 +1,72 @@
+from typing import Iterable, List, Optional, Tuple
+
+from bson import ObjectId
+
+
+# Per-item result bookkeeping for the storage backends' batch methods
+# (create_notes, update_notes, delete_notes in app/storage.py). Each operation
+# sent to bulk_write is mapped back to the request item it came from via op_items.
+
+def new_results(count: int) -> List[dict]:
+    return [{"index": index, "id": None, "status": "pending", "error": None} for index in range(count)]
+
+def fail(results: List[dict], index: int, status: str, error: Optional[str] = None):
+    results[index]["status"] = status
+    results[index]["error"] = error
+
+def skip_remaining(results: List[dict], after_index: int):
+    # Ordered batches stop at the first failure; later items are never attempted
+    for result in results[after_index + 1:]:
+        if result["status"] == "pending":
+            result["status"] = "skipped"
+
+def apply_write_errors(results: List[dict], op_items: List[int], details: dict, ordered: bool, ok_status: str):
+    failed_ops = set()
+    for error in details.get("writeErrors", []):
+        op_index = error["index"]
+        failed_ops.add(op_index)
+        fail(results, op_items[op_index], "error", error.get("errmsg"))
+    first_failure = min(failed_ops) if failed_ops else None
+    for op_index, item_index in enumerate(op_items):
+        if op_index in failed_ops:
+            continue
+        if ordered and first_failure is not None and op_index > first_failure:
+            results[item_index]["status"] = "skipped"
+        else:
+            results[item_index]["status"] = ok_status
+    if ordered and first_failure is not None:
+        skip_remaining(results, op_items[first_failure])
+
+def mark_written(results: List[dict], op_items: List[int], ok_status: str):
+    for item_index in op_items:
+        results[item_index]["status"] = ok_status
+
+def mark_unmatched(results: List[dict], targets: List[Tuple[int, ObjectId]], matched: Iterable[ObjectId], ok_status: str):
+    # A note deleted by another request after its id was resolved was not
+    # written by this batch; only the matched ids keep ok_status
+    matched = set(matched)
+    for index, oid in targets:
+        if results[index]["status"] == ok_status and oid not in matched:
+            fail(results, index, "not_found")
+
+def parse_ids(results: List[dict], entry_ids: List[str]) -> List[Tuple[int, ObjectId]]:
+    parsed = []
+    for index, entry_id in enumerate(entry_ids):
+        results[index]["id"] = entry_id
+        if ObjectId.is_valid(entry_id):
+            parsed.append((index, ObjectId(entry_id)))
+        else:
+            fail(results, index, "error", "Invalid note id")
+    return parsed
+
+def owned_targets(results: List[dict], parsed: List[Tuple[int, ObjectId]], owned: Iterable[ObjectId], ordered: bool) -> List[Tuple[int, ObjectId]]:
+    # Ids the user does not own are reported per item; ordered batches stop at the first failure
+    owned = set(owned)
+    for index, oid in parsed:
+        if oid not in owned:
+            fail(results, index, "not_found")
+    if ordered:
+        first_failure = next((r["index"] for r in results if r["status"] != "pending"), None)
+        if first_failure is not None:
+            skip_remaining(results, first_failure)
+    return [(index, oid) for index, oid in parsed if results[index]["status"] == "pending"]
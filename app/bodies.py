@@ -0,0 +1,148 @@
+import zlib
+from typing import AsyncIterator, List, Optional, Tuple
+
+from bson import ObjectId
+from fastapi import HTTPException, status
+from fastapi.responses import JSONResponse
+
+try:
+    import zstandard
+except ImportError:  # optional; zlib is used without it
+    zstandard = None
+
+
+# Large note bodies are stored compressed. The note keeps only a preview in
+# `description` (so lists, search and change events stay small) plus a `body`
+# subdocument: {"id", "codec", "size", "chars"} and either the compressed
+# bytes inline ("data") or the number of out-of-line chunks ("chunks") kept
+# in the note_bodies collection under the body id. A new body id is used on
+# every write, so readers never see a half-replaced set of chunks.
+# `search_text` holds the start of the plain text, up to note_search_max_chars,
+# for the text index only; no read path returns it.
+
+def check_note_size(title: Optional[str], description: Optional[str], settings):
+    if title is not None and len(title) > settings.note_max_title_chars:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Note titles are limited to {settings.note_max_title_chars} characters",
+        )
+    if description is not None and len(description.encode()) > settings.note_max_body_bytes:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Note bodies are limited to {settings.note_max_body_bytes} bytes",
+        )
+
+def _too_large(max_bytes: int) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"Request bodies are limited to {max_bytes} bytes",
+    )
+
+
+# ASGI middleware capping request bodies before FastAPI reads and parses them,
+# so check_note_size never sees more than the cap. Paths ending in /batch get
+# batch_max_bytes. A Content-Length over the cap is refused up front; a body
+# without one is counted as it arrives, and the HTTPException raised from
+# receive() passes through FastAPI's body parsing as a 413.
+class BodyLimitMiddleware:
+    def __init__(self, app, max_bytes: int, batch_max_bytes: int):
+        self.app = app
+        self.max_bytes = max_bytes
+        self.batch_max_bytes = batch_max_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        max_bytes = self.batch_max_bytes if scope["path"].rstrip("/").endswith("/batch") else self.max_bytes
+        headers = dict(scope.get("headers") or [])
+        try:
+            declared = int(headers.get(b"content-length", b"0"))
+        except ValueError:
+            declared = 0
+        if declared > max_bytes:
+            error = _too_large(max_bytes)
+            await JSONResponse(status_code=error.status_code, content={"detail": error.detail})(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > max_bytes:
+                    raise _too_large(max_bytes)
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+def _compress(data: bytes) -> Tuple[str, bytes]:
+    if zstandard is not None:
+        return "zstd", zstandard.ZstdCompressor(level=3).compress(data)
+    return "zlib", zlib.compress(data, 6)
+
+def _decompressor(codec: str):
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("zstandard is required to read this note body")
+        return zstandard.ZstdDecompressor().decompressobj()
+    return zlib.decompressobj()
+
+def pack_description(description: Optional[str], settings) -> Tuple[dict, List[bytes]]:
+    # Returns the fields to store and the out-of-line chunks to write first;
+    # "body" is None for small descriptions so an update drops an old body
+    if description is None:
+        return {}, []
+    raw = description.encode()
+    if len(raw) < settings.note_compress_threshold_bytes:
+        return {"description": description, "search_text": None, "body": None}, []
+    codec, data = _compress(raw)
+    body = {"id": ObjectId(), "codec": codec, "size": len(raw), "chars": len(description)}
+    chunks = []
+    if len(data) <= settings.note_inline_max_bytes:
+        body["data"] = data
+    else:
+        step = settings.note_chunk_bytes
+        chunks = [data[offset:offset + step] for offset in range(0, len(data), step)]
+        body["chunks"] = len(chunks)
+    packed = {
+        "description": description[:settings.note_preview_chars],
+        "search_text": description[:settings.note_search_max_chars],
+        "body": body,
+    }
+    return packed, chunks
+
+def is_truncated(note: dict) -> bool:
+    return bool(note.get("body"))
+
+async def body_chunks(repository, note: dict) -> AsyncIterator[bytes]:
+    # UTF-8 text of the full body, decompressed piece by piece
+    body = note.get("body")
+    if not body:
+        yield (note.get("description") or "").encode()
+        return
+    decompressor = _decompressor(body["codec"])
+    if body.get("chunks"):
+        async for chunk in repository.iter_body_chunks(body["id"]):
+            yield decompressor.decompress(chunk)
+    else:
+        yield decompressor.decompress(body["data"])
+    tail = decompressor.flush()
+    if tail:
+        yield tail
+
+async def full_description(repository, note: dict) -> Optional[str]:
+    if not note.get("body"):
+        return note.get("description")
+    return b"".join([chunk async for chunk in body_chunks(repository, note)]).decode()
+
+async def expand_bodies(repository, notes: AsyncIterator[dict]) -> AsyncIterator[dict]:
+    # Full descriptions in place of previews, for exports
+    async for note in notes:
+        if note.get("body"):
+            description = await full_description(repository, note)
+            note = {key: value for key, value in note.items() if key not in ("body", "search_text")}
+            note["description"] = description
+        yield note
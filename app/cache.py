@@ -0,0 +1,146 @@
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+
+# Bounded LRU cache whose entries expire after a fixed time-to-live
+class TTLCache:
+    def __init__(self, maxsize: int = 1024, ttl: float = 60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        item = self._data.get(key)
+        if item is None:
+            self.misses += 1
+            return None
+        expires_at, value = item
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            self.expirations += 1
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        self._data[key] = (expires_at, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, key: Hashable):
+        if self._data.pop(key, None) is not None:
+            self.invalidations += 1
+
+    def clear(self):
+        self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+        }
+
+
+# Async interface for caches of serialized responses. Values are bytes so a
+# shared backend (e.g. Redis or memcached) can implement it for multi-worker
+# deployments; groups let all entries of one user be dropped together.
+class CacheBackend:
+    async def get(self, key: str) -> Optional[bytes]:
+        raise NotImplementedError
+
+    async def set(self, key: str, value: bytes, group: Optional[str] = None):
+        raise NotImplementedError
+
+    async def invalidate_group(self, group: str):
+        raise NotImplementedError
+
+    def stats(self) -> dict:
+        return {}
+
+
+# In-process LRU bounded by entry count and total bytes, with a fixed TTL
+class MemoryCacheBackend(CacheBackend):
+    def __init__(self, max_entries: int = 10000, max_bytes: int = 64 * 1024 * 1024, ttl: float = 300.0):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._groups = {}
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def _remove(self, key: str):
+        _, value, group = self._data.pop(key)
+        self.bytes -= len(value)
+        if group is not None:
+            keys = self._groups.get(group)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._groups[group]
+
+    async def get(self, key: str) -> Optional[bytes]:
+        item = self._data.get(key)
+        if item is None or item[0] <= time.monotonic():
+            if item is not None:
+                self._remove(key)
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return item[1]
+
+    async def set(self, key: str, value: bytes, group: Optional[str] = None):
+        if len(value) > self.max_bytes:
+            return
+        if key in self._data:
+            self._remove(key)
+        self._data[key] = (time.monotonic() + self.ttl, value, group)
+        self.bytes += len(value)
+        if group is not None:
+            self._groups.setdefault(group, set()).add(key)
+        while len(self._data) > self.max_entries or self.bytes > self.max_bytes:
+            self._remove(next(iter(self._data)))
+            self.evictions += 1
+
+    async def invalidate_group(self, group: str):
+        for key in list(self._groups.get(group, ())):
+            self._remove(key)
+            self.invalidations += 1
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._data),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
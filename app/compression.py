@@ -0,0 +1,142 @@
+import zlib
+from typing import Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:  # optional; only gzip is offered without it
+    brotli = None
+
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "text/")
+# Event streams must reach the client as soon as each event is written
+UNCOMPRESSED_TYPES = ("text/event-stream",)
+
+
+def accepted_encodings(accept_encoding: str) -> dict:
+    weights = {}
+    for part in accept_encoding.split(","):
+        token, _, params = part.strip().partition(";")
+        token = token.strip().lower()
+        if not token:
+            continue
+        weight = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        weights[token] = weight
+    return weights
+
+def choose_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    # Highest q-value wins; brotli is preferred over gzip on ties
+    if not accept_encoding:
+        return None
+    weights = accepted_encodings(accept_encoding)
+    wildcard = weights.get("*", 0.0)
+    offered = ["br", "gzip"] if brotli is not None else ["gzip"]
+    best, best_weight = None, 0.0
+    for encoding in offered:
+        weight = weights.get(encoding, wildcard)
+        if weight > best_weight:
+            best, best_weight = encoding, weight
+    return best
+
+def compressible(content_type: str) -> bool:
+    content_type = content_type.lower()
+    if content_type.startswith(UNCOMPRESSED_TYPES):
+        return False
+    return content_type.startswith(COMPRESSIBLE_TYPES)
+
+
+class GzipEncoder:
+    def __init__(self, level: int):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def encode(self, data: bytes, final: bool) -> bytes:
+        # Streams are flushed per chunk so clients can decode progressively
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+class BrotliEncoder:
+    def __init__(self, quality: int):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def encode(self, data: bytes, final: bool) -> bytes:
+        output = self._compressor.process(data)
+        return output + (self._compressor.finish() if final else self._compressor.flush())
+
+
+# Negotiated Content-Encoding for responses. Whole bodies smaller than
+# minimum_size are sent as-is; streamed bodies are always compressed.
+# Responses that already carry a Content-Encoding (e.g. ?compress=gzip
+# exports) and event streams pass through untouched.
+class CompressionMiddleware:
+    def __init__(self, app, minimum_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 4):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    def _encoder(self, encoding: str):
+        if encoding == "br":
+            return BrotliEncoder(self.brotli_quality)
+        return GzipEncoder(self.gzip_level)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding"))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        encoder = None
+        passthrough = False
+
+        async def compressing_send(message):
+            nonlocal start_message, encoder, passthrough
+            if message["type"] == "http.response.start":
+                headers = Headers(raw=message["headers"])
+                passthrough = (
+                    "content-encoding" in headers
+                    or message["status"] in (204, 304)
+                    or not compressible(headers.get("content-type", ""))
+                )
+                if passthrough:
+                    await send(message)
+                else:
+                    start_message = message
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if start_message is not None:
+                headers = MutableHeaders(raw=start_message["headers"])
+                headers.add_vary_header("Accept-Encoding")
+                if not more_body and len(body) < self.minimum_size:
+                    passthrough = True
+                    await send(start_message)
+                    await send(message)
+                    return
+                encoder = self._encoder(encoding)
+                headers["Content-Encoding"] = encoding
+                if more_body:
+                    del headers["Content-Length"]
+                    payload = encoder.encode(body, final=False)
+                else:
+                    payload = encoder.encode(body, final=True)
+                    headers["Content-Length"] = str(len(payload))
+                await send(start_message)
+                start_message = None
+                await send({"type": "http.response.body", "body": payload, "more_body": more_body})
+                return
+            await send({"type": "http.response.body", "body": encoder.encode(body, final=not more_body), "more_body": more_body})
+
+        await self.app(scope, receive, compressing_send)
@@ -0,0 +1,59 @@
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime
+from typing import Optional, Tuple
+
+from fastapi import HTTPException, status
+
+
+# Single-note ETags are "<note version>.<user notes version>". The note version
+# drives If-Match; the user part lets If-None-Match short-circuit when nothing
+# in the notebook changed. Write responses carry only the note version.
+def note_etag(note: dict, notes_version: Optional[int] = None) -> str:
+    if notes_version is None:
+        return f'"{note.get("version", 0)}"'
+    return f'"{note.get("version", 0)}.{notes_version}"'
+
+def list_etag(user_id: str, notes_version: int, params: str) -> str:
+    digest = hashlib.sha1(f"{user_id}|{notes_version}|{params}".encode()).hexdigest()[:20]
+    return f'"{notes_version}-{digest}"'
+
+def _opaque(tag: str) -> str:
+    tag = tag.strip()
+    if tag.startswith("W/"):
+        tag = tag[2:]
+    return tag.strip('"')
+
+def parse_note_etag(tag: str) -> Optional[Tuple[int, Optional[int]]]:
+    note_part, _, user_part = _opaque(tag).partition(".")
+    try:
+        return int(note_part), int(user_part) if user_part else None
+    except ValueError:
+        return None
+
+def parse_if_match(if_match: Optional[str]) -> Optional[int]:
+    # None means the write is unconditional
+    if if_match is None or if_match.strip() == "*":
+        return None
+    parsed = parse_note_etag(if_match)
+    if parsed is None:
+        raise HTTPException(status_code=status.HTTP_412_PRECONDITION_FAILED, detail="Malformed If-Match header")
+    return parsed[0]
+
+def if_none_match_tags(if_none_match: Optional[str]) -> list:
+    if not if_none_match:
+        return []
+    return [tag for tag in (part.strip() for part in if_none_match.split(",")) if tag]
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    # Weak comparison, as required for If-None-Match
+    tags = if_none_match_tags(if_none_match)
+    return "*" in tags or _opaque(etag) in (_opaque(tag) for tag in tags)
+
+def http_date(value: Optional[datetime]) -> Optional[str]:
+    if value is None:
+        return None
+    # usegmt needs datetime.timezone.utc itself, not bson's equivalent FixedOffset;
+    # naive values are UTC as stored
+    value = value.astimezone(timezone.utc) if value.tzinfo is not None else value.replace(tzinfo=timezone.utc)
+    return format_datetime(value, usegmt=True)
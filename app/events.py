@@ -0,0 +1,147 @@
+import asyncio
+import json
+import logging
+from collections import defaultdict
+from typing import AsyncIterator, Awaitable, Callable, Optional
+
+from fastapi import HTTPException, status
+from pymongo.errors import PyMongoError
+
+logger = logging.getLogger(__name__)
+
+
+def note_event(op: str, note: dict) -> dict:
+    return {
+        "op": op,
+        "id": str(note["_id"]),
+        "revision": note.get("revision"),
+        "note": {
+            "id": str(note["_id"]),
+            "title": note.get("title"),
+            "description": note.get("description"),
+            "user_id": note.get("user_id"),
+        },
+    }
+
+def id_event(op: str, entry_id, revision: Optional[int]) -> dict:
+    return {"op": op, "id": str(entry_id), "revision": revision}
+
+
+class Subscription:
+    def __init__(self, user_id: str, queue_size: int):
+        self.user_id = user_id
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        # Set when the client fell too far behind; it must resync via /notes/changes
+        self.overflowed = False
+
+
+# In-process pub/sub of note events keyed by user. Each connection gets a
+# bounded queue so one slow client cannot grow memory without limit.
+class NoteEventBroker:
+    def __init__(self, max_connections: int = 1000, queue_size: int = 100):
+        self.max_connections = max_connections
+        self.queue_size = queue_size
+        self._subscribers = defaultdict(set)
+        self.connections = 0
+        self.published = 0
+        self.overflows = 0
+
+    def subscribe(self, user_id: str) -> Subscription:
+        if self.connections >= self.max_connections:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many live connections on this worker",
+                headers={"Retry-After": "5"},
+            )
+        subscription = Subscription(user_id, self.queue_size)
+        self._subscribers[user_id].add(subscription)
+        self.connections += 1
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        subscribers = self._subscribers.get(subscription.user_id)
+        if subscribers and subscription in subscribers:
+            subscribers.discard(subscription)
+            self.connections -= 1
+            if not subscribers:
+                del self._subscribers[subscription.user_id]
+
+    def publish(self, user_id: str, event: dict):
+        self.published += 1
+        for subscription in self._subscribers.get(user_id, ()):
+            if subscription.overflowed:
+                continue
+            try:
+                subscription.queue.put_nowait(event)
+            except asyncio.QueueFull:
+                subscription.overflowed = True
+                self.overflows += 1
+
+    def stats(self) -> dict:
+        return {
+            "connections": self.connections,
+            "max_connections": self.max_connections,
+            "published": self.published,
+            "overflows": self.overflows,
+        }
+
+
+async def sse_stream(
+    broker: NoteEventBroker,
+    subscription: Subscription,
+    heartbeat_seconds: float,
+    is_disconnected: Callable[[], Awaitable[bool]],
+) -> AsyncIterator[bytes]:
+    try:
+        yield b"retry: 3000\n\n"
+        while True:
+            try:
+                event = await asyncio.wait_for(subscription.queue.get(), heartbeat_seconds)
+            except asyncio.TimeoutError:
+                if await is_disconnected():
+                    break
+                yield b": heartbeat\n\n"
+                continue
+            lines = f"event: {event['op']}\ndata: {json.dumps(event, default=str)}\n\n"
+            if event.get("revision") is not None:
+                lines = f"id: {event['revision']}\n" + lines
+            yield lines.encode()
+            if subscription.overflowed and subscription.queue.empty():
+                yield b"event: resync\ndata: {}\n\n"
+                break
+    finally:
+        broker.unsubscribe(subscription)
+
+
+async def watch_note_changes(db, broker: NoteEventBroker, on_unavailable: Callable[[], None]):
+    # Feeds the broker from a change stream so writes from every worker reach
+    # every connection. Standalone servers have no change streams; in that case
+    # on_unavailable switches the caller to in-process publishing.
+    pipeline = [{"$match": {
+        "ns.coll": {"$in": ["notes", "note_tombstones"]},
+        "operationType": {"$in": ["insert", "update", "replace"]},
+    }}]
+    resume_token = None
+    while True:
+        try:
+            async with db.watch(pipeline, full_document="updateLookup", resume_after=resume_token) as stream:
+                async for change in stream:
+                    resume_token = stream.resume_token
+                    document = change.get("fullDocument")
+                    if not document:
+                        continue
+                    if change["ns"]["coll"] == "note_tombstones":
+                        event = id_event("delete", document["note_id"], document.get("revision"))
+                    else:
+                        op = "insert" if change["operationType"] == "insert" else "update"
+                        event = note_event(op, document)
+                    broker.publish(document["user_id"], event)
+        except asyncio.CancelledError:
+            raise
+        except PyMongoError as exc:
+            if getattr(exc, "code", None) in (40573, 40324):
+                logger.warning("Change streams unavailable, publishing note events in-process")
+                on_unavailable()
+                return
+            logger.warning("Note change stream interrupted, resuming: %s", exc)
+            await asyncio.sleep(1)
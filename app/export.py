@@ -0,0 +1,33 @@
+import zlib
+from typing import AsyncIterator
+
+from app.serialization import dumps
+
+# Lines are coalesced into chunks of roughly this size before being written
+CHUNK_SIZE = 64 * 1024
+
+
+def note_to_export(note: dict) -> dict:
+    exported = {key: value for key, value in note.items() if key != "_id"}
+    exported["id"] = str(note["_id"])
+    return exported
+
+async def ndjson_chunks(notes: AsyncIterator[dict], chunk_size: int = CHUNK_SIZE) -> AsyncIterator[bytes]:
+    buffer = bytearray()
+    async for note in notes:
+        buffer += dumps(note_to_export(note))
+        buffer += b"\n"
+        if len(buffer) >= chunk_size:
+            yield bytes(buffer)
+            buffer.clear()
+    if buffer:
+        yield bytes(buffer)
+
+async def gzip_chunks(chunks: AsyncIterator[bytes], level: int = 6) -> AsyncIterator[bytes]:
+    # wbits=31 produces a gzip container around the deflate stream
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    async for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
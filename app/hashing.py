@@ -0,0 +1,86 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+
+from fastapi import HTTPException, status
+from passlib.context import CryptContext
+
+
+class HasherSaturated(HTTPException):
+    def __init__(self):
+        super().__init__(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many password operations in progress, retry shortly",
+            headers={"Retry-After": "1"},
+        )
+
+
+# Runs bcrypt on a bounded thread pool so hashing never blocks the event loop.
+# The bcrypt C extension releases the GIL, so threads hash in parallel.
+class PasswordHasher:
+    def __init__(self, rounds: int = 12, max_workers: int = 4, max_queue: int = 64):
+        # Pinning the desired rounds makes needs_update() flag hashes made with an old cost
+        self.context = CryptContext(
+            schemes=["bcrypt"],
+            deprecated="auto",
+            bcrypt__default_rounds=rounds,
+            bcrypt__min_desired_rounds=rounds,
+            bcrypt__max_desired_rounds=rounds,
+        )
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="bcrypt")
+        self._in_flight = 0
+        self.operations = 0
+        self.rejected = 0
+        self.rehashed = 0
+        self.queue_wait_seconds = 0.0
+        self.hash_seconds = 0.0
+
+    async def _run(self, func, *args):
+        if self._in_flight >= self.max_workers + self.max_queue:
+            self.rejected += 1
+            raise HasherSaturated()
+        self._in_flight += 1
+        enqueued = time.perf_counter()
+
+        def timed():
+            started = time.perf_counter()
+            result = func(*args)
+            return started, time.perf_counter(), result
+
+        try:
+            loop = asyncio.get_running_loop()
+            started, finished, result = await loop.run_in_executor(self._executor, timed)
+        finally:
+            self._in_flight -= 1
+        self.operations += 1
+        self.queue_wait_seconds += started - enqueued
+        self.hash_seconds += finished - started
+        return result
+
+    async def hash(self, password: str) -> str:
+        return await self._run(self.context.hash, password)
+
+    async def verify_and_update(self, password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        # Returns (valid, new_hash); new_hash is set when the stored hash uses an outdated cost
+        valid, new_hash = await self._run(self.context.verify_and_update, password, hashed_password)
+        if new_hash:
+            self.rehashed += 1
+        return valid, new_hash
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": self._in_flight,
+            "max_workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "operations": self.operations,
+            "rejected": self.rejected,
+            "rehashed": self.rehashed,
+            "queue_wait_seconds": self.queue_wait_seconds,
+            "hash_seconds": self.hash_seconds,
+        }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
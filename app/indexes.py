@@ -0,0 +1,114 @@
+import argparse
+import asyncio
+import sys
+from typing import List
+
+from bson import ObjectId
+from pymongo import ASCENDING, TEXT
+
+# (keys, options) per collection; create_index is idempotent for identical specs
+NOTES_APP_INDEXES = {
+    "users": [
+        ([("email", ASCENDING)], {"name": "email_unique", "unique": True}),
+    ],
+    "notes": [
+        ([("user_id", ASCENDING), ("_id", ASCENDING)], {"name": "user_id_id"}),
+        # Prefixed by user_id so a search only reads its user's postings; every
+        # $text query must then match user_id exactly, as search_notes does
+        ([("user_id", ASCENDING), ("title", TEXT), ("description", TEXT), ("search_text", TEXT)], {
+            "name": "user_id_notes_text",
+            "weights": {"title": 3, "description": 1, "search_text": 1},
+        }),
+        ([("user_id", ASCENDING), ("revision", ASCENDING)], {"name": "user_id_revision"}),
+    ],
+    "note_tombstones": [
+        ([("user_id", ASCENDING), ("revision", ASCENDING)], {"name": "user_id_revision"}),
+        # One tombstone per note, so concurrent deletes report and publish it once
+        ([("user_id", ASCENDING), ("note_id", ASCENDING)], {"name": "user_id_note_id_unique", "unique": True}),
+    ],
+    "revoked_tokens": [
+        ([("jti", ASCENDING)], {"name": "jti_unique", "unique": True}),
+        ([("type", ASCENDING), ("revoked_at", ASCENDING)], {"name": "type_revoked_at"}),
+        # MongoDB drops each entry once the token it revokes has expired
+        ([("expires_at", ASCENDING)], {"name": "expires_at_ttl", "expireAfterSeconds": 0}),
+    ],
+    "note_bodies": [
+        ([("body_id", ASCENDING), ("n", ASCENDING)], {"name": "body_id_n", "unique": True}),
+    ],
+}
+
+# Indexes replaced by a later spec. A collection holds one text index, so the
+# old one is dropped before its successor is built.
+RETIRED_INDEXES = {
+    "notes": ["notes_text", "notes_text_full"],
+}
+
+
+async def ensure_indexes(db, specs: dict = NOTES_APP_INDEXES, retired: dict = RETIRED_INDEXES):
+    for collection_name, names in retired.items():
+        existing = await db[collection_name].index_information()
+        for name in names:
+            if name in existing:
+                await db[collection_name].drop_index(name)
+    for collection_name, indexes in specs.items():
+        for keys, options in indexes:
+            await db[collection_name].create_index(keys, **options)
+
+
+def _plan_stages(plan: dict):
+    yield plan.get("stage")
+    for key in ("inputStage", "queryPlan"):
+        if key in plan:
+            yield from _plan_stages(plan[key])
+    for child in plan.get("inputStages", []):
+        yield from _plan_stages(child)
+
+def _hot_queries(db):
+    # Mirrors the filters and sorts issued by MongoRepository for the notes API
+    probe_user = "explain-probe@example.com"
+    probe_id = ObjectId()
+    notes = db["notes"]
+    return {
+        "users.by_email": db["users"].find({"email": probe_user}).limit(1),
+        "notes.list_page": notes.find({"user_id": probe_user}).sort("_id", 1).limit(101),
+        "notes.list_next_page": notes.find({"user_id": probe_user, "_id": {"$gt": probe_id}}).sort("_id", 1).limit(101),
+        "notes.by_id": notes.find({"_id": probe_id, "user_id": probe_user}).limit(1),
+        "notes.search": notes.find({"user_id": probe_user, "$text": {"$search": "probe"}}),
+        "notes.changes": notes.find({"user_id": probe_user, "revision": {"$gt": 0}}).sort("revision", 1),
+        "note_tombstones.changes": db["note_tombstones"].find({"user_id": probe_user, "revision": {"$gt": 0}}).sort("revision", 1),
+        "note_bodies.chunks": db["note_bodies"].find({"body_id": probe_id}).sort("n", 1),
+    }
+
+async def find_collscans(db) -> List[str]:
+    # Returns the names of hot queries whose winning plan scans the whole collection
+    offenders = []
+    for name, cursor in _hot_queries(db).items():
+        explanation = await cursor.explain()
+        winning_plan = explanation["queryPlanner"]["winningPlan"]
+        if "COLLSCAN" in _plan_stages(winning_plan):
+            offenders.append(name)
+    return offenders
+
+
+async def _check(url: str, database: str, create: bool) -> int:
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    client = AsyncIOMotorClient(url, serverSelectionTimeoutMS=5000)
+    try:
+        db = client[database]
+        if create:
+            await ensure_indexes(db)
+        offenders = await find_collscans(db)
+    finally:
+        client.close()
+    for name in offenders:
+        print(f"COLLSCAN: {name}")
+    return 1 if offenders else 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Create indexes and verify hot queries avoid COLLSCAN")
+    parser.add_argument("--url", default="mongodb://localhost:27017")
+    parser.add_argument("--database", default="notes-app")
+    parser.add_argument("--create", action="store_true", help="create indexes before checking")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(_check(args.url, args.database, args.create)))
@@ -0,0 +1,206 @@
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+from pymongo import monitoring
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_labels(labelnames: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+# Minimal Prometheus-compatible metrics; updates may come from driver threads, so each metric locks
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {value}"
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = (), buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # label values -> [bucket counts..., sum, count]
+        self._values: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0] * len(self.buckets) + [0.0, 0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[index] += 1
+                    break
+            state[-2] += value
+            state[-1] += 1
+
+    def samples(self):
+        with self._lock:
+            items = [(key, list(state)) for key, state in self._values.items()]
+        for key, state in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, state):
+                cumulative += count
+                le = f'le="{bound}"'
+                yield f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}"
+            le = 'le="+Inf"'
+            yield f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {state[-1]}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, key)} {state[-2]}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, key)} {state[-1]}"
+
+
+# Reads its values at scrape time, e.g. from a component's stats() dict
+class CallbackGauge:
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, callback: Callable[[], float]):
+        self.name = name
+        self.help = help
+        self.callback = callback
+
+    def samples(self):
+        yield f"{self.name} {float(self.callback())}"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+
+    def register(self, metric):
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labelnames: Iterable[str] = ()) -> Counter:
+        return self.register(Counter(name, help, labelnames))
+
+    def histogram(self, name: str, help: str, labelnames: Iterable[str] = (), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help, labelnames, buckets))
+
+    def gauges_from_stats(self, prefix: str, stats: Callable[[], dict], keys: Iterable[str]):
+        for key in keys:
+            self.register(CallbackGauge(f"{prefix}_{key}", f"{prefix} {key}", lambda key=key: stats()[key]))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+http_requests = REGISTRY.counter("http_requests_total", "HTTP requests by route and status", ("route", "method", "status"))
+http_duration = REGISTRY.histogram("http_request_duration_seconds", "HTTP request latency", ("route", "method"))
+stage_duration = REGISTRY.histogram("http_stage_duration_seconds", "Time spent per request stage", ("route", "stage"))
+mongo_commands = REGISTRY.counter("mongodb_commands_total", "MongoDB commands by outcome", ("command", "outcome"))
+mongo_duration = REGISTRY.histogram("mongodb_command_duration_seconds", "MongoDB command latency", ("command",))
+mongo_documents = REGISTRY.counter("mongodb_documents_returned_total", "Documents returned by MongoDB cursors", ("command",))
+
+
+# Stage timings are collected per request and labelled with the route once routing is known
+_request_stages: ContextVar[Optional[list]] = ContextVar("request_stages", default=None)
+
+@contextmanager
+def stage(name: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        stages = _request_stages.get()
+        if stages is not None:
+            stages.append((name, time.perf_counter() - started))
+
+def staged(name: str):
+    # Decorator form of stage() for coroutine functions
+    def decorator(func):
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            with stage(name):
+                return await func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        stages = []
+        token = _request_stages.set(stages)
+        status_code = 500
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            _request_stages.reset(token)
+            # Label by route template, never the raw path, to keep cardinality bounded
+            route = getattr(scope.get("route"), "path", "unmatched")
+            http_requests.inc(route=route, method=scope["method"], status=status_code)
+            http_duration.observe(elapsed, route=route, method=scope["method"])
+            for name, seconds in stages:
+                stage_duration.observe(seconds, route=route, stage=name)
+
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        mongo_commands.inc(command=event.command_name, outcome="ok")
+        mongo_duration.observe(event.duration_micros / 1e6, command=event.command_name)
+        cursor = event.reply.get("cursor") if isinstance(event.reply, dict) else None
+        if cursor:
+            batch = cursor.get("firstBatch", cursor.get("nextBatch", []))
+            mongo_documents.inc(len(batch), command=event.command_name)
+
+    def failed(self, event):
+        mongo_commands.inc(command=event.command_name, outcome="error")
+        mongo_duration.observe(event.duration_micros / 1e6, command=event.command_name)
@@ -0,0 +1,118 @@
+import argparse
+import asyncio
+from typing import Optional
+
+from bson import ObjectId
+from pymongo import InsertOne
+from pymongo.errors import BulkWriteError
+
+DUPLICATE_KEY = 11000
+
+
+def _owner_keys(user: dict) -> list:
+    # Notes of the old backends point at their owner by _id (app/main.py) or
+    # username (app/routes); the unified schema uses the email
+    keys = [user["_id"]]
+    if user.get("username"):
+        keys.append(user["username"])
+    return keys
+
+def _unified_user(user: dict) -> Optional[dict]:
+    email = user.get("email")
+    if not email:
+        return None
+    unified = {key: value for key, value in user.items() if key != "password"}
+    if "hashed_password" not in unified and "password" in user:
+        unified["hashed_password"] = user["password"]
+    unified.setdefault("username", email.split("@")[0])
+    return unified
+
+async def _insert_new(collection, documents: list) -> int:
+    if not documents:
+        return 0
+    try:
+        result = await collection.bulk_write([InsertOne(document) for document in documents], ordered=False)
+        return result.inserted_count
+    except BulkWriteError as exc:
+        if any(error["code"] != DUPLICATE_KEY for error in exc.details["writeErrors"]):
+            raise
+        return exc.details["nInserted"]
+
+async def import_database(source, target, batch_size: int = 1000) -> dict:
+    # Copies users and notes of a notebook-app database, skipping documents
+    # (and users with an email) that the target already has
+    owners = {}
+    users = []
+    for collection_name in ("Users", "users"):
+        async for user in source[collection_name].find():
+            unified = _unified_user(user)
+            if unified is None:
+                continue
+            existing = await target["users"].find_one({"email": unified["email"]}, {"_id": 1})
+            for key in _owner_keys(user):
+                owners[key] = unified["email"]
+            if existing is None:
+                users.append(unified)
+    imported_users = await _insert_new(target["users"], users)
+
+    imported_notes = 0
+    batch = []
+    async for note in source["notes"].find():
+        note["user_id"] = owners.get(note.get("user_id"), note.get("user_id"))
+        if "content" in note and "description" not in note:
+            note["description"] = note.pop("content")
+        batch.append(note)
+        if len(batch) >= batch_size:
+            imported_notes += await _insert_new(target["notes"], batch)
+            batch = []
+    imported_notes += await _insert_new(target["notes"], batch)
+    return {"users": imported_users, "notes": imported_notes}
+
+async def unify_schema(db) -> dict:
+    # Idempotent; brings documents written by any of the old backends to the
+    # shape MongoRepository reads
+    users = await db["users"].update_many(
+        {"password": {"$exists": True}, "hashed_password": {"$exists": False}},
+        {"$rename": {"password": "hashed_password"}},
+    )
+    async for user in db["users"].find({"username": {"$exists": False}, "email": {"$exists": True}}, {"email": 1}):
+        await db["users"].update_one({"_id": user["_id"]}, {"$set": {"username": user["email"].split("@")[0]}})
+
+    renamed = await db["notes"].update_many(
+        {"content": {"$exists": True}, "description": {"$exists": False}},
+        {"$rename": {"content": "description"}},
+    )
+    await db["notes"].update_many({"version": {"$exists": False}}, {"$set": {"version": 1}})
+
+    reassigned = 0
+    legacy_owners = await db["notes"].distinct("user_id", {"user_id": {"$not": {"$regex": "@"}}})
+    for legacy_owner in legacy_owners:
+        query = {"_id": legacy_owner} if isinstance(legacy_owner, ObjectId) else {"username": legacy_owner}
+        user = await db["users"].find_one(query, {"email": 1})
+        if user is None or not user.get("email"):
+            continue
+        result = await db["notes"].update_many({"user_id": legacy_owner}, {"$set": {"user_id": user["email"]}})
+        reassigned += result.modified_count
+    return {"users_fixed": users.modified_count, "notes_renamed": renamed.modified_count, "notes_reassigned": reassigned}
+
+
+async def _migrate(url: str, database: str, source_database: Optional[str]) -> dict:
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    client = AsyncIOMotorClient(url, serverSelectionTimeoutMS=5000)
+    try:
+        report = {}
+        if source_database:
+            report["imported"] = await import_database(client[source_database], client[database])
+        report["unified"] = await unify_schema(client[database])
+    finally:
+        client.close()
+    return report
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Unify notes written by the old backends into one schema")
+    parser.add_argument("--url", default="mongodb://localhost:27017")
+    parser.add_argument("--database", default="notes-app")
+    parser.add_argument("--source-database", default=None, help="also import users and notes from e.g. notebook-app")
+    args = parser.parse_args()
+    print(asyncio.run(_migrate(args.url, args.database, args.source_database)))
@@ -1,96 +1,126 @@
-from fastapi import APIRouter, HTTPException, Path, Body, Depends
-from typing import List, Optional
+from fastapi import APIRouter, HTTPException, Path, Body, Depends, Query
+from typing import Callable, List, Optional
 from pydantic import BaseModel
-from bson import ObjectId
-from database import db
-from schemas import get_current_user
 
-router = APIRouter()
+from app.bodies import check_note_size, full_description
+from app.pagination import page_projection, page_size
 
-# MongoDB collection
-notes_collection = db["notes"]  # Adjust collection name as needed
+# Routes for clients of the former notebook app (app/main.py), served under
+# /api by the consolidated application. Notes are stored with the canonical
+# `description` field and owned by the user's email; the notebook API keeps
+# calling the body `content`.
 
 class NoteSchema(BaseModel):
     title: str
     content: str
 
-class NoteUpdateSchema(BaseModel):
+class NoteSummarySchema(BaseModel):
     title: Optional[str] = None
     content: Optional[str] = None
 
-def create_note(note_data: dict) -> str:
-    result = notes_collection.insert_one(note_data)
-    return str(result.inserted_id)
+class NotePageSchema(BaseModel):
+    items: List[NoteSummarySchema]
+    next_cursor: Optional[str] = None
 
-def get_all_notes(user: dict) -> List[dict]:
-    notes = list(notes_collection.find({"user_id": user["_id"]}))
-    for note in notes:
-        note["_id"] = str(note["_id"])
-    return notes
+class NoteUpdateSchema(BaseModel):
+    title: Optional[str] = None
+    content: Optional[str] = None
 
-def get_note_by_id(note_id: str, user: dict) -> Optional[dict]:
-    note = notes_collection.find_one({"_id": ObjectId(note_id), "user_id": user["_id"]})
-    if note:
-        note["_id"] = str(note["_id"])
+def to_notebook(note: dict) -> dict:
+    note = dict(note)
+    note["_id"] = str(note["_id"])
+    if "description" in note:
+        note["content"] = note.pop("description")
     return note
 
-def update_note(note_id: str, updated_data: dict, user: dict) -> int:
-    result = notes_collection.update_one(
-        {"_id": ObjectId(note_id), "user_id": user["_id"]},
-        {"$set": updated_data}
-    )
-    return result.modified_count
-
-def delete_note(note_id: str, user: dict) -> int:
-    result = notes_collection.delete_one({"_id": ObjectId(note_id), "user_id": user["_id"]})
-    return result.deleted_count
-
-@router.post("/notes/", response_model=str)
-def create_note_api(note: NoteSchema = Body(...), current_user: dict = Depends(get_current_user)):
-    note_data = note.dict()
-    note_data["user_id"] = current_user["_id"]
-    note_id = create_note(note_data)
-    return note_id
-
-@router.get("/notes/", response_model=List[NoteSchema])
-def read_all_notes(current_user: dict = Depends(get_current_user)):
-    return get_all_notes(current_user)
-
-@router.get("/notes/{note_id}", response_model=NoteSchema)
-def read_note(note_id: str = Path(..., title="The ID of the note to retrieve"), current_user: dict = Depends(get_current_user)):
-    note = get_note_by_id(note_id, current_user)
-    if note:
-        return note
-    else:
-        raise HTTPException(status_code=404, detail="Note not found")
+def to_stored(fields: dict) -> dict:
+    fields = dict(fields)
+    if "content" in fields:
+        fields["description"] = fields.pop("content")
+    return fields
 
-@router.put("/notes/{note_id}", response_model=int)
-def update_note_api(
-    note_id: str = Path(..., title="The ID of the note to update"),
-    updated_note: NoteSchema = Body(...),
-    current_user: dict = Depends(get_current_user)
-):
-    updated_data = updated_note.dict(exclude_unset=True)
-    updated_count = update_note(note_id, updated_data, current_user)
-    if updated_count == 0:
-        raise HTTPException(status_code=404, detail="Note not found")
-    return updated_count
-
-@router.patch("/notes/{note_id}", response_model=int)
-def partial_update_note_api(
-    note_id: str = Path(..., title="The ID of the note to update"),
-    updated_note: NoteUpdateSchema = Body(...),
-    current_user: dict = Depends(get_current_user)
-):
-    updated_data = updated_note.dict(exclude_unset=True)
-    updated_count = update_note(note_id, updated_data, current_user)
-    if updated_count == 0:
-        raise HTTPException(status_code=404, detail="Note not found")
-    return updated_count
+def stored_fields(fields: Optional[str]) -> Optional[str]:
+    if fields is None:
+        return None
+    names = [name.strip() for name in fields.split(",")]
+    return ",".join("description" if name == "content" else name for name in names)
+
+def create_notebook_router(get_repository: Callable, get_current_user: Callable) -> APIRouter:
+    # Both arguments are FastAPI dependencies
+    router = APIRouter()
 
-@router.delete("/notes/{note_id}", response_model=int)
-def delete_note_api(note_id: str = Path(..., title="The ID of the note to delete"), current_user: dict = Depends(get_current_user)):
-    deleted_count = delete_note(note_id, current_user)
-    if deleted_count == 0:
+    async def update(repository, note_id: str, updated_data: dict, current_user) -> int:
+        if not updated_data:
+            return 0
+        check_note_size(updated_data.get("title"), updated_data.get("content"), repository.settings)
+        note = await repository.update_note(note_id, current_user.email, to_stored(updated_data))
+        if note is None:
+            raise HTTPException(status_code=404, detail="Note not found")
+        return 1
+
+    @router.post("/notes/", response_model=str)
+    async def create_note_api(
+        note: NoteSchema = Body(...),
+        current_user=Depends(get_current_user),
+        repository=Depends(get_repository)
+    ):
+        check_note_size(note.title, note.content, repository.settings)
+        note_data = to_stored(note.dict())
+        note_data["user_id"] = current_user.email
+        return await repository.create_note(note_data)
+
+    @router.get("/notes/", response_model=NotePageSchema)
+    async def read_all_notes(
+        limit: Optional[int] = Query(None, ge=1),
+        after: Optional[str] = None,
+        fields: Optional[str] = None,
+        preview: Optional[int] = Query(None, ge=0),
+        current_user=Depends(get_current_user),
+        repository=Depends(get_repository)
+    ):
+        projection = page_projection(stored_fields(fields), preview)
+        notes, next_cursor = await repository.list_notes_page(current_user.email, page_size(limit), after, projection)
+        return {"items": [to_notebook(note) for note in notes], "next_cursor": next_cursor}
+
+    @router.get("/notes/{note_id}", response_model=NoteSchema)
+    async def read_note(
+        note_id: str = Path(..., title="The ID of the note to retrieve"),
+        current_user=Depends(get_current_user),
+        repository=Depends(get_repository)
+    ):
+        note = await repository.get_note(note_id, current_user.email)
+        if note:
+            note["description"] = await full_description(repository, note)
+            return to_notebook(note)
         raise HTTPException(status_code=404, detail="Note not found")
-    return deleted_count
+
+    @router.put("/notes/{note_id}", response_model=int)
+    async def update_note_api(
+        note_id: str = Path(..., title="The ID of the note to update"),
+        updated_note: NoteSchema = Body(...),
+        current_user=Depends(get_current_user),
+        repository=Depends(get_repository)
+    ):
+        return await update(repository, note_id, updated_note.dict(exclude_unset=True), current_user)
+
+    @router.patch("/notes/{note_id}", response_model=int)
+    async def partial_update_note_api(
+        note_id: str = Path(..., title="The ID of the note to update"),
+        updated_note: NoteUpdateSchema = Body(...),
+        current_user=Depends(get_current_user),
+        repository=Depends(get_repository)
+    ):
+        return await update(repository, note_id, updated_note.dict(exclude_unset=True), current_user)
+
+    @router.delete("/notes/{note_id}", response_model=int)
+    async def delete_note_api(
+        note_id: str = Path(..., title="The ID of the note to delete"),
+        current_user=Depends(get_current_user),
+        repository=Depends(get_repository)
+    ):
+        deleted_count = await repository.delete_note(note_id, current_user.email)
+        if deleted_count == 0:
+            raise HTTPException(status_code=404, detail="Note not found")
+        return deleted_count
+
+    return router
@@ -0,0 +1,62 @@
+import base64
+import binascii
+from typing import List, Optional, Tuple
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from fastapi import HTTPException
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+# Stored field names; the notebook router maps its "content" to description first
+PROJECTABLE_FIELDS = ("title", "description")
+
+
+# Cursors are the url-safe base64 of the last returned ObjectId, so clients
+# treat them as opaque tokens rather than ids
+def encode_cursor(last_id) -> str:
+    return base64.urlsafe_b64encode(ObjectId(last_id).binary).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> ObjectId:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        return ObjectId(raw)
+    except (binascii.Error, InvalidId, TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid pagination cursor")
+
+def page_size(limit: Optional[int], default: int = DEFAULT_PAGE_SIZE, maximum: int = MAX_PAGE_SIZE) -> int:
+    if not limit or limit < 1:
+        return default
+    return min(limit, maximum)
+
+def page_filter(query: dict, after: Optional[str]) -> dict:
+    if not after:
+        return query
+    return {**query, "_id": {"$gt": decode_cursor(after)}}
+
+def page_projection(fields: Optional[str], preview: Optional[int] = None, body_field: str = "description") -> Optional[dict]:
+    # None means the full document; otherwise _id and user_id are always kept
+    if not fields and preview is None:
+        return None
+    selected = [f.strip() for f in fields.split(",")] if fields else ["title", body_field]
+    unknown = [f for f in selected if f not in PROJECTABLE_FIELDS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    projection = {"_id": 1, "user_id": 1}
+    for field in selected:
+        projection[field] = 1
+    if body_field in projection:
+        # Enough of a large body to flag it truncated (see app/bodies.py)
+        projection["body.size"] = 1
+    if preview is not None and body_field in projection:
+        # Truncate server-side so long bodies never leave Mongo
+        projection[body_field] = {"$substrCP": [f"${body_field}", 0, preview]}
+    return projection
+
+def finish_page(documents: List[dict], limit: int) -> Tuple[List[dict], Optional[str]]:
+    # Callers fetch limit + 1 documents; the extra one only signals another page
+    if len(documents) > limit:
+        documents = documents[:limit]
+        return documents, encode_cursor(documents[-1]["_id"])
+    return documents, None
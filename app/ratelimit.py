@@ -0,0 +1,160 @@
+import json
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Iterable, Optional, Tuple
+
+from fastapi.responses import JSONResponse
+from starlette.requests import Request
+
+# Credential request bodies are read to find the account and may be no larger than this
+MAX_BODY_BYTES = 64 * 1024
+
+
+# Backend interface for token buckets. Shared deployments implement consume()
+# against a common store (e.g. Redis with a Lua script) with the same semantics.
+class RateLimitStore:
+    async def consume(self, key: str, rate: float, capacity: float, cost: float = 1.0) -> float:
+        # Returns 0 when the request is allowed, else the seconds until it would be
+        raise NotImplementedError
+
+
+# Single-node store; keys are spread over independently locked shards so
+# threadpool handlers and the event loop rarely contend
+class MemoryRateLimitStore(RateLimitStore):
+    def __init__(self, shards: int = 16, max_keys_per_shard: int = 10000):
+        self.max_keys_per_shard = max_keys_per_shard
+        self._shards = [OrderedDict() for _ in range(shards)]
+        self._locks = [threading.Lock() for _ in range(shards)]
+
+    async def consume(self, key: str, rate: float, capacity: float, cost: float = 1.0) -> float:
+        return self.consume_sync(key, rate, capacity, cost)
+
+    def consume_sync(self, key: str, rate: float, capacity: float, cost: float = 1.0) -> float:
+        index = hash(key) % len(self._shards)
+        buckets = self._shards[index]
+        now = time.monotonic()
+        with self._locks[index]:
+            tokens, updated = buckets.get(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated) * rate)
+            if tokens >= cost:
+                tokens -= cost
+                retry_after = 0.0
+            else:
+                retry_after = (cost - tokens) / rate
+            buckets[key] = (tokens, now)
+            buckets.move_to_end(key)
+            # The least recently used buckets have refilled the longest, so dropping them is safe
+            while len(buckets) > self.max_keys_per_shard:
+                buckets.popitem(last=False)
+        return retry_after
+
+
+async def _account_from_body(scope, body: bytes) -> Optional[str]:
+    # Forms (urlencoded or multipart) are parsed by Starlette, as the endpoint
+    # will parse them; a body it cannot parse is rejected there anyway
+    content_type = dict(scope.get("headers") or []).get(b"content-type", b"").decode()
+    try:
+        if content_type.startswith("application/json"):
+            payload = json.loads(body or b"{}")
+            if not isinstance(payload, dict):
+                return None
+            account = payload.get("email") or payload.get("username")
+        else:
+            async def receive():
+                return {"type": "http.request", "body": body, "more_body": False}
+
+            async with Request(scope, receive).form() as form:
+                account = form.get("username") or form.get("email")
+    except Exception:
+        return None
+    return account.strip().lower() if isinstance(account, str) else None
+
+
+# ASGI middleware guarding credential endpoints with per-IP and per-account
+# token buckets. It runs before routing, so throttled requests never reach
+# bcrypt or the database.
+class RateLimitMiddleware:
+    def __init__(
+        self,
+        app,
+        store: RateLimitStore,
+        paths: Iterable[str],
+        ip_rate: Tuple[float, float],
+        account_rate: Tuple[float, float],
+        trust_forwarded_for: bool = False,
+        proxy_hops: int = 1,
+    ):
+        # Rates are (tokens per second, burst capacity)
+        self.app = app
+        self.store = store
+        self.paths = set(paths)
+        self.ip_rate = ip_rate
+        self.account_rate = account_rate
+        self.trust_forwarded_for = trust_forwarded_for
+        self.proxy_hops = proxy_hops
+
+    def _client_ip(self, scope) -> str:
+        # Each of the proxy_hops trusted proxies appends the address it saw, so
+        # the client is proxy_hops entries from the right; entries further left
+        # were sent by the client and are not trusted
+        client = scope.get("client")
+        peer = client[0] if client else "unknown"
+        if not self.trust_forwarded_for:
+            return peer
+        values = [value.decode() for name, value in scope.get("headers") or [] if name == b"x-forwarded-for"]
+        hops = [hop.strip() for hop in ",".join(values).split(",") if hop.strip()]
+        return hops[-self.proxy_hops] if len(hops) >= self.proxy_hops else peer
+
+    async def _reject(self, scope, receive, send, retry_after: float):
+        response = JSONResponse(
+            status_code=429,
+            content={"detail": "Too many attempts, retry later"},
+            headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+        )
+        await response(scope, receive, send)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        # One bucket per address across all the guarded paths
+        retry_after = await self.store.consume(f"ip:{self._client_ip(scope)}", *self.ip_rate)
+        if retry_after:
+            await self._reject(scope, receive, send, retry_after)
+            return
+
+        # Buffer the (small) body to find the account, then replay it to the app
+        body = b""
+        more_body = True
+        while more_body and len(body) <= MAX_BODY_BYTES:
+            message = await receive()
+            if message["type"] != "http.request":
+                break
+            body += message.get("body", b"")
+            more_body = message.get("more_body", False)
+        if len(body) > MAX_BODY_BYTES:
+            # Padding a body past the limit must not hide the account
+            response = JSONResponse(status_code=413, content={"detail": "Request body too large"})
+            await response(scope, receive, send)
+            return
+
+        account = await _account_from_body(scope, body)
+        if account:
+            retry_after = await self.store.consume(f"account:{account}", *self.account_rate)
+            if retry_after:
+                await self._reject(scope, receive, send, retry_after)
+                return
+
+        replayed = False
+
+        async def replay():
+            nonlocal replayed
+            if not replayed:
+                replayed = True
+                return {"type": "http.request", "body": body, "more_body": more_body}
+            return await receive()
+
+        await self.app(scope, replay, send)
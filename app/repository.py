@@ -0,0 +1,521 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterator, List, Optional, Tuple
+
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import DeleteOne, InsertOne, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError, PyMongoError
+
+from app.bodies import pack_description
+from app.batch import apply_write_errors, mark_unmatched, mark_written, new_results, owned_targets, parse_ids
+from app.events import id_event, note_event
+from app.indexes import NOTES_APP_INDEXES, ensure_indexes
+from app.metrics import staged
+from app.migrations import DUPLICATE_KEY
+from app.pagination import finish_page, page_filter
+from app.storage import LIST_PROJECTION, StorageBackend
+
+BODY_PROJECTION = {"body.id": 1, "body.chunks": 1}
+
+
+def _stamp_revision(document: dict, revision: int):
+    document["revision"] = revision
+    document["created_revision"] = revision
+
+
+# Async persistence layer for users and notes backed by a pooled Motor client.
+# Public calls are timed as the "db" request stage.
+class MongoRepository(StorageBackend):
+    change_streams = True
+
+    def __init__(self, settings, event_listeners=None, client=None):
+        super().__init__(settings)
+        self.event_listeners = event_listeners or []
+        # A caller-supplied client (e.g. mongomock-motor) is used as is; like
+        # ours it must be tz_aware so stored datetimes come back as UTC
+        self.client = client
+        self.db = client[settings.mongodb_database] if client is not None else None
+
+    # Lifecycle
+    async def connect(self):
+        if self.client is not None:
+            return
+        self.client = AsyncIOMotorClient(
+            self.settings.mongodb_url,
+            maxPoolSize=self.settings.mongodb_pool_size(),
+            minPoolSize=min(self.settings.mongodb_min_pool_size, self.settings.mongodb_pool_size()),
+            serverSelectionTimeoutMS=self.settings.mongodb_timeout_ms,
+            connectTimeoutMS=self.settings.mongodb_timeout_ms,
+            socketTimeoutMS=self.settings.mongodb_socket_timeout_ms,
+            event_listeners=self.event_listeners,
+            tz_aware=True,
+        )
+        self.db = self.client[self.settings.mongodb_database]
+
+    async def close(self):
+        if self.client is not None:
+            self.client.close()
+        self.client = None
+        self.db = None
+
+    async def ping(self) -> bool:
+        try:
+            await self.client.admin.command("ping")
+        except PyMongoError:
+            return False
+        return True
+
+    async def ensure_indexes(self):
+        await ensure_indexes(self.db, NOTES_APP_INDEXES)
+
+    @property
+    def users_collection(self):
+        return self.db['users']
+
+    @property
+    def notes_collection(self):
+        return self.db['notes']
+
+    @property
+    def notes_meta_collection(self):
+        return self.db['notes_meta']
+
+    @property
+    def tombstones_collection(self):
+        return self.db['note_tombstones']
+
+    @property
+    def note_bodies_collection(self):
+        return self.db['note_bodies']
+
+    @property
+    def revoked_tokens_collection(self):
+        return self.db['revoked_tokens']
+
+    # Users
+    @staged("db")
+    async def get_user(self, email: str) -> Optional[dict]:
+        return await self.users_collection.find_one({"email": email})
+
+    @staged("db")
+    async def create_user(self, user_dict: dict) -> str:
+        result = await self.users_collection.insert_one(user_dict)
+        return str(result.inserted_id)
+
+    @staged("db")
+    async def update_user(self, email: str, fields: dict) -> int:
+        result = await self.users_collection.update_one({"email": email}, {"$set": fields})
+        return result.modified_count
+
+    # Revoked tokens
+    @staged("db")
+    async def revoke_tokens(self, tokens: List[dict]) -> int:
+        now = datetime.now(timezone.utc)
+        inserted = 0
+        # Callers revoke one or two tokens at a time; one upsert each reports
+        # whether that call recorded the jti
+        for token in tokens:
+            try:
+                result = await self.revoked_tokens_collection.update_one(
+                    {"jti": token["jti"]}, {"$setOnInsert": {**token, "revoked_at": now}}, upsert=True
+                )
+            except DuplicateKeyError:
+                # A concurrent upsert of the same jti won the race on jti_unique
+                continue
+            if result.upserted_id is not None:
+                inserted += 1
+        return inserted
+
+    @staged("db")
+    async def list_revoked_tokens(self, token_type: str, since: Optional[datetime] = None) -> List[dict]:
+        query = {"type": token_type, "expires_at": {"$gt": datetime.now(timezone.utc)}}
+        if since is not None:
+            query["revoked_at"] = {"$gte": since}
+        cursor = self.revoked_tokens_collection.find(query, {"_id": 0, "jti": 1, "type": 1, "expires_at": 1, "revoked_at": 1})
+        return await cursor.to_list(length=None)
+
+    # Per-user notes meta. "version" changes after every write that lands and
+    # validates cached lists and ETags. "revision" hands out the revisions
+    # stamped on notes and tombstones for the changes feed: each write reserves
+    # its revisions first and lists them in "pending" until it is done, so the
+    # feed never moves past a write that is still in flight.
+    @staged("db")
+    async def get_notes_version(self, user_id: str) -> Tuple[int, Optional[datetime]]:
+        meta = await self.notes_meta_collection.find_one({"_id": user_id}, {"version": 1, "updated_at": 1})
+        if not meta:
+            return 0, None
+        return meta.get("version", 0), meta.get("updated_at")
+
+    async def _reserve_revisions(self, user_id: str, count: int) -> int:
+        # Returns the first of count consecutive revisions; release them with
+        # _release_revisions. Meta written when the version doubled as the
+        # revision continues from the version. Entries left behind by a worker
+        # that died mid-write are dropped once their lease is over.
+        now = datetime.now(timezone.utc)
+        expired = now - timedelta(seconds=self.settings.revision_lease_seconds)
+        meta = await self.notes_meta_collection.find_one_and_update(
+            {"_id": user_id},
+            [
+                {"$set": {"revision": {"$ifNull": ["$revision", {"$ifNull": ["$version", 0]}]}}},
+                {"$set": {
+                    "revision": {"$add": ["$revision", count]},
+                    "pending": {"$concatArrays": [
+                        {"$filter": {"input": {"$ifNull": ["$pending", []]}, "cond": {"$gte": ["$$this.at", expired]}}},
+                        # A one-item $map builds the new entry from the field values
+                        {"$map": {"input": [0], "in": {"first": {"$add": ["$revision", 1]}, "at": now}}},
+                    ]},
+                }},
+            ],
+            projection={"revision": 1},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        return meta["revision"] - count + 1
+
+    async def _release_revisions(self, user_id: str, first_revision: int, written: bool):
+        # Callers pass written=True unless they know nothing landed
+        update = {"$pull": {"pending": {"first": first_revision}}}
+        if written:
+            update["$inc"] = {"version": 1}
+            update["$set"] = {"updated_at": datetime.now(timezone.utc)}
+        await self.notes_meta_collection.update_one({"_id": user_id}, update)
+
+    async def _changes_upper_bound(self, user_id: str) -> Optional[int]:
+        # The highest revision the feed may return: below the oldest reservation
+        # still in flight, and no later than the last one handed out before this
+        # read, so a write landing afterwards can never carry a revision the
+        # client has already passed
+        meta = await self.notes_meta_collection.find_one({"_id": user_id}, {"revision": 1, "version": 1, "pending": 1})
+        if meta is None:
+            return None
+        upper = meta.get("revision", meta.get("version", 0))
+        expired = datetime.now(timezone.utc) - timedelta(seconds=self.settings.revision_lease_seconds)
+        in_flight = [entry["first"] for entry in meta.get("pending", []) if entry["at"] >= expired]
+        if in_flight:
+            upper = min(upper, min(in_flight) - 1)
+        return upper
+
+    async def _write_tombstones(self, user_id: str, entry_ids: List[ObjectId]) -> List[ObjectId]:
+        # The notes are already gone, so the reservation always counts as written.
+        # user_id_note_id_unique admits one tombstone per note: when two deletes
+        # race, only the one that records it reports and publishes the delete.
+        # Returns the ids recorded by this call.
+        first_revision = await self._reserve_revisions(user_id, len(entry_ids))
+        deleted_at = datetime.now(timezone.utc)
+        duplicates = set()
+        try:
+            await self.tombstones_collection.insert_many([
+                {"note_id": entry_id, "user_id": user_id, "revision": first_revision + offset, "deleted_at": deleted_at}
+                for offset, entry_id in enumerate(entry_ids)
+            ], ordered=False)
+        except BulkWriteError as exc:
+            if any(error["code"] != DUPLICATE_KEY for error in exc.details.get("writeErrors", [])):
+                raise
+            duplicates = {error["index"] for error in exc.details["writeErrors"]}
+        finally:
+            await self._release_revisions(user_id, first_revision, True)
+        recorded = []
+        for offset, entry_id in enumerate(entry_ids):
+            if offset not in duplicates:
+                recorded.append(entry_id)
+                self._publish(user_id, id_event("delete", entry_id, first_revision + offset))
+        return recorded
+
+    # Notes
+    @staged("db")
+    async def create_note(self, note_dict: dict) -> str:
+        user_id = note_dict["user_id"]
+        document = await self._new_note_document(user_id, note_dict, datetime.now(timezone.utc))
+        revision = await self._reserve_revisions(user_id, 1)
+        try:
+            _stamp_revision(document, revision)
+            result = await self.notes_collection.insert_one(document)
+        finally:
+            await self._release_revisions(user_id, revision, True)
+        self._publish(user_id, note_event("insert", document))
+        return str(result.inserted_id)
+
+    @staged("db")
+    async def list_notes_page(
+        self,
+        user_id: str,
+        limit: int,
+        after: Optional[str] = None,
+        projection: Optional[dict] = None,
+    ) -> Tuple[List[dict], Optional[str]]:
+        cursor = self.notes_collection.find(page_filter({"user_id": user_id}, after), projection or LIST_PROJECTION)
+        documents = await cursor.sort("_id", 1).limit(limit + 1).to_list(length=limit + 1)
+        return finish_page(documents, limit)
+
+    async def iter_notes(self, user_id: str, batch_size: int = 1000) -> AsyncIterator[dict]:
+        # Streams a user's notes in _id order without materialising the result set
+        cursor = self.notes_collection.find({"user_id": user_id}, {"search_text": 0}).sort("_id", 1).batch_size(batch_size)
+        async for document in cursor:
+            yield document
+
+    @staged("db")
+    async def search_notes(self, user_id: str, query: str, limit: int, offset: int = 0) -> List[dict]:
+        # Ranked by text score; fetches one extra hit so callers can tell if more exist
+        cursor = self.notes_collection.find(
+            {"user_id": user_id, "$text": {"$search": query}},
+            {"score": {"$meta": "textScore"}, "title": 1, "description": 1, "user_id": 1, "body.size": 1},
+        )
+        cursor = cursor.sort([("score", {"$meta": "textScore"})]).skip(offset).limit(limit + 1)
+        return await cursor.to_list(length=limit + 1)
+
+    @staged("db")
+    async def get_note(self, entry_id: str, user_id: str) -> Optional[dict]:
+        return await self.notes_collection.find_one({"_id": ObjectId(entry_id), "user_id": user_id}, {"search_text": 0})
+
+    @staged("db")
+    async def list_changes(self, user_id: str, since: int, limit: int) -> Tuple[List[dict], bool]:
+        # Merges live notes and tombstones newer than since into one revision-ordered feed
+        query = {"user_id": user_id, "revision": {"$gt": since}}
+        upper = await self._changes_upper_bound(user_id)
+        if upper is not None:
+            query["revision"]["$lte"] = upper
+        notes = await self.notes_collection.find(query, LIST_PROJECTION).sort("revision", 1).limit(limit + 1).to_list(length=limit + 1)
+        tombstones = await self.tombstones_collection.find(query).sort("revision", 1).limit(limit + 1).to_list(length=limit + 1)
+        changes = []
+        for note in notes:
+            op = "insert" if note.get("created_revision", 0) > since else "update"
+            changes.append({"op": op, "revision": note["revision"], "note": note})
+        for tombstone in tombstones:
+            changes.append({"op": "delete", "revision": tombstone["revision"], "note_id": tombstone["note_id"]})
+        changes.sort(key=lambda change: change["revision"])
+        return changes[:limit], len(changes) > limit
+
+    @staged("db")
+    async def update_note(
+        self,
+        entry_id: str,
+        user_id: str,
+        fields: dict,
+        expected_version: Optional[int] = None,
+    ) -> Optional[dict]:
+        # Returns the updated note, or None when it is missing, not owned by the
+        # user, or no longer at expected_version. The revision is reserved first,
+        # so a failed update leaves a harmless gap in the sequence and keeps the
+        # notes version (and with it every cached list) as it was.
+        query = {"_id": ObjectId(entry_id), "user_id": user_id}
+        if expected_version is not None:
+            # Notes written before versioning have no version field and count as 0
+            query["version"] = expected_version if expected_version else {"$in": [0, None]}
+        fields = await self._store_body(query["_id"], fields)
+        revision = await self._reserve_revisions(user_id, 1)
+        written = True
+        try:
+            changes = {**fields, "revision": revision, "updated_at": datetime.now(timezone.utc)}
+            # The previous document tells which out-of-line body (if any) to drop
+            previous = await self.notes_collection.find_one_and_update(
+                query,
+                {"$set": changes, "$inc": {"version": 1}},
+                projection={"search_text": 0},
+                return_document=ReturnDocument.BEFORE,
+            )
+            written = previous is not None
+        finally:
+            await self._release_revisions(user_id, revision, written)
+        if previous is None:
+            await self._drop_replaced_bodies([fields.get("body")])
+            return None
+        if "body" in fields:
+            await self._drop_replaced_bodies([previous.get("body")])
+        updated_entry = {**previous, **changes, "version": (previous.get("version") or 0) + 1}
+        self._publish(user_id, note_event("update", updated_entry))
+        return updated_entry
+
+    @staged("db")
+    async def delete_note(self, entry_id: str, user_id: str) -> int:
+        deleted = await self.notes_collection.find_one_and_delete(
+            {"_id": ObjectId(entry_id), "user_id": user_id},
+            projection=BODY_PROJECTION,
+        )
+        if deleted is None:
+            return 0
+        await self._drop_replaced_bodies([deleted.get("body")])
+        await self._write_tombstones(user_id, [deleted["_id"]])
+        return 1
+
+    # Large note bodies (see app/bodies.py)
+    async def _store_body(self, note_id: ObjectId, fields: dict) -> dict:
+        # Compresses a large description; out-of-line chunks are written before
+        # any note points at them
+        description = fields.get("description")
+        if description is not None and len(description) >= self.settings.note_compress_threshold_bytes:
+            # Compressing megabytes would stall the event loop
+            packed, chunks = await asyncio.get_running_loop().run_in_executor(None, pack_description, description, self.settings)
+        else:
+            packed, chunks = pack_description(description, self.settings)
+        if chunks:
+            await self.note_bodies_collection.insert_many([
+                {"note_id": note_id, "body_id": packed["body"]["id"], "n": n, "data": chunk}
+                for n, chunk in enumerate(chunks)
+            ])
+        return {**fields, **packed}
+
+    async def _drop_replaced_bodies(self, bodies: List[Optional[dict]]):
+        body_ids = [body["id"] for body in bodies if body and body.get("chunks")]
+        if body_ids:
+            await self.note_bodies_collection.delete_many({"body_id": {"$in": body_ids}})
+
+    async def iter_body_chunks(self, body_id) -> AsyncIterator[bytes]:
+        cursor = self.note_bodies_collection.find({"body_id": body_id}, {"data": 1}).sort("n", 1)
+        async for document in cursor:
+            yield document["data"]
+
+    # Batches
+    async def _bulk_write(self, operations, op_items: List[int], results: List[dict], ordered: bool, ok_status: str) -> dict:
+        # Returns the raw bulk result (nInserted, nMatched, ...)
+        if not operations:
+            return {}
+        try:
+            result = await self.notes_collection.bulk_write(operations, ordered=ordered)
+        except BulkWriteError as exc:
+            apply_write_errors(results, op_items, exc.details, ordered, ok_status)
+            return exc.details
+        mark_written(results, op_items, ok_status)
+        return result.bulk_api_result
+
+    async def _batch_targets(self, user_id: str, entry_ids: List[str], results: List[dict], ordered: bool) -> Tuple[List[Tuple[int, ObjectId]], dict]:
+        # Resolves ids the user owns in one query; everything else is reported per item.
+        # Also returns the current body of each owned note that has one.
+        parsed = parse_ids(results, entry_ids)
+        cursor = self.notes_collection.find({"_id": {"$in": [oid for _, oid in parsed]}, "user_id": user_id}, BODY_PROJECTION)
+        owned = {document["_id"]: document.get("body") async for document in cursor}
+        bodies = {oid: body for oid, body in owned.items() if body}
+        return owned_targets(results, parsed, owned, ordered), bodies
+
+    async def _new_note_document(self, user_id: str, note: dict, now: datetime) -> dict:
+        # Keeps an _id the caller generated up front; the revision is stamped
+        # with _stamp_revision once reserved
+        document = {
+            "_id": ObjectId(),
+            **note,
+            "user_id": user_id,
+            "version": 1,
+            "updated_at": now,
+        }
+        document = await self._store_body(document["_id"], document)
+        for field in ("body", "search_text"):
+            if field in document and document[field] is None:
+                del document[field]
+        return document
+
+    @staged("db")
+    async def create_notes(self, user_id: str, notes: List[dict], ordered: bool = True) -> List[dict]:
+        results = new_results(len(notes))
+        if not notes:
+            return results
+        now = datetime.now(timezone.utc)
+        documents = []
+        for index, note in enumerate(notes):
+            document = await self._new_note_document(user_id, note, now)
+            results[index]["id"] = str(document["_id"])
+            documents.append(document)
+        first_revision = await self._reserve_revisions(user_id, len(notes))
+        written = True
+        try:
+            for offset, document in enumerate(documents):
+                _stamp_revision(document, first_revision + offset)
+            operations = [InsertOne(document) for document in documents]
+            await self._bulk_write(operations, list(range(len(notes))), results, ordered, "created")
+            written = any(result["status"] == "created" for result in results)
+        finally:
+            await self._release_revisions(user_id, first_revision, written)
+        for index, document in enumerate(documents):
+            if results[index]["status"] == "created":
+                self._publish(user_id, note_event("insert", document))
+        return results
+
+    @staged("db")
+    async def create_notes_for_users(self, items: List[Tuple[str, dict]]) -> List[dict]:
+        # Unordered inserts for many users in one bulk write; revisions are
+        # reserved with one update per distinct user
+        results = new_results(len(items))
+        now = datetime.now(timezone.utc)
+        documents = []
+        counts = {}
+        for index, (user_id, note) in enumerate(items):
+            document = await self._new_note_document(user_id, note, now)
+            results[index]["id"] = str(document["_id"])
+            documents.append(document)
+            counts[user_id] = counts.get(user_id, 0) + 1
+        first_revisions = {}
+        try:
+            for user_id, count in counts.items():
+                first_revisions[user_id] = await self._reserve_revisions(user_id, count)
+            next_revision = dict(first_revisions)
+            for document in documents:
+                _stamp_revision(document, next_revision[document["user_id"]])
+                next_revision[document["user_id"]] += 1
+            operations = [InsertOne(document) for document in documents]
+            await self._bulk_write(operations, list(range(len(items))), results, False, "created")
+        finally:
+            for user_id, first_revision in first_revisions.items():
+                await self._release_revisions(user_id, first_revision, True)
+        for index, document in enumerate(documents):
+            if results[index]["status"] == "created":
+                self._publish(document["user_id"], note_event("insert", document))
+        return results
+
+    @staged("db")
+    async def update_notes(self, user_id: str, updates: List[dict], ordered: bool = True) -> List[dict]:
+        # Each update is {"id": ..., <field>: <value>}; None values are left untouched
+        results = new_results(len(updates))
+        targets, bodies = await self._batch_targets(user_id, [update["id"] for update in updates], results, ordered)
+        changed = []
+        for index, oid in targets:
+            fields = {key: value for key, value in updates[index].items() if key != "id" and value is not None}
+            if fields:
+                changed.append((index, oid, await self._store_body(oid, fields)))
+            else:
+                results[index]["status"] = "unchanged"
+        if not changed:
+            return results
+        first_revision = await self._reserve_revisions(user_id, len(changed))
+        written = True
+        try:
+            now = datetime.now(timezone.utc)
+            operations = []
+            for offset, (index, oid, fields) in enumerate(changed):
+                operations.append(UpdateOne(
+                    {"_id": oid, "user_id": user_id},
+                    {"$set": {**fields, "revision": first_revision + offset, "updated_at": now}, "$inc": {"version": 1}},
+                ))
+            details = await self._bulk_write(operations, [index for index, _, _ in changed], results, ordered, "updated")
+            applied = [(index, oid) for index, oid, _ in changed if results[index]["status"] == "updated"]
+            # Notes deleted since _batch_targets match nothing; find which ones
+            if details.get("nMatched", len(applied)) < len(applied):
+                cursor = self.notes_collection.find({"_id": {"$in": [oid for _, oid in applied]}, "user_id": user_id}, {"_id": 1})
+                mark_unmatched(results, applied, [document["_id"] async for document in cursor], "updated")
+            written = any(results[index]["status"] == "updated" for index, _, _ in changed)
+        finally:
+            await self._release_revisions(user_id, first_revision, written)
+        replaced = []
+        for offset, (index, oid, fields) in enumerate(changed):
+            if "body" not in fields:
+                continue
+            replaced.append(bodies.get(oid) if results[index]["status"] == "updated" else fields["body"])
+        await self._drop_replaced_bodies(replaced)
+        for offset, (index, oid, _) in enumerate(changed):
+            if results[index]["status"] == "updated":
+                self._publish(user_id, id_event("update", oid, first_revision + offset))
+        return results
+
+    @staged("db")
+    async def delete_notes(self, user_id: str, entry_ids: List[str], ordered: bool = True) -> List[dict]:
+        results = new_results(len(entry_ids))
+        targets, bodies = await self._batch_targets(user_id, entry_ids, results, ordered)
+        operations = [DeleteOne({"_id": oid, "user_id": user_id}) for _, oid in targets]
+        await self._bulk_write(operations, [index for index, _ in targets], results, ordered, "deleted")
+        deleted = [(index, oid) for index, oid in targets if results[index]["status"] == "deleted"]
+        if not deleted:
+            return results
+        # A note deleted concurrently since _batch_targets is gone either way;
+        # the tombstone decides which of the deletes it is reported by
+        recorded = await self._write_tombstones(user_id, [oid for _, oid in deleted])
+        mark_unmatched(results, deleted, recorded, "deleted")
+        await self._drop_replaced_bodies([bodies.get(oid) for oid in recorded])
+        return results
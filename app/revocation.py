@@ -0,0 +1,96 @@
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional
+
+from app.tokens import ACCESS
+
+logger = logging.getLogger(__name__)
+
+# Re-read revocations recorded this long before the newest one seen, in case
+# another worker's write landed after a sync had already passed its timestamp
+SYNC_OVERLAP = timedelta(seconds=30)
+
+
+# Server-side logout. Revocations are keyed by the token's jti and kept in
+# storage until the token would have expired anyway.
+#
+# Access tokens are checked on every request, so their revocations are held in
+# an in-memory hash set (jti -> expiry) that each worker refreshes from storage
+# every sync_seconds; a lookup never leaves the process, and a logout on one
+# worker reaches the others within one sync. Revoked access tokens live at most
+# access_token_expire_minutes, which keeps the set small. Refresh tokens are
+# only presented to /token/refresh, which revokes them as it uses them: storage
+# records each jti once, so only one use of a refresh token succeeds and the
+# set does not have to hold two weeks of rotated tokens.
+class RevocationList:
+    def __init__(self, repository, sync_seconds: float = 5.0):
+        self.repository = repository
+        self.sync_seconds = sync_seconds
+        self._revoked: Dict[str, float] = {}
+        self._synced_until: Optional[datetime] = None
+        self.revocations = 0
+        self.rejected = 0
+        self.syncs = 0
+
+    def is_revoked(self, jti: Optional[str]) -> bool:
+        # Tokens issued before jti existed cannot be revoked
+        if jti is None:
+            return False
+        expires_at = self._revoked.get(jti)
+        if expires_at is None:
+            return False
+        if expires_at <= time.time():
+            self._revoked.pop(jti, None)
+            return False
+        self.rejected += 1
+        return True
+
+    async def revoke(self, claims: dict) -> bool:
+        # claims are verified token claims; tokens without a jti are ignored.
+        # Returns whether this call revoked the token, i.e. it was not revoked before.
+        jti = claims.get("jti")
+        if jti is None:
+            return False
+        token_type = claims.get("type", ACCESS)
+        if token_type == ACCESS:
+            self._revoked[jti] = claims["exp"]
+        inserted = await self.repository.revoke_tokens([{
+            "jti": jti,
+            "type": token_type,
+            "expires_at": datetime.fromtimestamp(claims["exp"], timezone.utc),
+        }])
+        self.revocations += 1
+        return inserted == 1
+
+    async def sync(self):
+        since = self._synced_until - SYNC_OVERLAP if self._synced_until is not None else None
+        entries = await self.repository.list_revoked_tokens(ACCESS, since)
+        for entry in entries:
+            self._revoked[entry["jti"]] = entry["expires_at"].timestamp()
+            revoked_at = entry["revoked_at"]
+            if self._synced_until is None or revoked_at > self._synced_until:
+                self._synced_until = revoked_at
+        now = time.time()
+        for jti in [jti for jti, expires_at in self._revoked.items() if expires_at <= now]:
+            del self._revoked[jti]
+        self.syncs += 1
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.sync_seconds)
+            try:
+                await self.sync()
+            except Exception:
+                # Keep serving with the current set; the next sync catches up
+                logger.exception("Syncing revoked tokens failed")
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._revoked),
+            "revocations": self.revocations,
+            "rejected": self.rejected,
+            "syncs": self.syncs,
+        }
+
@@ -1,114 +0,0 @@
-from fastapi import APIRouter, HTTPException, Depends, Header
-from pydantic import BaseModel
-from passlib.context import CryptContext
-from jose import JWTError, jwt
-from datetime import datetime, timedelta
-from typing import Optional
-from database import db
-
-router = APIRouter()
-
-SECRET_KEY = "your_secret_key"
-ALGORITHM = "HS256"
-ACCESS_TOKEN_EXPIRE_MINUTES = 30
-
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
-users_collection = db["Users"]
-
-class User(BaseModel):
-    username: str
-    email: str
-    password: str
-
-class UserInDB(User):
-    hashed_password: str
-
-class Token(BaseModel):
-    access_token: str
-    token_type: str
-
-class TokenData(BaseModel):
-    username: Optional[str] = None
-
-def get_password_hash(password):
-    return pwd_context.hash(password)
-
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
-
-def authenticate_user(username: str, password: str):
-    user = users_collection.find_one({"username": username})
-    if not user:
-        return False
-    if not verify_password(password, user["hashed_password"]):
-        return False
-    return user
-
-def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
-    to_encode = data.copy()
-    if expires_delta:
-        expire = datetime.utcnow() + expires_delta
-    else:
-        expire = datetime.utcnow() + timedelta(minutes=15)
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
-    return encoded_jwt
-
-# Function to extract token from header
-def get_token_from_header(authorization: str = Header(None)):
-    if authorization is None:
-        raise HTTPException(
-            status_code=401,
-            detail="Authorization header missing",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-    token_prefix, token = authorization.split()
-    return token
-
-# Dependency to get current user
-def get_current_user(token: str = Depends(get_token_from_header)):
-    credentials_exception = HTTPException(
-        status_code=401,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
-            raise credentials_exception
-        token_data = TokenData(username=username)
-    except JWTError:
-        raise credentials_exception
-    user = users_collection.find_one({"username": token_data.username})
-    if user is None:
-        raise credentials_exception
-    return user
-
-@router.post("/register/")
-def register_user(user: User):
-    user_in_db = users_collection.find_one({"username": user.username})
-    if user_in_db:
-        raise HTTPException(status_code=400, detail="Username already registered")
-    hashed_password = get_password_hash(user.password)
-    user_dict = user.dict()
-    user_dict["hashed_password"] = hashed_password
-    del user_dict["password"]
-    result = users_collection.insert_one(user_dict)
-    return {"message": "User registered successfully"}
-
-@router.post("/login/", response_model=Token)
-def login_for_access_token(user: User):
-    db_user = authenticate_user(user.username, user.password)
-    if not db_user:
-        raise HTTPException(
-            status_code=401,
-            detail="Incorrect username or password",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-    access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = create_access_token(
-        data={"sub": db_user["username"]}, expires_delta=access_token_expires
-    )
-    return {"access_token": access_token, "token_type": "bearer"}
@@ -0,0 +1,47 @@
+import html
+import re
+from typing import List
+
+SNIPPET_WIDTH = 160
+
+_token_re = re.compile(r"\w+", re.UNICODE)
+
+
+def query_terms(query: str) -> List[str]:
+    # Quoted phrases and negations are handled by Mongo; only plain words get highlighted
+    terms = []
+    for token in _token_re.findall(query.lower()):
+        if token not in terms:
+            terms.append(token)
+    return terms
+
+def _term_pattern(terms: List[str]):
+    # Prefix match so stemmed hits like "running" for "run" are still marked
+    return re.compile(r"\b(" + "|".join(re.escape(t) for t in terms) + r")\w*", re.IGNORECASE)
+
+def highlight(text: str, terms: List[str], width: int = SNIPPET_WIDTH) -> str:
+    # Returns an HTML-escaped window of text around the first hit with hits wrapped in <mark>
+    text = text or ""
+    if not terms:
+        return html.escape(text[:width])
+    pattern = _term_pattern(terms)
+    first = pattern.search(text)
+    start = 0
+    if first and len(text) > width:
+        start = max(0, min(first.start() - width // 3, len(text) - width))
+    window = text[start:start + width]
+
+    parts = []
+    last = 0
+    for match in pattern.finditer(window):
+        parts.append(html.escape(window[last:match.start()]))
+        parts.append("<mark>" + html.escape(match.group(0)) + "</mark>")
+        last = match.end()
+    parts.append(html.escape(window[last:]))
+
+    snippet = "".join(parts)
+    if start > 0:
+        snippet = "…" + snippet
+    if start + width < len(text):
+        snippet += "…"
+    return snippet
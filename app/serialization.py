@@ -0,0 +1,55 @@
+import json
+from typing import Any, Optional
+
+from fastapi.responses import Response
+
+try:
+    import orjson
+except ImportError:  # optional speed-up
+    orjson = None
+
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, default=str)
+    return json.dumps(content, default=str, separators=(",", ":"), ensure_ascii=False).encode()
+
+
+# Renders already-shaped dicts (or pre-encoded bytes) without FastAPI's
+# response_model validation pass
+class FastJSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, bytes):
+            return content
+        return dumps(content)
+
+
+def note_summary(entry: dict, include_user: bool = True) -> dict:
+    # Same shape as NoteSummaryResponse with response_model_exclude_none
+    summary = {"id": str(entry["_id"])}
+    if include_user:
+        summary["user_id"] = entry.get("user_id")
+    title = entry.get("title")
+    if title is not None:
+        summary["title"] = title
+    description = entry.get("description")
+    if description is not None:
+        summary["description"] = description
+    body = entry.get("body")
+    if body:
+        # The description is only a preview; the full text is at /notes/{id}/body
+        summary["truncated"] = True
+        summary["body_size"] = body.get("size")
+    return summary
+
+def note_page(entries: list, next_cursor: Optional[str], user_id: Optional[str] = None) -> dict:
+    # With user_id, the compact shape: the owner is stated once on the envelope
+    page = {}
+    if user_id is not None:
+        page["user_id"] = user_id
+    page["items"] = [note_summary(entry, include_user=user_id is None) for entry in entries]
+    if next_cursor is not None:
+        page["next_cursor"] = next_cursor
+    return page
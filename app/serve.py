@@ -0,0 +1,45 @@
+import argparse
+import os
+
+from app.settings import ENV_PREFIX, Settings
+
+# Production entry point: N uvicorn worker processes, each building its own
+# application (and Motor pool) through main.create_app. On SIGTERM uvicorn
+# stops accepting connections and waits up to graceful_shutdown_seconds for
+# in-flight requests before running the lifespan shutdown.
+#
+#     python -m app.serve --workers 16 --host 0.0.0.0 --port 8000
+
+
+def serve(settings: Settings):
+    import uvicorn
+
+    # Workers rebuild their settings from the environment, so pass the command
+    # line overrides along; the worker count also sizes each worker's pool
+    os.environ[f"{ENV_PREFIX}WORKERS"] = str(settings.workers)
+    uvicorn.run(
+        "main:create_app",
+        factory=True,
+        host=settings.host,
+        port=settings.port,
+        workers=settings.workers,
+        timeout_graceful_shutdown=settings.graceful_shutdown_seconds,
+        lifespan="on",
+    )
+
+def main(argv=None):
+    settings = Settings()
+    parser = argparse.ArgumentParser(description="Run the notes API with multiple worker processes")
+    parser.add_argument("--host", default=settings.host)
+    parser.add_argument("--port", type=int, default=settings.port)
+    parser.add_argument("--workers", type=int, default=settings.workers, help="0 means one per CPU")
+    parser.add_argument("--graceful-shutdown-seconds", type=int, default=settings.graceful_shutdown_seconds)
+    args = parser.parse_args(argv)
+    settings.host = args.host
+    settings.port = args.port
+    settings.workers = args.workers or os.cpu_count() or 1
+    settings.graceful_shutdown_seconds = args.graceful_shutdown_seconds
+    serve(settings)
+
+if __name__ == "__main__":
+    main()
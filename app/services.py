@@ -0,0 +1,103 @@
+from datetime import timedelta
+from typing import Optional
+
+from fastapi import Request
+
+from app.cache import MemoryCacheBackend, TTLCache
+from app.events import NoteEventBroker
+from app.hashing import PasswordHasher
+from app.metrics import REGISTRY, MongoCommandMetrics
+from app.ratelimit import MemoryRateLimitStore
+from app.revocation import RevocationList
+from app.storage import StorageBackend, create_repository
+from app.tokens import TokenService, parse_deadline, parse_signing_keys
+from app.writebehind import InsertBatcher
+
+
+# Everything one application instance shares between requests, built from its
+# settings by create_app and kept on app.state. Building it opens no
+# connections and starts no threads; that happens in the app's lifespan.
+# A repository can be passed in (e.g. one wrapping a mongomock client).
+class Services:
+    def __init__(self, settings, repository: Optional[StorageBackend] = None):
+        self.settings = settings
+        self.repository = repository or create_repository(
+            settings,
+            event_listeners=[MongoCommandMetrics()] if settings.metrics_enabled else None,
+        )
+        self.note_events = NoteEventBroker(
+            max_connections=settings.stream_max_connections,
+            queue_size=settings.stream_queue_size,
+        )
+        self.notes_cache = MemoryCacheBackend(
+            max_entries=settings.notes_cache_max_entries,
+            max_bytes=settings.notes_cache_max_bytes,
+            ttl=settings.notes_cache_ttl_seconds,
+        ) if settings.notes_cache_enabled else None
+        self.password_hasher = PasswordHasher(
+            rounds=settings.bcrypt_rounds,
+            max_workers=settings.hash_max_workers,
+            max_queue=settings.hash_max_queue,
+        )
+        signing_keys = parse_signing_keys(settings.signing_keys, settings.secret_key)
+        # secret_key verifies kid-less tokens while it is the signing key, or for a
+        # grace period after signing_keys replaced it
+        legacy_until = parse_deadline(settings.legacy_tokens_until)
+        legacy_secret = settings.secret_key if not settings.signing_keys or legacy_until is not None else None
+        if legacy_secret is not None and settings.secret_key == type(settings).secret_key:
+            raise ValueError("secret_key is still the public default; set NOTES_SECRET_KEY or NOTES_SIGNING_KEYS")
+        self.token_service = TokenService(
+            signing_keys,
+            settings.signing_key_id or next(iter(signing_keys)),
+            algorithm=settings.algorithm,
+            access_ttl=timedelta(minutes=settings.access_token_expire_minutes),
+            refresh_ttl=timedelta(days=settings.refresh_token_expire_days),
+            legacy_secret=legacy_secret,
+            legacy_until=legacy_until,
+            cache_size=settings.token_cache_size,
+        )
+        self.revocations = RevocationList(self.repository, sync_seconds=settings.token_revocation_sync_seconds)
+        self.user_cache = TTLCache(maxsize=settings.user_cache_size, ttl=settings.user_cache_ttl_seconds)
+        self.rate_limit_store = MemoryRateLimitStore()
+        self.insert_batcher = InsertBatcher(
+            self.repository,
+            max_batch=settings.insert_batch_max_size,
+            max_delay_ms=settings.insert_batch_max_delay_ms,
+            max_queue=settings.insert_batch_max_queue,
+            ack=settings.insert_batch_ack,
+        ) if settings.insert_batching_enabled else None
+        self.background_tasks = []
+
+    def use_in_process_events(self):
+        self.repository.events = self.note_events
+
+    def register_metrics(self):
+        # Component counters are read at scrape time; the process-wide registry
+        # reports the most recently created application
+        REGISTRY.gauges_from_stats("user_cache", self.user_cache.stats, ["size", "hits", "misses", "evictions", "expirations"])
+        REGISTRY.gauges_from_stats("token_cache", self.token_service.stats, ["size", "hits", "misses", "evictions", "expirations"])
+        REGISTRY.gauges_from_stats("revoked_tokens", self.revocations.stats, ["size", "revocations", "rejected", "syncs"])
+        REGISTRY.gauges_from_stats("password_hasher", self.password_hasher.stats, ["in_flight", "operations", "rejected", "queue_wait_seconds", "hash_seconds"])
+        REGISTRY.gauges_from_stats("note_events", self.note_events.stats, ["connections", "published", "overflows"])
+        if self.notes_cache is not None:
+            REGISTRY.gauges_from_stats("notes_cache", self.notes_cache.stats, ["entries", "bytes", "hits", "misses", "evictions", "invalidations"])
+        if self.insert_batcher is not None:
+            REGISTRY.gauges_from_stats("note_insert_queue", self.insert_batcher.stats, ["depth", "batches", "inserted", "failed", "rejected"])
+
+    def stats(self) -> dict:
+        return {
+            "user_cache": self.user_cache.stats(),
+            "password_hasher": self.password_hasher.stats(),
+            "token_cache": self.token_service.stats(),
+            "revoked_tokens": self.revocations.stats(),
+            "note_events": self.note_events.stats(),
+            "notes_cache": self.notes_cache.stats() if self.notes_cache is not None else None,
+            "note_insert_queue": self.insert_batcher.stats() if self.insert_batcher is not None else None,
+        }
+
+
+def get_services(request: Request) -> Services:
+    return request.app.state.services
+
+def get_repository(request: Request) -> StorageBackend:
+    return request.app.state.services.repository
@@ -0,0 +1,147 @@
+import os
+from typing import Any, Mapping, Optional
+
+ENV_PREFIX = "NOTES_"
+
+
+def _coerce(default: Any, raw: str) -> Any:
+    if isinstance(default, bool):
+        return raw.strip().lower() in ("1", "true", "yes", "on")
+    if isinstance(default, tuple):
+        item_type = type(default[0]) if default else str
+        return tuple(_coerce(item_type(), part.strip()) for part in raw.split(",") if part.strip())
+    if isinstance(default, (int, float)):
+        return type(default)(raw)
+    return raw
+
+
+# Defaults live on the class; each one can be overridden by a NOTES_<NAME>
+# environment variable (tuples as comma-separated lists) or a keyword argument
+class Settings:
+    # "mongodb", or "sqlite" for an embedded database file at sqlite_path
+    storage_backend = "mongodb"
+    sqlite_path = "notes.db"
+    sqlite_readers = 4
+    sqlite_busy_timeout_ms = 5000
+    mongodb_url = "mongodb://localhost:27017"
+    mongodb_database = "notes-app"
+    mongodb_max_pool_size = 100
+    mongodb_min_pool_size = 0
+    # Connection budget for the whole server; when set, each worker gets an equal share
+    # instead of mongodb_max_pool_size
+    mongodb_total_pool_size = 0
+    mongodb_timeout_ms = 5000
+    mongodb_socket_timeout_ms = 20000
+    create_indexes_on_startup = True
+    # Server mode (python -m app.serve)
+    host = "127.0.0.1"
+    port = 8000
+    workers = 1
+    graceful_shutdown_seconds = 30
+    readiness_timeout_seconds = 2.0
+    # "notes" is the API at the root; "notebook" serves the old app/main.py clients under /api
+    routers = ("notes",)
+    cors_origins = ("*",)
+    # The default is public; the app refuses to start while secret_key would be used with it
+    secret_key = "your_secret_key_here"
+    algorithm = "HS256"
+    # "kid:secret" entries for rotation; new tokens use signing_key_id (default:
+    # the first). Without any, secret_key signs and verifies kid-less tokens. With
+    # them, kid-less tokens are rejected unless legacy_tokens_until (ISO 8601, UTC)
+    # is set; set it past the refresh token lifetime and remove it afterwards.
+    signing_keys = ()
+    signing_key_id = ""
+    legacy_tokens_until = ""
+    access_token_expire_minutes = 15
+    refresh_token_expire_days = 14
+    token_cache_size = 10000
+    # How often each worker picks up logouts made on other workers
+    token_revocation_sync_seconds = 5.0
+    bcrypt_rounds = 12
+    hash_max_workers = 4
+    hash_max_queue = 64
+    user_cache_size = 10000
+    user_cache_ttl_seconds = 60
+    # Build the principal from signed token claims instead of loading the user
+    trust_token_claims = False
+    notes_page_size = 100
+    notes_max_page_size = 1000
+    export_batch_size = 1000
+    search_page_size = 20
+    search_max_page_size = 100
+    max_batch_size = 1000
+    changes_page_size = 500
+    changes_max_page_size = 5000
+    # MongoDB: a revision reserved by a worker that died mid-write stops
+    # holding back the changes feed after this long
+    revision_lease_seconds = 60.0
+    # Requires a replica set; otherwise events are published in-process by this worker
+    change_streams_enabled = True
+    stream_max_connections = 1000
+    stream_queue_size = 100
+    stream_heartbeat_seconds = 15
+    # Encode list responses straight from Mongo documents, skipping Pydantic models.
+    # Otherwise lists are validated, and with the notes cache on, encoded once per version.
+    fast_serialization = False
+    # Token buckets for credential endpoints, as (requests per minute, burst)
+    rate_limit_enabled = True
+    rate_limit_ip = (30, 10)
+    rate_limit_account = (10, 5)
+    # Behind proxies, trust X-Forwarded-For and take the client address from the
+    # entry appended by the outermost of rate_limit_proxy_hops trusted proxies
+    rate_limit_trust_forwarded_for = False
+    rate_limit_proxy_hops = 1
+    metrics_enabled = True
+    # GET /internal/stats has no authentication; enable it only where the port is private
+    internal_stats_enabled = False
+    # Coalesce POST /notes/ inserts into bulk writes; insert_batch_ack is "flush"
+    # (respond once written) or "enqueue" (respond at once, lose queued notes on a crash)
+    insert_batching_enabled = False
+    insert_batch_max_size = 500
+    insert_batch_max_delay_ms = 5
+    insert_batch_max_queue = 10000
+    insert_batch_ack = "flush"
+    # Negotiated gzip/brotli (brotli needs the optional brotli package)
+    compression_enabled = True
+    compression_minimum_size = 1024
+    gzip_level = 6
+    brotli_quality = 4
+    # Large notes: bodies above the threshold are compressed at rest; lists,
+    # search and change feeds carry only a preview (see app/bodies.py). Search
+    # covers the first note_search_max_chars characters of each body.
+    note_max_title_chars = 1000
+    note_max_body_bytes = 8 * 1024 * 1024
+    # Request bodies are capped before parsing: any request at note_max_request_bytes
+    # (room for a maximal note with JSON escaping), /batch requests at batch_max_request_bytes
+    note_max_request_bytes = 20 * 1024 * 1024
+    batch_max_request_bytes = 64 * 1024 * 1024
+    note_compress_threshold_bytes = 16 * 1024
+    note_inline_max_bytes = 256 * 1024
+    note_chunk_bytes = 255 * 1024
+    note_preview_chars = 2000
+    note_search_max_chars = 256 * 1024
+    # Serialized per-user note lists and notes, keyed by the per-user notes version
+    notes_cache_enabled = True
+    notes_cache_max_entries = 10000
+    notes_cache_max_bytes = 64 * 1024 * 1024
+    notes_cache_ttl_seconds = 300
+
+    def __init__(self, environ: Optional[Mapping[str, str]] = None, **overrides):
+        environ = os.environ if environ is None else environ
+        for name in self.fields():
+            raw = environ.get(ENV_PREFIX + name.upper())
+            if raw is not None:
+                setattr(self, name, _coerce(getattr(type(self), name), raw))
+        for name, value in overrides.items():
+            if name not in self.fields():
+                raise TypeError(f"Unknown setting: {name}")
+            setattr(self, name, value)
+
+    @classmethod
+    def fields(cls) -> list:
+        return [name for name, value in vars(cls).items() if not name.startswith("_") and not callable(value) and not isinstance(value, classmethod)]
+
+    def mongodb_pool_size(self) -> int:
+        if self.mongodb_total_pool_size:
+            return max(1, self.mongodb_total_pool_size // max(1, self.workers))
+        return self.mongodb_max_pool_size
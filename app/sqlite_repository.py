@@ -0,0 +1,608 @@
+import asyncio
+import sqlite3
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from functools import partial
+from typing import AsyncIterator, List, Optional, Tuple
+
+from bson import ObjectId
+
+from app.bodies import pack_description
+from app.batch import fail, new_results, owned_targets, parse_ids, skip_remaining
+from app.events import id_event, note_event
+from app.metrics import staged
+from app.pagination import decode_cursor, finish_page
+from app.storage import LIST_PROJECTION, StorageBackend
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    id TEXT PRIMARY KEY,
+    email TEXT NOT NULL UNIQUE,
+    username TEXT,
+    hashed_password TEXT
+);
+CREATE TABLE IF NOT EXISTS notes (
+    id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    title TEXT,
+    description TEXT,
+    version INTEGER NOT NULL DEFAULT 1,
+    revision INTEGER NOT NULL,
+    created_revision INTEGER NOT NULL,
+    updated_at TEXT,
+    body_id TEXT,
+    body_codec TEXT,
+    body_size INTEGER,
+    body_chars INTEGER,
+    body_data BLOB,
+    body_chunks INTEGER,
+    search_text TEXT
+);
+CREATE INDEX IF NOT EXISTS notes_user_id_id ON notes (user_id, id);
+CREATE INDEX IF NOT EXISTS notes_user_id_revision ON notes (user_id, revision);
+CREATE TABLE IF NOT EXISTS notes_meta (
+    user_id TEXT PRIMARY KEY,
+    version INTEGER NOT NULL,
+    updated_at TEXT
+);
+CREATE TABLE IF NOT EXISTS note_tombstones (
+    note_id TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    revision INTEGER NOT NULL,
+    deleted_at TEXT
+);
+CREATE INDEX IF NOT EXISTS note_tombstones_user_id_revision ON note_tombstones (user_id, revision);
+CREATE TABLE IF NOT EXISTS revoked_tokens (
+    jti TEXT PRIMARY KEY,
+    type TEXT NOT NULL,
+    expires_at TEXT NOT NULL,
+    revoked_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS revoked_tokens_type_revoked_at ON revoked_tokens (type, revoked_at);
+CREATE TABLE IF NOT EXISTS note_bodies (
+    note_id TEXT NOT NULL,
+    body_id TEXT NOT NULL,
+    n INTEGER NOT NULL,
+    data BLOB NOT NULL,
+    PRIMARY KEY (body_id, n)
+);
+CREATE INDEX IF NOT EXISTS note_bodies_note_id ON note_bodies (note_id);
+"""
+
+# search_text carries the searchable start of large bodies (see app/bodies.py)
+SEARCH_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS notes_fts USING fts5(title, description, search_text, content='notes', content_rowid='rowid');
+CREATE TRIGGER IF NOT EXISTS notes_fts_insert AFTER INSERT ON notes BEGIN
+    INSERT INTO notes_fts (rowid, title, description, search_text) VALUES (new.rowid, new.title, new.description, new.search_text);
+END;
+CREATE TRIGGER IF NOT EXISTS notes_fts_delete AFTER DELETE ON notes BEGIN
+    INSERT INTO notes_fts (notes_fts, rowid, title, description, search_text) VALUES ('delete', old.rowid, old.title, old.description, old.search_text);
+END;
+CREATE TRIGGER IF NOT EXISTS notes_fts_update AFTER UPDATE OF title, description, search_text ON notes BEGIN
+    INSERT INTO notes_fts (notes_fts, rowid, title, description, search_text) VALUES ('delete', old.rowid, old.title, old.description, old.search_text);
+    INSERT INTO notes_fts (rowid, title, description, search_text) VALUES (new.rowid, new.title, new.description, new.search_text);
+END;
+"""
+
+USER_FIELDS = ("email", "username", "hashed_password")
+# Fields callers may write; the rest are maintained by the repository
+NOTE_FIELDS = ("title", "description")
+# Large bodies are flattened from the "body" subdocument (see app/bodies.py)
+BODY_COLUMNS = ("body_id", "body_codec", "body_size", "body_chars", "body_data", "body_chunks")
+NOTE_COLUMNS = ("user_id", "title", "description", "version", "revision", "created_revision", "updated_at", *BODY_COLUMNS)
+
+BUMP_VERSION = (
+    "INSERT INTO notes_meta (user_id, version, updated_at) VALUES (?, ?, ?) "
+    "ON CONFLICT (user_id) DO UPDATE SET version = version + excluded.version, updated_at = excluded.updated_at"
+)
+INSERT_NOTE = (
+    f"INSERT INTO notes (id, user_id, title, description, version, revision, created_revision, updated_at, {', '.join(BODY_COLUMNS)}, search_text) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+)
+INSERT_BODY_CHUNK = "INSERT INTO note_bodies (note_id, body_id, n, data) VALUES (?, ?, ?, ?)"
+INSERT_TOMBSTONE = "INSERT INTO note_tombstones (note_id, user_id, revision, deleted_at) VALUES (?, ?, ?, ?)"
+SELECT_NOTE = f"SELECT id, {', '.join(NOTE_COLUMNS)} FROM notes WHERE id = ? AND user_id = ?"
+SEARCH_NOTES = (
+    "SELECT notes.id, notes.user_id, notes.title, notes.description, notes.body_id, notes.body_size, -bm25(notes_fts, 3.0, 1.0, 1.0) AS score "
+    "FROM notes_fts JOIN notes ON notes.rowid = notes_fts.rowid "
+    "WHERE notes_fts MATCH ? AND notes.user_id = ? ORDER BY score DESC LIMIT ? OFFSET ?"
+)
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+def _time(value: Optional[datetime]) -> Optional[str]:
+    return value.isoformat() if value is not None else None
+
+def _parse_time(value: Optional[str]) -> Optional[datetime]:
+    return datetime.fromisoformat(value) if value else None
+
+def _document(row: sqlite3.Row) -> dict:
+    # Mongo-shaped, so callers cannot tell the backends apart
+    document = {}
+    body = {}
+    for key in row.keys():
+        if key == "id":
+            document["_id"] = ObjectId(row[key])
+        elif key in ("updated_at", "deleted_at", "expires_at", "revoked_at"):
+            document[key] = _parse_time(row[key])
+        elif key in BODY_COLUMNS:
+            if row[key] is not None:
+                body[key[len("body_"):]] = row[key]
+        else:
+            document[key] = row[key]
+    if "id" in body:
+        body["id"] = ObjectId(body["id"])
+        document["body"] = body
+    return document
+
+def _body_values(body: Optional[dict]) -> tuple:
+    if not body:
+        return (None,) * len(BODY_COLUMNS)
+    return (str(body["id"]), body["codec"], body["size"], body["chars"], body.get("data"), body.get("chunks"))
+
+def _select_list(projection: Optional[dict]) -> str:
+    # Translates the Mongo projections built by app/pagination.py and
+    # the {"body.data": 0} exclusion used for lists
+    if projection is None:
+        return f"id, {', '.join(NOTE_COLUMNS)}"
+    # As in Mongo, _id may appear in either an inclusion or an exclusion
+    if not any(value for field, value in projection.items() if field != "_id"):
+        excluded = {field.replace(".", "_") for field in projection}
+        return ", ".join(["id", *(column for column in NOTE_COLUMNS if column not in excluded)])
+    columns = ["id"]
+    for field, spec in projection.items():
+        field = field.replace(".", "_")
+        if field not in NOTE_COLUMNS:
+            continue
+        if isinstance(spec, dict) and "$substrCP" in spec:
+            _, start, length = spec["$substrCP"]
+            columns.append(f"substr({field}, {int(start) + 1}, {int(length)}) AS {field}")
+        elif spec:
+            if field in BODY_COLUMNS and "body_id" not in columns:
+                columns.append("body_id")
+            if field not in columns:
+                columns.append(field)
+    return ", ".join(columns)
+
+def _match_expression(query: str) -> str:
+    # Any of the words, like Mongo's $text; quoting keeps FTS5 syntax out of user input
+    terms = [term.replace('"', '""') for term in query.split()]
+    return " OR ".join(f'"{term}"' for term in terms)
+
+
+# Embedded alternative to MongoRepository for single-node installs and CI.
+# SQLite runs in WAL mode: one writer thread holds the only write connection
+# (so transactions never contend) and a small pool of reader threads each keep
+# their own connection. Statements are parameterised and reuse the
+# connection's prepared-statement cache.
+class SQLiteRepository(StorageBackend):
+    def __init__(self, settings):
+        super().__init__(settings)
+        self.path = settings.sqlite_path
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+        self._writer = None
+        self._readers = None
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=self.settings.sqlite_busy_timeout_ms / 1000, check_same_thread=False, cached_statements=256)
+            connection.row_factory = sqlite3.Row
+            connection.execute("PRAGMA journal_mode = WAL")
+            connection.execute("PRAGMA synchronous = NORMAL")
+            connection.execute(f"PRAGMA busy_timeout = {int(self.settings.sqlite_busy_timeout_ms)}")
+            self._local.connection = connection
+            with self._connections_lock:
+                self._connections.append(connection)
+        return connection
+
+    def _run(self, func, *args):
+        return func(self._connection(), *args)
+
+    def _run_transaction(self, func, *args):
+        connection = self._connection()
+        with connection:
+            return func(connection, *args)
+
+    async def _read(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._readers, partial(self._run, func, *args))
+
+    async def _write(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._writer, partial(self._run_transaction, func, *args))
+
+    # Lifecycle
+    async def connect(self):
+        if self._writer is not None:
+            return
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite-write")
+        # An in-memory database exists only on the connection that created it
+        in_memory = self.path == ":memory:"
+        self._readers = self._writer if in_memory else ThreadPoolExecutor(
+            max_workers=self.settings.sqlite_readers, thread_name_prefix="sqlite-read"
+        )
+        await self.ensure_indexes()
+
+    async def close(self):
+        if self._writer is None:
+            return
+        self._writer.shutdown(wait=True)
+        if self._readers is not self._writer:
+            self._readers.shutdown(wait=True)
+        self._writer = None
+        self._readers = None
+        with self._connections_lock:
+            for connection in self._connections:
+                connection.close()
+            self._connections.clear()
+
+    async def ping(self) -> bool:
+        try:
+            await self._read(lambda connection: connection.execute("SELECT 1").fetchone())
+        except sqlite3.Error:
+            return False
+        return True
+
+    def _create_schema(self, connection):
+        connection.executescript(SCHEMA)
+        # Databases created before large bodies were supported lack the body columns
+        existing = {row["name"] for row in connection.execute("PRAGMA table_info(notes)")}
+        for column, kind in zip(BODY_COLUMNS, ("TEXT", "TEXT", "INTEGER", "INTEGER", "BLOB", "INTEGER")):
+            if column not in existing:
+                connection.execute(f"ALTER TABLE notes ADD COLUMN {column} {kind}")
+        if "search_text" not in existing:
+            # The full-text index gains the column too, so it is rebuilt from the notes
+            connection.execute("ALTER TABLE notes ADD COLUMN search_text TEXT")
+            connection.executescript(
+                "DROP TRIGGER IF EXISTS notes_fts_insert; DROP TRIGGER IF EXISTS notes_fts_delete; "
+                "DROP TRIGGER IF EXISTS notes_fts_update; DROP TABLE IF EXISTS notes_fts;"
+            )
+            connection.executescript(SEARCH_SCHEMA)
+            connection.execute("INSERT INTO notes_fts (notes_fts) VALUES ('rebuild')")
+        else:
+            connection.executescript(SEARCH_SCHEMA)
+
+    async def ensure_indexes(self):
+        await self._write(self._create_schema)
+
+    # Users
+    @staged("db")
+    async def get_user(self, email: str) -> Optional[dict]:
+        row = await self._read(lambda connection: connection.execute("SELECT * FROM users WHERE email = ?", (email,)).fetchone())
+        return _document(row) if row else None
+
+    @staged("db")
+    async def create_user(self, user_dict: dict) -> str:
+        user_id = str(ObjectId())
+        values = [user_dict.get(field) for field in USER_FIELDS]
+        await self._write(lambda connection: connection.execute(
+            "INSERT INTO users (id, email, username, hashed_password) VALUES (?, ?, ?, ?)", (user_id, *values)
+        ))
+        return user_id
+
+    @staged("db")
+    async def update_user(self, email: str, fields: dict) -> int:
+        unknown = set(fields) - set(USER_FIELDS)
+        if unknown:
+            raise ValueError(f"Unsupported user fields: {', '.join(sorted(unknown))}")
+        assignments = ", ".join(f"{field} = ?" for field in fields)
+        cursor = await self._write(lambda connection: connection.execute(
+            f"UPDATE users SET {assignments} WHERE email = ?", (*fields.values(), email)
+        ))
+        return cursor.rowcount
+
+    # Revoked tokens; expired entries are purged on the next revocation
+    def _revoke(self, connection, tokens: List[dict]):
+        now = _time(_now())
+        connection.execute("DELETE FROM revoked_tokens WHERE expires_at <= ?", (now,))
+        return connection.executemany(
+            "INSERT OR IGNORE INTO revoked_tokens (jti, type, expires_at, revoked_at) VALUES (?, ?, ?, ?)",
+            [(token["jti"], token["type"], _time(token["expires_at"]), now) for token in tokens],
+        ).rowcount
+
+    @staged("db")
+    async def revoke_tokens(self, tokens: List[dict]) -> int:
+        if not tokens:
+            return 0
+        return await self._write(self._revoke, tokens)
+
+    @staged("db")
+    async def list_revoked_tokens(self, token_type: str, since: Optional[datetime] = None) -> List[dict]:
+        rows = await self._read(lambda connection: connection.execute(
+            "SELECT jti, type, expires_at, revoked_at FROM revoked_tokens WHERE type = ? AND expires_at > ? AND revoked_at >= ?",
+            (token_type, _time(_now()), _time(since) or ""),
+        ).fetchall())
+        return [_document(row) for row in rows]
+
+    # Per-user notes version, which here doubles as the revision counter: a
+    # write reserves and stamps its revisions in one transaction on the single
+    # writer, and a failed write rolls its bump back, so the changes feed needs
+    # none of MongoRepository's in-flight tracking
+    @staged("db")
+    async def get_notes_version(self, user_id: str) -> Tuple[int, Optional[datetime]]:
+        row = await self._read(lambda connection: connection.execute(
+            "SELECT version, updated_at FROM notes_meta WHERE user_id = ?", (user_id,)
+        ).fetchone())
+        if row is None:
+            return 0, None
+        return row["version"], _parse_time(row["updated_at"])
+
+    def _reserve_revisions(self, connection, user_id: str, count: int, now: datetime) -> int:
+        # Returns the first of count consecutive revisions; runs inside the caller's transaction
+        connection.execute(BUMP_VERSION, (user_id, count, _time(now)))
+        version = connection.execute("SELECT version FROM notes_meta WHERE user_id = ?", (user_id,)).fetchone()[0]
+        return version - count + 1
+
+    def _write_tombstones(self, connection, user_id: str, entry_ids: List[ObjectId], now: datetime) -> int:
+        first_revision = self._reserve_revisions(connection, user_id, len(entry_ids), now)
+        connection.executemany(INSERT_TOMBSTONE, [
+            (str(entry_id), user_id, first_revision + offset, _time(now)) for offset, entry_id in enumerate(entry_ids)
+        ])
+        return first_revision
+
+    def _store_body(self, connection, note_id: ObjectId, description: Optional[str]) -> dict:
+        # Packs a large description and writes its out-of-line chunks in the caller's transaction
+        fields, chunks = pack_description(description, self.settings)
+        if chunks:
+            body_id = str(fields["body"]["id"])
+            connection.executemany(INSERT_BODY_CHUNK, [(str(note_id), body_id, n, chunk) for n, chunk in enumerate(chunks)])
+        return fields
+
+    def _insert_notes(self, connection, items: List[Tuple[str, dict]], ordered: bool) -> Tuple[List[dict], List[dict]]:
+        results = new_results(len(items))
+        now = _now()
+        next_revision = {
+            user_id: self._reserve_revisions(connection, user_id, count, now)
+            for user_id, count in Counter(user_id for user_id, _ in items).items()
+        }
+        documents = []
+        for index, (user_id, note) in enumerate(items):
+            revision = next_revision[user_id]
+            next_revision[user_id] += 1
+            note_id = note.get("_id") or ObjectId()
+            results[index]["id"] = str(note_id)
+            try:
+                packed = self._store_body(connection, note_id, note.get("description"))
+                document = {
+                    "_id": note_id,
+                    "user_id": user_id,
+                    "title": note.get("title"),
+                    "description": packed.get("description"),
+                    "version": 1,
+                    "revision": revision,
+                    "created_revision": revision,
+                    "updated_at": now,
+                }
+                if packed.get("body"):
+                    document["body"] = packed["body"]
+                connection.execute(INSERT_NOTE, (
+                    str(note_id), user_id, document["title"], document["description"], 1, revision, revision, _time(now),
+                    *_body_values(packed.get("body")), packed.get("search_text"),
+                ))
+            except sqlite3.IntegrityError as exc:
+                fail(results, index, "error", str(exc))
+                if ordered:
+                    skip_remaining(results, index)
+                    break
+                continue
+            results[index]["status"] = "created"
+            documents.append(document)
+        return results, documents
+
+    async def _create(self, items: List[Tuple[str, dict]], ordered: bool) -> List[dict]:
+        results, documents = await self._write(self._insert_notes, items, ordered)
+        for document in documents:
+            self._publish(document["user_id"], note_event("insert", document))
+        return results
+
+    # Notes
+    @staged("db")
+    async def create_note(self, note_dict: dict) -> str:
+        results = await self._create([(note_dict["user_id"], note_dict)], True)
+        if results[0]["status"] != "created":
+            raise sqlite3.IntegrityError(results[0]["error"])
+        return results[0]["id"]
+
+    def _page(self, connection, user_id: str, after_id: str, limit: int, projection: Optional[dict]) -> List[dict]:
+        rows = connection.execute(
+            f"SELECT {_select_list(projection)} FROM notes WHERE user_id = ? AND id > ? ORDER BY id LIMIT ?",
+            (user_id, after_id, limit),
+        ).fetchall()
+        return [_document(row) for row in rows]
+
+    @staged("db")
+    async def list_notes_page(
+        self,
+        user_id: str,
+        limit: int,
+        after: Optional[str] = None,
+        projection: Optional[dict] = None,
+    ) -> Tuple[List[dict], Optional[str]]:
+        # ObjectId hex strings sort in creation order, like _id in Mongo
+        after_id = str(decode_cursor(after)) if after else ""
+        documents = await self._read(self._page, user_id, after_id, limit + 1, projection or LIST_PROJECTION)
+        return finish_page(documents, limit)
+
+    async def iter_notes(self, user_id: str, batch_size: int = 1000) -> AsyncIterator[dict]:
+        # Keyset batches, so no read transaction stays open between yields
+        after_id = ""
+        while True:
+            documents = await self._read(self._page, user_id, after_id, batch_size, None)
+            for document in documents:
+                yield document
+            if len(documents) < batch_size:
+                return
+            after_id = str(documents[-1]["_id"])
+
+    @staged("db")
+    async def search_notes(self, user_id: str, query: str, limit: int, offset: int = 0) -> List[dict]:
+        expression = _match_expression(query)
+        if not expression:
+            return []
+        rows = await self._read(lambda connection: connection.execute(SEARCH_NOTES, (expression, user_id, limit + 1, offset)).fetchall())
+        return [_document(row) for row in rows]
+
+    @staged("db")
+    async def get_note(self, entry_id: str, user_id: str) -> Optional[dict]:
+        entry_id = str(ObjectId(entry_id))
+        row = await self._read(lambda connection: connection.execute(SELECT_NOTE, (entry_id, user_id)).fetchone())
+        return _document(row) if row else None
+
+    def _changes(self, connection, user_id: str, since: int, limit: int) -> Tuple[List[dict], bool]:
+        notes = connection.execute(
+            f"SELECT {_select_list(LIST_PROJECTION)} FROM notes WHERE user_id = ? AND revision > ? ORDER BY revision LIMIT ?",
+            (user_id, since, limit + 1),
+        ).fetchall()
+        tombstones = connection.execute(
+            "SELECT note_id, revision FROM note_tombstones WHERE user_id = ? AND revision > ? ORDER BY revision LIMIT ?",
+            (user_id, since, limit + 1),
+        ).fetchall()
+        changes = []
+        for row in notes:
+            note = _document(row)
+            op = "insert" if note["created_revision"] > since else "update"
+            changes.append({"op": op, "revision": note["revision"], "note": note})
+        for row in tombstones:
+            changes.append({"op": "delete", "revision": row["revision"], "note_id": ObjectId(row["note_id"])})
+        changes.sort(key=lambda change: change["revision"])
+        return changes[:limit], len(changes) > limit
+
+    @staged("db")
+    async def list_changes(self, user_id: str, since: int, limit: int) -> Tuple[List[dict], bool]:
+        return await self._read(self._changes, user_id, since, limit)
+
+    def _assignments(self, connection, note_id: str, fields: dict) -> dict:
+        # Column values for an update; a new description replaces any previous body
+        columns = {field: value for field, value in fields.items() if field != "description"}
+        if "description" in fields:
+            connection.execute("DELETE FROM note_bodies WHERE note_id = ?", (note_id,))
+            packed = self._store_body(connection, note_id, fields["description"])
+            columns["description"] = packed["description"]
+            columns.update(zip(BODY_COLUMNS, _body_values(packed["body"])))
+            columns["search_text"] = packed["search_text"]
+        return columns
+
+    def _update(self, connection, entry_id: str, user_id: str, fields: dict, expected_version: Optional[int]) -> Optional[dict]:
+        unknown = set(fields) - set(NOTE_FIELDS)
+        if unknown:
+            raise ValueError(f"Unsupported note fields: {', '.join(sorted(unknown))}")
+        now = _now()
+        revision = self._reserve_revisions(connection, user_id, 1, now)
+        # Rolled back with the transaction if the note is missing or the version is stale
+        columns = self._assignments(connection, entry_id, fields)
+        assignments = "".join(f"{field} = ?, " for field in columns)
+        sql = f"UPDATE notes SET {assignments}revision = ?, updated_at = ?, version = version + 1 WHERE id = ? AND user_id = ?"
+        params = [*columns.values(), revision, _time(now), entry_id, user_id]
+        if expected_version is not None:
+            sql += " AND version = ?"
+            params.append(expected_version)
+        if connection.execute(sql, params).rowcount == 0:
+            connection.rollback()
+            return None
+        return _document(connection.execute(SELECT_NOTE, (entry_id, user_id)).fetchone())
+
+    @staged("db")
+    async def update_note(
+        self,
+        entry_id: str,
+        user_id: str,
+        fields: dict,
+        expected_version: Optional[int] = None,
+    ) -> Optional[dict]:
+        updated_entry = await self._write(self._update, str(ObjectId(entry_id)), user_id, fields, expected_version)
+        if updated_entry is not None:
+            self._publish(user_id, note_event("update", updated_entry))
+        return updated_entry
+
+    def _delete(self, connection, user_id: str, entry_ids: List[ObjectId]) -> Tuple[List[ObjectId], int]:
+        deleted = []
+        for entry_id in entry_ids:
+            cursor = connection.execute("DELETE FROM notes WHERE id = ? AND user_id = ?", (str(entry_id), user_id))
+            if cursor.rowcount:
+                connection.execute("DELETE FROM note_bodies WHERE note_id = ?", (str(entry_id),))
+                deleted.append(entry_id)
+        first_revision = self._write_tombstones(connection, user_id, deleted, _now()) if deleted else 0
+        return deleted, first_revision
+
+    def _publish_deletes(self, user_id: str, deleted: List[ObjectId], first_revision: int):
+        for offset, entry_id in enumerate(deleted):
+            self._publish(user_id, id_event("delete", entry_id, first_revision + offset))
+
+    @staged("db")
+    async def delete_note(self, entry_id: str, user_id: str) -> int:
+        deleted, first_revision = await self._write(self._delete, user_id, [ObjectId(entry_id)])
+        self._publish_deletes(user_id, deleted, first_revision)
+        return len(deleted)
+
+    async def iter_body_chunks(self, body_id) -> AsyncIterator[bytes]:
+        # Read in one statement so a concurrent update cannot interleave
+        rows = await self._read(lambda connection: connection.execute(
+            "SELECT data FROM note_bodies WHERE body_id = ? ORDER BY n", (str(body_id),)
+        ).fetchall())
+        for row in rows:
+            yield row["data"]
+
+    # Batches; each runs in a single transaction
+    def _batch_targets(self, connection, user_id: str, entry_ids: List[str], results: List[dict], ordered: bool) -> List[Tuple[int, ObjectId]]:
+        parsed = parse_ids(results, entry_ids)
+        placeholders = ", ".join("?" for _ in parsed)
+        rows = connection.execute(
+            f"SELECT id FROM notes WHERE user_id = ? AND id IN ({placeholders})", (user_id, *(str(oid) for _, oid in parsed))
+        ).fetchall() if parsed else []
+        return owned_targets(results, parsed, [ObjectId(row["id"]) for row in rows], ordered)
+
+    @staged("db")
+    async def create_notes(self, user_id: str, notes: List[dict], ordered: bool = True) -> List[dict]:
+        return await self._create([(user_id, note) for note in notes], ordered)
+
+    @staged("db")
+    async def create_notes_for_users(self, items: List[Tuple[str, dict]]) -> List[dict]:
+        return await self._create(items, False)
+
+    def _update_many(self, connection, user_id: str, updates: List[dict], ordered: bool):
+        results = new_results(len(updates))
+        targets = self._batch_targets(connection, user_id, [update["id"] for update in updates], results, ordered)
+        changed = []
+        for index, oid in targets:
+            fields = {key: value for key, value in updates[index].items() if key in NOTE_FIELDS and value is not None}
+            if fields:
+                changed.append((index, oid, fields))
+            else:
+                results[index]["status"] = "unchanged"
+        now = _now()
+        first_revision = self._reserve_revisions(connection, user_id, len(changed), now) if changed else 0
+        for offset, (index, oid, fields) in enumerate(changed):
+            columns = self._assignments(connection, str(oid), fields)
+            assignments = "".join(f"{field} = ?, " for field in columns)
+            connection.execute(
+                f"UPDATE notes SET {assignments}revision = ?, updated_at = ?, version = version + 1 WHERE id = ? AND user_id = ?",
+                (*columns.values(), first_revision + offset, _time(now), str(oid), user_id),
+            )
+            results[index]["status"] = "updated"
+        return results, [(oid, first_revision + offset) for offset, (_, oid, _) in enumerate(changed)]
+
+    @staged("db")
+    async def update_notes(self, user_id: str, updates: List[dict], ordered: bool = True) -> List[dict]:
+        results, updated = await self._write(self._update_many, user_id, updates, ordered)
+        for oid, revision in updated:
+            self._publish(user_id, id_event("update", oid, revision))
+        return results
+
+    def _delete_many(self, connection, user_id: str, entry_ids: List[str], ordered: bool):
+        results = new_results(len(entry_ids))
+        targets = self._batch_targets(connection, user_id, entry_ids, results, ordered)
+        deleted, first_revision = self._delete(connection, user_id, [oid for _, oid in targets])
+        for index, _ in targets:
+            results[index]["status"] = "deleted"
+        return results, deleted, first_revision
+
+    @staged("db")
+    async def delete_notes(self, user_id: str, entry_ids: List[str], ordered: bool = True) -> List[dict]:
+        results, deleted, first_revision = await self._write(self._delete_many, user_id, entry_ids, ordered)
+        self._publish_deletes(user_id, deleted, first_revision)
+        return results
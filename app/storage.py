@@ -0,0 +1,119 @@
+from datetime import datetime
+from typing import AsyncIterator, List, Optional, Tuple
+
+# Lists and feeds never need the compressed bytes or search text of large bodies
+LIST_PROJECTION = {"body.data": 0, "search_text": 0}
+
+
+# Persistence interface used by main.py. Notes are returned as Mongo-shaped
+# documents ("_id" is an ObjectId) whatever the backend, so handlers, ETags,
+# cursors and exports work unchanged.
+class StorageBackend:
+    # Whether watch_note_changes can follow writes made by other processes
+    change_streams = False
+
+    def __init__(self, settings):
+        self.settings = settings
+        # Set to a NoteEventBroker to publish writes in-process when change streams are unavailable
+        self.events = None
+
+    def _publish(self, user_id: str, event: dict):
+        if self.events is not None:
+            self.events.publish(user_id, event)
+
+    # Lifecycle
+    async def connect(self):
+        raise NotImplementedError
+
+    async def close(self):
+        raise NotImplementedError
+
+    async def ping(self) -> bool:
+        # False when the store is unreachable
+        raise NotImplementedError
+
+    async def ensure_indexes(self):
+        raise NotImplementedError
+
+    # Users
+    async def get_user(self, email: str) -> Optional[dict]:
+        raise NotImplementedError
+
+    async def create_user(self, user_dict: dict) -> str:
+        raise NotImplementedError
+
+    async def update_user(self, email: str, fields: dict) -> int:
+        raise NotImplementedError
+
+    # Revoked tokens; entries are {"jti", "type", "expires_at"} and may be
+    # forgotten once expired (see app/revocation.py)
+    async def revoke_tokens(self, tokens: List[dict]) -> int:
+        # Returns how many of the jtis were not revoked before this call
+        raise NotImplementedError
+
+    async def list_revoked_tokens(self, token_type: str, since: Optional[datetime] = None) -> List[dict]:
+        # Unexpired revocations of one token type recorded at or after since
+        raise NotImplementedError
+
+    # Notes
+    async def get_notes_version(self, user_id: str) -> Tuple[int, Optional[datetime]]:
+        raise NotImplementedError
+
+    async def create_note(self, note_dict: dict) -> str:
+        raise NotImplementedError
+
+    async def list_notes_page(
+        self,
+        user_id: str,
+        limit: int,
+        after: Optional[str] = None,
+        projection: Optional[dict] = None,
+    ) -> Tuple[List[dict], Optional[str]]:
+        raise NotImplementedError
+
+    def iter_notes(self, user_id: str, batch_size: int = 1000) -> AsyncIterator[dict]:
+        raise NotImplementedError
+
+    async def search_notes(self, user_id: str, query: str, limit: int, offset: int = 0) -> List[dict]:
+        raise NotImplementedError
+
+    async def get_note(self, entry_id: str, user_id: str) -> Optional[dict]:
+        raise NotImplementedError
+
+    async def list_changes(self, user_id: str, since: int, limit: int) -> Tuple[List[dict], bool]:
+        raise NotImplementedError
+
+    async def update_note(self, entry_id: str, user_id: str, fields: dict, expected_version: Optional[int] = None) -> Optional[dict]:
+        raise NotImplementedError
+
+    async def delete_note(self, entry_id: str, user_id: str) -> int:
+        raise NotImplementedError
+
+    def iter_body_chunks(self, body_id) -> AsyncIterator[bytes]:
+        # Out-of-line compressed chunks of a large note body, in order (see app/bodies.py)
+        raise NotImplementedError
+
+    # Batches; each returns one result dict per item (see app/batch.py)
+    async def create_notes(self, user_id: str, notes: List[dict], ordered: bool = True) -> List[dict]:
+        raise NotImplementedError
+
+    async def create_notes_for_users(self, items: List[Tuple[str, dict]]) -> List[dict]:
+        raise NotImplementedError
+
+    async def update_notes(self, user_id: str, updates: List[dict], ordered: bool = True) -> List[dict]:
+        raise NotImplementedError
+
+    async def delete_notes(self, user_id: str, entry_ids: List[str], ordered: bool = True) -> List[dict]:
+        raise NotImplementedError
+
+
+def create_repository(settings, event_listeners=None) -> StorageBackend:
+    if settings.storage_backend == "sqlite":
+        from app.sqlite_repository import SQLiteRepository
+
+        return SQLiteRepository(settings)
+    if settings.storage_backend == "mongodb":
+        from app.repository import MongoRepository
+
+        return MongoRepository(settings, event_listeners=event_listeners)
+    raise ValueError(f"Unknown storage backend: {settings.storage_backend}")
@@ -0,0 +1,111 @@
+import hashlib
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional, Tuple
+
+import jwt
+from jwt import InvalidTokenError
+
+from app.cache import TTLCache
+
+ACCESS = "access"
+REFRESH = "refresh"
+
+
+def parse_signing_keys(entries: Tuple[str, ...], fallback_secret: str) -> Dict[str, str]:
+    # "kid:secret" entries; without any, the single legacy secret_key is used
+    keys = {}
+    for entry in entries:
+        kid, separator, secret = entry.partition(":")
+        if not separator or not kid or not secret:
+            raise ValueError("Signing keys must be given as kid:secret")
+        keys[kid.strip()] = secret.strip()
+    return keys or {"default": fallback_secret}
+
+
+def parse_deadline(value: str) -> Optional[float]:
+    # ISO 8601; a time without an offset is UTC
+    if not value:
+        return None
+    deadline = datetime.fromisoformat(value)
+    if deadline.tzinfo is None:
+        deadline = deadline.replace(tzinfo=timezone.utc)
+    return deadline.timestamp()
+
+
+# Issues and verifies the API's JWTs. New tokens are signed with the active
+# key and carry its id in the `kid` header; every configured key still
+# verifies, so a key can be rotated in by adding it, made active once all
+# workers know it, and dropped after the longest token lifetime. Tokens
+# without a kid were signed with the legacy secret; they verify only when one
+# is given, and only until legacy_until (epoch seconds) when that is set.
+#
+# Verified claims are cached by token hash until the token expires, so a
+# repeat request costs one SHA-256 and a dict lookup instead of an HMAC and
+# JSON decode. Retiring a key means restarting the workers, which also empties
+# the cache. Revocation is checked by the caller (see app/revocation.py).
+class TokenService:
+    def __init__(
+        self,
+        keys: Dict[str, str],
+        active_kid: str,
+        algorithm: str = "HS256",
+        access_ttl: timedelta = timedelta(minutes=15),
+        refresh_ttl: timedelta = timedelta(days=14),
+        legacy_secret: Optional[str] = None,
+        legacy_until: Optional[float] = None,
+        cache_size: int = 10000,
+    ):
+        if active_kid not in keys:
+            raise ValueError(f"Unknown active signing key: {active_kid}")
+        self.keys = keys
+        self.active_kid = active_kid
+        self.algorithm = algorithm
+        self.access_ttl = access_ttl
+        self.refresh_ttl = refresh_ttl
+        self.legacy_secret = legacy_secret
+        self.legacy_until = legacy_until
+        self.claims_cache = TTLCache(maxsize=cache_size, ttl=access_ttl.total_seconds()) if cache_size else None
+
+    def issue(self, claims: dict, token_type: str = ACCESS) -> str:
+        now = datetime.now(timezone.utc)
+        lifetime = self.refresh_ttl if token_type == REFRESH else self.access_ttl
+        payload = {**claims, "type": token_type, "jti": uuid.uuid4().hex, "iat": now, "exp": now + lifetime}
+        return jwt.encode(payload, self.keys[self.active_kid], algorithm=self.algorithm, headers={"kid": self.active_kid})
+
+    def issue_pair(self, claims: dict) -> Tuple[str, str]:
+        return self.issue(claims, ACCESS), self.issue(claims, REFRESH)
+
+    def _key(self, token: str) -> str:
+        kid = jwt.get_unverified_header(token).get("kid")
+        if kid is None:
+            if self.legacy_secret is None or (self.legacy_until is not None and time.time() >= self.legacy_until):
+                raise InvalidTokenError("Tokens without a signing key id are no longer accepted")
+            return self.legacy_secret
+        if kid not in self.keys:
+            raise InvalidTokenError("Unknown signing key")
+        return self.keys[kid]
+
+    def verify(self, token: str, token_type: str = ACCESS) -> dict:
+        # Raises InvalidTokenError (including ExpiredSignatureError) for any bad token
+        digest = hashlib.sha256(token.encode()).digest()
+        if self.claims_cache is not None:
+            claims = self.claims_cache.get(digest)
+            if claims is not None:
+                if claims["exp"] <= time.time():
+                    self.claims_cache.invalidate(digest)
+                    raise jwt.ExpiredSignatureError("Signature has expired")
+                if claims.get("type", ACCESS) != token_type:
+                    raise InvalidTokenError(f"Expected a {token_type} token")
+                return claims
+        claims = jwt.decode(token, self._key(token), algorithms=[self.algorithm], options={"require": ["exp"]})
+        # Tokens issued before refresh tokens existed have no type and are access tokens
+        if claims.get("type", ACCESS) != token_type:
+            raise InvalidTokenError(f"Expected a {token_type} token")
+        if self.claims_cache is not None:
+            self.claims_cache.set(digest, claims, ttl=claims["exp"] - time.time())
+        return claims
+
+    def stats(self) -> dict:
+        return self.claims_cache.stats() if self.claims_cache is not None else {}
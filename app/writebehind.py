@@ -0,0 +1,142 @@
+import asyncio
+import logging
+import time
+from typing import List, Optional, Tuple
+
+from bson import ObjectId
+from fastapi import HTTPException, status
+
+from app.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+ACK_FLUSH = "flush"
+ACK_ENQUEUE = "enqueue"
+
+flush_duration = REGISTRY.histogram("note_insert_flush_seconds", "Time to write one coalesced insert batch")
+flush_size = REGISTRY.histogram(
+    "note_insert_batch_size",
+    "Notes per coalesced insert batch",
+    buckets=(1, 2, 5, 10, 25, 50, 100, 250, 500, 1000),
+)
+
+
+class InsertQueueFull(HTTPException):
+    def __init__(self):
+        super().__init__(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many note writes in progress, retry shortly",
+            headers={"Retry-After": "1"},
+        )
+
+
+# Coalesces single-note inserts from concurrent requests into one bulk write,
+# flushed when max_batch notes are waiting or max_delay_ms after the first.
+# Ids are generated on enqueue. With ack="flush" a request returns once its
+# batch is written; with ack="enqueue" it returns immediately, and notes still
+# queued are lost if the process dies before the next flush.
+class InsertBatcher:
+    def __init__(self, repository, max_batch: int = 500, max_delay_ms: float = 5, max_queue: int = 10000, ack: str = ACK_FLUSH):
+        if ack not in (ACK_FLUSH, ACK_ENQUEUE):
+            raise ValueError(f"Unknown insert acknowledgement mode: {ack}")
+        self.repository = repository
+        self.max_batch = max_batch
+        self.max_delay = max_delay_ms / 1000
+        self.ack = ack
+        self._queue = asyncio.Queue(maxsize=max_queue)
+        self._task = None
+        self._closing = False
+        self.batches = 0
+        self.inserted = 0
+        self.failed = 0
+        self.rejected = 0
+        self.flush_seconds = 0.0
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        # Stops taking new notes and waits for everything queued to be written
+        self._closing = True
+        if self._task is not None:
+            await self._queue.join()
+            self._task.cancel()
+            self._task = None
+
+    async def submit(self, user_id: str, note: dict) -> str:
+        if self._closing:
+            raise InsertQueueFull()
+        entry_id = ObjectId()
+        future = asyncio.get_running_loop().create_future() if self.ack == ACK_FLUSH else None
+        try:
+            self._queue.put_nowait((user_id, {**note, "_id": entry_id}, future))
+        except asyncio.QueueFull:
+            self.rejected += 1
+            raise InsertQueueFull()
+        if future is not None:
+            await future
+        return str(entry_id)
+
+    async def _next_batch(self) -> List[Tuple[str, dict, Optional[asyncio.Future]]]:
+        batch = [await self._queue.get()]
+        deadline = time.monotonic() + self.max_delay
+        while len(batch) < self.max_batch:
+            try:
+                batch.append(self._queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._next_batch()
+            try:
+                await self._flush(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _flush(self, batch: List[Tuple[str, dict, Optional[asyncio.Future]]]):
+        started = time.perf_counter()
+        try:
+            results = await self.repository.create_notes_for_users([(user_id, note) for user_id, note, _ in batch])
+        except Exception as exc:
+            logger.exception("Coalesced insert of %d notes failed", len(batch))
+            results = [{"status": "error", "error": str(exc)}] * len(batch)
+        elapsed = time.perf_counter() - started
+        flush_duration.observe(elapsed)
+        flush_size.observe(len(batch))
+        self.batches += 1
+        self.flush_seconds += elapsed
+
+        for (user_id, note, future), result in zip(batch, results):
+            if result["status"] == "created":
+                self.inserted += 1
+                if future is not None and not future.done():
+                    future.set_result(None)
+                continue
+            self.failed += 1
+            if future is not None and not future.done():
+                future.set_exception(HTTPException(status_code=500, detail="Note could not be stored"))
+            else:
+                logger.error("Acknowledged note %s for %s was not stored: %s", note["_id"], user_id, result.get("error"))
+
+    def stats(self) -> dict:
+        return {
+            "depth": self._queue.qsize(),
+            "batches": self.batches,
+            "inserted": self.inserted,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "flush_seconds": self.flush_seconds,
+            "mean_batch_size": (self.inserted + self.failed) / self.batches if self.batches else 0.0,
+        }
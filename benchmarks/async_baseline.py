@@ -0,0 +1,209 @@
+"""Concurrent latency before and after the move to the async Motor repository.
+
+Serves main.py from a revision that still used the blocking pymongo client
+(the baseline commit by default) and the current application, each from its
+own uvicorn process against the same kind of store, and drives both over HTTP
+with one workload at each concurrency level:
+
+    python -m benchmarks.async_baseline --mongomock
+    python -m benchmarks.async_baseline --mongodb-url mongodb://localhost:27017
+
+Each level gets a freshly started and seeded server. Lists ask for every
+note, so both versions return the same documents. mongomock runs in memory
+with no network wait, so --mongomock numbers compare request handling only;
+use a live mongod for I/O-bound latency. Needs uvicorn.
+"""
+import argparse
+import asyncio
+import random
+import socket
+import subprocess
+import sys
+import time
+import types
+from collections import defaultdict
+
+import httpx
+
+from benchmarks.common import BENCH_PASSWORD, git_commit, random_note, summarize, write_report
+
+BASELINE_REVISION = "88c8405"
+MIX = {"list": 45, "get": 45, "create": 10}
+
+
+def baseline_app(revision: str, mongodb_url: str, database: str, mongomock: bool):
+    source = subprocess.run(["git", "show", f"{revision}:main.py"], capture_output=True, text=True, check=True).stdout
+    module = types.ModuleType("baseline_main")
+    exec(compile(source, f"{revision}:main.py", "exec"), module.__dict__)
+    if mongomock:
+        import mongomock as mongomock_module
+
+        client = mongomock_module.MongoClient()
+    else:
+        from pymongo import MongoClient
+
+        client = MongoClient(mongodb_url or "mongodb://localhost:27017")
+        client.drop_database(database)
+    # The baseline's handlers read these module globals
+    module.client = client
+    module.db = client[database]
+    module.users_collection = module.db["users"]
+    module.notes_collection = module.db["notes"]
+    return module.app
+
+def current_app(mongodb_url: str, database: str, mongomock: bool):
+    import main
+    from app.settings import Settings
+
+    overrides = {
+        "mongodb_database": database,
+        "secret_key": "benchmarks-only-secret-key-0123456789",
+        "change_streams_enabled": False,
+        "rate_limit_enabled": False,
+    }
+    if mongodb_url:
+        overrides["mongodb_url"] = mongodb_url
+    repository = None
+    if mongomock:
+        from mongomock_motor import AsyncMongoMockClient
+
+        from app.repository import MongoRepository
+
+        overrides["create_indexes_on_startup"] = False
+        settings = Settings(**overrides)
+        repository = MongoRepository(settings, client=AsyncMongoMockClient(tz_aware=True))
+    else:
+        from pymongo import MongoClient
+
+        MongoClient(mongodb_url or Settings.mongodb_url).drop_database(database)
+        settings = Settings(**overrides)
+    return main.create_app(settings, repository)
+
+def serve(args):
+    import uvicorn
+
+    database = f"{args.database}-{args.serve}"
+    if args.serve == "baseline":
+        app = baseline_app(args.baseline, args.mongodb_url, database, args.mongomock)
+    else:
+        app = current_app(args.mongodb_url, database, args.mongomock)
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def start_server(args, version: str, port: int) -> subprocess.Popen:
+    command = [sys.executable, "-m", "benchmarks.async_baseline", "--serve", version, "--port", str(port),
+               "--database", args.database, "--baseline", args.baseline]
+    if args.mongodb_url:
+        command += ["--mongodb-url", args.mongodb_url]
+    if args.mongomock:
+        command.append("--mongomock")
+    server = subprocess.Popen(command)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/docs").status_code == 200:
+                return server
+        except httpx.TransportError:
+            pass
+        if server.poll() is not None:
+            break
+        time.sleep(0.2)
+    server.kill()
+    raise RuntimeError(f"The {version} server did not start")
+
+async def seed_over_http(client: httpx.AsyncClient, users: int, notes: int, rng: random.Random) -> list:
+    # Both versions register and create notes through the same endpoints
+    sessions = []
+    for index in range(users):
+        email = f"user{index}@bench.local"
+        response = await client.post("/register", json={"username": f"user{index}", "email": email, "password": BENCH_PASSWORD})
+        response.raise_for_status()
+        headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+        note_ids = []
+        for _ in range(notes):
+            response = await client.post("/notes/", json={"user_id": "", **random_note(rng)}, headers=headers)
+            response.raise_for_status()
+            note_ids.append(response.json()["id"])
+        sessions.append({"headers": headers, "note_ids": note_ids})
+    return sessions
+
+async def drive(client: httpx.AsyncClient, sessions: list, concurrency: int, duration: float, seed_value: int) -> dict:
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    deadline = time.perf_counter() + duration
+
+    async def worker(index):
+        rng = random.Random(seed_value + index)
+        operations = list(MIX)
+        while time.perf_counter() < deadline:
+            op = rng.choices(operations, weights=[MIX[name] for name in operations])[0]
+            session = rng.choice(sessions)
+            started = time.perf_counter()
+            if op == "list":
+                response = await client.get("/notes/", params={"limit": 1000}, headers=session["headers"])
+            elif op == "get":
+                response = await client.get(f"/notes/{rng.choice(session['note_ids'])}", headers=session["headers"])
+            else:
+                response = await client.post("/notes/", json={"user_id": "", **random_note(rng)}, headers=session["headers"])
+            latencies[op].append(time.perf_counter() - started)
+            if response.status_code >= 400:
+                errors[op] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(index) for index in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    all_latencies = [value for values in latencies.values() for value in values]
+    return {
+        "throughput_rps": len(all_latencies) / elapsed if elapsed else 0.0,
+        "total": {**summarize(all_latencies), "errors": sum(errors.values())},
+        "ops": {op: {**summarize(values), "errors": errors[op]} for op, values in sorted(latencies.items())},
+    }
+
+async def measure(args, version: str, concurrency: int) -> dict:
+    port = free_port()
+    server = start_server(args, version, port)
+    try:
+        limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=60) as client:
+            sessions = await seed_over_http(client, args.users, args.notes, random.Random(args.seed))
+            return await drive(client, sessions, concurrency, args.duration, args.seed)
+    finally:
+        server.terminate()
+        server.wait()
+
+
+async def run(args):
+    report = {"commit": git_commit(), "baseline": args.baseline, "config": vars(args), "mix": MIX, "runs": []}
+    for concurrency in (int(value) for value in args.concurrency.split(",")):
+        report["runs"].append({
+            "concurrency": concurrency,
+            "baseline": await measure(args, "baseline", concurrency),
+            "current": await measure(args, "current", concurrency),
+        })
+    write_report(report, args.output)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mongodb-url", default=None)
+    parser.add_argument("--database", default="notes-bench-async")
+    parser.add_argument("--mongomock", action="store_true", help="use mongomock (baseline) and mongomock-motor (current)")
+    parser.add_argument("--baseline", default=BASELINE_REVISION, help="git revision whose main.py uses the blocking client")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--notes", type=int, default=50, help="notes per user")
+    parser.add_argument("--concurrency", default="1,16,64", help="comma-separated levels")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per level and version")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", default=None)
+    parser.add_argument("--serve", choices=["baseline", "current"], help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, default=0, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.serve:
+        serve(args)
+    else:
+        asyncio.run(run(args))
@@ -0,0 +1,130 @@
+import json
+import os
+import random
+import subprocess
+from typing import Dict, List
+
+import httpx
+
+import main
+from app.settings import Settings
+
+BENCH_PASSWORD = "bench-password"
+
+
+def percentile(samples: List[float], fraction: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, int(round(fraction * (len(ordered) - 1)))))
+    return ordered[index]
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    return {
+        "count": len(samples),
+        "mean_ms": 1000 * sum(samples) / len(samples) if samples else 0.0,
+        "p50_ms": 1000 * percentile(samples, 0.50),
+        "p95_ms": 1000 * percentile(samples, 0.95),
+        "p99_ms": 1000 * percentile(samples, 0.99),
+    }
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return "unknown"
+
+def write_report(report: dict, output: str = None):
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if output:
+        with open(output, "w") as handle:
+            handle.write(text + "\n")
+    print(text)
+
+
+def notes_per_user(distribution: str, users: int, rng: random.Random) -> List[int]:
+    # "fixed:N", "uniform:A-B" or "zipf:N" (N notes for the heaviest user, falling off as 1/rank)
+    kind, _, spec = distribution.partition(":")
+    if kind == "fixed":
+        return [int(spec)] * users
+    if kind == "uniform":
+        low, high = (int(part) for part in spec.split("-"))
+        return [rng.randint(low, high) for _ in range(users)]
+    if kind == "zipf":
+        heaviest = int(spec)
+        return [max(1, heaviest // rank) for rank in range(1, users + 1)]
+    raise ValueError(f"Unknown distribution: {distribution}")
+
+def random_note(rng: random.Random, body_words: int = 60) -> dict:
+    words = ["alpha", "bravo", "charlie", "delta", "echo", "foxtrot", "golf", "hotel", "india", "juliet",
+             "kilo", "lima", "mike", "november", "oscar", "papa", "quebec", "romeo", "sierra", "tango"]
+    return {
+        "title": " ".join(rng.choice(words) for _ in range(4)),
+        "description": " ".join(rng.choice(words) for _ in range(body_words)),
+    }
+
+
+async def boot(mongodb_url: str = None, database: str = "notes-bench", mongomock: bool = False, sqlite_path: str = None):
+    # Runs the app in-process; the caller must await shutdown(app) when done.
+    # With sqlite_path the embedded backend is benchmarked instead of MongoDB.
+    overrides = {
+        "mongodb_database": database,
+        "secret_key": "benchmarks-only-secret-key-0123456789",
+        "change_streams_enabled": False,
+        # Benchmark traffic comes from one address and would otherwise be throttled
+        "rate_limit_enabled": False,
+    }
+    if mongodb_url:
+        overrides["mongodb_url"] = mongodb_url
+    if mongomock:
+        overrides["create_indexes_on_startup"] = False
+    if sqlite_path:
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(sqlite_path + suffix):
+                os.remove(sqlite_path + suffix)
+        overrides.update(storage_backend="sqlite", sqlite_path=sqlite_path)
+    settings = Settings(**overrides)
+    repository = None
+    if mongomock and not sqlite_path:
+        from mongomock_motor import AsyncMongoMockClient
+
+        from app.repository import MongoRepository
+
+        repository = MongoRepository(settings, client=AsyncMongoMockClient(tz_aware=True))
+    app = main.create_app(settings, repository)
+    app.state.lifespan = app.router.lifespan_context(app)
+    await app.state.lifespan.__aenter__()
+    services = app.state.services
+    if not mongomock and not sqlite_path:
+        await services.repository.client.drop_database(database)
+        if settings.create_indexes_on_startup:
+            await services.repository.ensure_indexes()
+    return app
+
+async def shutdown(app):
+    await app.state.lifespan.__aexit__(None, None, None)
+
+def client_for(app) -> httpx.AsyncClient:
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=60)
+
+
+async def seed(app, users: int, distribution: str, seed_value: int = 1, batch_size: int = 1000) -> List[dict]:
+    # Inserts users and notes straight through the repository; one bcrypt hash is shared by all users
+    rng = random.Random(seed_value)
+    repository = app.state.services.repository
+    hashed_password = await app.state.services.password_hasher.hash(BENCH_PASSWORD)
+    counts = notes_per_user(distribution, users, rng)
+    seeded = []
+    for index, count in enumerate(counts):
+        email = f"user{index}@bench.local"
+        await repository.create_user({"username": f"user{index}", "email": email, "hashed_password": hashed_password})
+        for start in range(0, count, batch_size):
+            notes = [random_note(rng) for _ in range(min(batch_size, count - start))]
+            await repository.create_notes(email, notes, ordered=False)
+        seeded.append({"email": email, "username": f"user{index}", "notes": count})
+    return seeded
+
+async def login(client: httpx.AsyncClient, email: str) -> str:
+    response = await client.post("/login", json={"email": email, "password": BENCH_PASSWORD})
+    response.raise_for_status()
+    return response.json()["access_token"]
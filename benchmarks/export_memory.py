@@ -0,0 +1,126 @@
+"""Memory held while streaming GET /notes/export for notebooks of different sizes.
+
+Each size runs in a fresh interpreter. tracemalloc starts after seeding, so
+the seeded data does not count; its peak is the most memory the export itself
+held at once. Flat peaks across sizes show the export holds constant memory:
+
+    python -m benchmarks.export_memory --sizes 10000,100000,1000000
+
+elapsed_s comes from a separate untraced pass, as tracing slows allocation.
+With --mongomock the peak grows with size: mongomock sorts the whole result
+in memory, which a real MongoDB does not.
+"""
+import argparse
+import asyncio
+import json
+import subprocess
+import sys
+import time
+import tracemalloc
+from urllib.parse import urlencode
+
+from benchmarks.common import boot, client_for, git_commit, login, seed, shutdown, write_report
+
+
+async def stream_export(app, token: str, params: dict) -> int:
+    # Drives the ASGI app directly and drops each chunk as it arrives;
+    # httpx's ASGITransport keeps the whole response body until it completes
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": "/notes/export",
+        "raw_path": b"/notes/export",
+        "query_string": urlencode(params).encode(),
+        "root_path": "",
+        "headers": [(b"host", b"bench"), (b"authorization", f"Bearer {token}".encode())],
+        "client": ("127.0.0.1", 0),
+        "server": ("bench", 80),
+    }
+    requested = False
+    finished = asyncio.Event()
+    received = 0
+    status = None
+
+    async def receive():
+        nonlocal requested
+        if not requested:
+            requested = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await finished.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal received, status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+        elif message["type"] == "http.response.body":
+            received += len(message.get("body", b""))
+            if not message.get("more_body", False):
+                finished.set()
+
+    await app(scope, receive, send)
+    finished.set()
+    if status != 200:
+        raise RuntimeError(f"Export failed with status {status}")
+    return received
+
+async def measure(args) -> dict:
+    app = await boot(args.mongodb_url, args.database, args.mongomock, args.sqlite)
+    try:
+        user = (await seed(app, 1, f"fixed:{args.size}"))[0]
+        async with client_for(app) as client:
+            token = await login(client, user["email"])
+        params = {"compress": "gzip"} if args.gzip else {}
+        started = time.perf_counter()
+        received = await stream_export(app, token, params)
+        elapsed = time.perf_counter() - started
+        tracemalloc.start()
+        try:
+            tracemalloc.reset_peak()
+            await stream_export(app, token, params)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+    finally:
+        await shutdown(app)
+    return {
+        "notes": args.size,
+        "bytes": received,
+        "elapsed_s": elapsed,
+        "export_peak_traced_mb": peak / (1024 * 1024),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mongodb-url", default=None)
+    parser.add_argument("--database", default="notes-bench-export")
+    parser.add_argument("--mongomock", action="store_true")
+    parser.add_argument("--sqlite", default=None, metavar="PATH", help="benchmark the embedded SQLite backend with a fresh database file")
+    parser.add_argument("--gzip", action="store_true")
+    parser.add_argument("--sizes", default="10000,100000,1000000")
+    parser.add_argument("--size", type=int, default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    if args.size is not None:
+        print(json.dumps(asyncio.run(measure(args))))
+        sys.exit(0)
+
+    runs = []
+    for size in (int(value) for value in args.sizes.split(",")):
+        command = [sys.executable, "-m", "benchmarks.export_memory", "--size", str(size), "--database", args.database]
+        if args.mongodb_url:
+            command += ["--mongodb-url", args.mongodb_url]
+        if args.mongomock:
+            command.append("--mongomock")
+        if args.sqlite:
+            command += ["--sqlite", args.sqlite]
+        if args.gzip:
+            command.append("--gzip")
+        output = subprocess.run(command, capture_output=True, text=True, check=True).stdout
+        runs.append(json.loads(output.strip().splitlines()[-1]))
+    write_report({"commit": git_commit(), "gzip": args.gzip, "runs": runs}, args.output)
@@ -0,0 +1,159 @@
+"""Mixed-workload load test for the notes API.
+
+Boots the application from main.create_app in-process, seeds users and notes, then drives a weighted mix
+of operations at fixed concurrency and prints p50/p95/p99 latency and
+throughput as JSON, tagged with the current commit so runs can be compared:
+
+    python -m benchmarks.load --users 50 --notes zipf:5000 --concurrency 32 --duration 30
+    python -m benchmarks.load --mongomock --mix list=60,get=20,create=10,update=5,delete=5
+    python -m benchmarks.load --sqlite /tmp/notes-bench.db --users 50 --notes zipf:5000
+"""
+import argparse
+import asyncio
+import random
+import time
+from collections import defaultdict
+
+from benchmarks.common import boot, client_for, git_commit, login, random_note, seed, shutdown, summarize, write_report
+
+DEFAULT_MIX = "list=40,get=20,create=10,update=10,delete=5,search=10,login=5"
+
+
+def parse_mix(mix: str) -> dict:
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        weights[name.strip()] = float(weight)
+    return weights
+
+def workload_mix(args) -> dict:
+    # mongomock has no $text support: search is dropped from the default mix
+    # and refused when asked for explicitly
+    weights = parse_mix(args.mix)
+    if args.mongomock and not args.sqlite and "search" in weights:
+        if args.mix != DEFAULT_MIX:
+            raise ValueError("--mongomock cannot run search; remove it from --mix")
+        del weights["search"]
+    return weights
+
+
+class Workload:
+    def __init__(self, client, sessions, rng):
+        self.client = client
+        self.sessions = sessions
+        self.rng = rng
+
+    def _session(self):
+        return self.rng.choice(self.sessions)
+
+    async def _known_note(self, session):
+        if not session["note_ids"]:
+            response = await self.client.get("/notes/", params={"limit": 100, "fields": "title"}, headers=session["headers"])
+            session["note_ids"] = [item["id"] for item in response.json().get("items", [])]
+        return self.rng.choice(session["note_ids"]) if session["note_ids"] else None
+
+    async def list(self, session):
+        return await self.client.get("/notes/", headers=session["headers"])
+
+    async def get(self, session):
+        note_id = await self._known_note(session)
+        return await self.client.get(f"/notes/{note_id}", headers=session["headers"]) if note_id else None
+
+    async def create(self, session):
+        body = {"user_id": "", **random_note(self.rng)}
+        response = await self.client.post("/notes/", json=body, headers=session["headers"])
+        if response.status_code == 200:
+            session["note_ids"].append(response.json()["id"])
+        return response
+
+    async def update(self, session):
+        note_id = await self._known_note(session)
+        if not note_id:
+            return None
+        body = {"user_id": "", **random_note(self.rng)}
+        return await self.client.put(f"/notes/{note_id}", json=body, headers=session["headers"])
+
+    async def delete(self, session):
+        note_id = await self._known_note(session)
+        if not note_id:
+            return None
+        session["note_ids"].remove(note_id)
+        return await self.client.delete(f"/notes/{note_id}", headers=session["headers"])
+
+    async def search(self, session):
+        term = self.rng.choice(["alpha", "delta", "kilo", "romeo", "tango"])
+        return await self.client.get("/notes/search", params={"q": term}, headers=session["headers"])
+
+    async def login(self, session):
+        return await self.client.post("/login", json={"email": session["email"], "password": "bench-password"})
+
+
+async def run(args):
+    weights = workload_mix(args)
+    app = await boot(args.mongodb_url, args.database, args.mongomock, args.sqlite)
+    try:
+        seeded = await seed(app, args.users, args.notes, args.seed)
+        async with client_for(app) as client:
+            sessions = []
+            for user in seeded:
+                token = await login(client, user["email"])
+                sessions.append({"email": user["email"], "headers": {"Authorization": f"Bearer {token}"}, "note_ids": []})
+
+            operations = list(weights)
+            latencies = defaultdict(list)
+            errors = defaultdict(int)
+            deadline = time.perf_counter() + args.duration
+
+            async def worker(index):
+                # Each worker draws from its own seeded stream, so a run's sequence of
+                # operations does not depend on how the workers interleave
+                rng = random.Random(args.seed + index)
+                workload = Workload(client, sessions, rng)
+                while time.perf_counter() < deadline:
+                    op = rng.choices(operations, weights=[weights[name] for name in operations])[0]
+                    started = time.perf_counter()
+                    response = await getattr(workload, op)(rng.choice(sessions))
+                    if response is None:
+                        continue
+                    latencies[op].append(time.perf_counter() - started)
+                    if response.status_code >= 400:
+                        errors[op] += 1
+
+            started = time.perf_counter()
+            await asyncio.gather(*(worker(index) for index in range(args.concurrency)))
+            elapsed = time.perf_counter() - started
+    finally:
+        await shutdown(app)
+
+    all_latencies = [value for values in latencies.values() for value in values]
+    report = {
+        "commit": git_commit(),
+        "config": {key: value for key, value in vars(args).items() if key != "output"},
+        "mix": weights,
+        "elapsed_s": elapsed,
+        "throughput_rps": len(all_latencies) / elapsed if elapsed else 0.0,
+        "total": {**summarize(all_latencies), "errors": sum(errors.values())},
+        "ops": {op: {**summarize(values), "errors": errors[op]} for op, values in sorted(latencies.items())},
+    }
+    write_report(report, args.output)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mongodb-url", default=None, help="defaults to the app settings")
+    parser.add_argument("--database", default="notes-bench")
+    parser.add_argument("--mongomock", action="store_true", help="use mongomock-motor instead of a live mongod")
+    parser.add_argument("--sqlite", default=None, metavar="PATH", help="benchmark the embedded SQLite backend with a fresh database file")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--notes", default="uniform:50-500", help="fixed:N, uniform:A-B or zipf:N")
+    parser.add_argument("--mix", default=DEFAULT_MIX)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", default=None, help="also write the JSON report here")
+    args = parser.parse_args()
+    try:
+        workload_mix(args)
+    except ValueError as exc:
+        parser.error(str(exc))
+    asyncio.run(run(args))
@@ -0,0 +1,134 @@
+"""Microbenchmarks for per-request overheads that do not need a database.
+
+    python -m benchmarks.micro serialization --sizes 1000,10000
+    python -m benchmarks.micro metrics
+    python -m benchmarks.micro auth --iterations 20000
+"""
+import argparse
+import json
+import time
+
+from bson import ObjectId
+
+from benchmarks.common import git_commit, write_report
+
+
+def best_of(func, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def bench_serialization(args) -> dict:
+    # Validated path (Pydantic model per note, then response_model re-validation
+    # and json) vs the fast path (dict projection + FastJSONResponse encoder)
+    from fastapi.encoders import jsonable_encoder
+
+    from app.serialization import dumps, note_page
+    from main import NotePageResponse, NoteSummaryResponse
+
+    results = {}
+    for size in (int(value) for value in args.sizes.split(",")):
+        documents = [
+            {"_id": ObjectId(), "user_id": "user@bench.local", "title": f"Note {index}", "description": "lorem ipsum " * 40}
+            for index in range(size)
+        ]
+
+        def validated():
+            items = [
+                NoteSummaryResponse(id=str(doc["_id"]), title=doc["title"], description=doc["description"], user_id=doc["user_id"])
+                for doc in documents
+            ]
+            page = NotePageResponse(items=items, next_cursor=None)
+            json.dumps(jsonable_encoder(page, exclude_none=True)).encode()
+
+        def fast():
+            dumps(note_page(documents, None))
+
+        validated_s = best_of(validated, args.repeat)
+        fast_s = best_of(fast, args.repeat)
+        results[size] = {
+            "validated_us_per_note": 1e6 * validated_s / size,
+            "fast_us_per_note": 1e6 * fast_s / size,
+            "speedup": validated_s / fast_s if fast_s else None,
+        }
+    return results
+
+
+def bench_metrics(args) -> dict:
+    # Cost of the instrumentation added to every request
+    from app.metrics import Histogram, stage
+
+    histogram = Histogram("bench_seconds", "bench", ("route", "stage"))
+    iterations = args.iterations
+
+    def observe():
+        for _ in range(iterations):
+            histogram.observe(0.003, route="/notes/", stage="db")
+
+    def staged():
+        for _ in range(iterations):
+            with stage("db"):
+                pass
+
+    return {
+        "histogram_observe_us": 1e6 * best_of(observe, args.repeat) / iterations,
+        "stage_context_us": 1e6 * best_of(staged, args.repeat) / iterations,
+    }
+
+
+def bench_auth(args) -> dict:
+    # Token verification per request: a full decode (what every request paid
+    # before) vs the claims cache, plus issuing a token pair on refresh
+    from datetime import timedelta
+
+    import jwt
+
+    from app.tokens import TokenService
+
+    service = TokenService({"bench": "bench-secret"}, "bench", access_ttl=timedelta(hours=1))
+    token = service.issue({"sub": "user@bench.local", "username": "bench"})
+    iterations = args.iterations
+
+    def decode():
+        for _ in range(iterations):
+            jwt.decode(token, "bench-secret", algorithms=["HS256"])
+
+    def cached():
+        for _ in range(iterations):
+            service.verify(token)
+
+    def issue():
+        for _ in range(iterations):
+            service.issue_pair({"sub": "user@bench.local", "username": "bench"})
+
+    service.verify(token)
+    decode_s = best_of(decode, args.repeat)
+    cached_s = best_of(cached, args.repeat)
+    return {
+        "decode_us": 1e6 * decode_s / iterations,
+        "cached_verify_us": 1e6 * cached_s / iterations,
+        "speedup": decode_s / cached_s if cached_s else None,
+        "issue_pair_us": 1e6 * best_of(issue, args.repeat) / iterations,
+        "cache": service.stats(),
+    }
+
+
+BENCHMARKS = {
+    "serialization": bench_serialization,
+    "metrics": bench_metrics,
+    "auth": bench_auth,
+}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("benchmark", choices=sorted(BENCHMARKS))
+    parser.add_argument("--sizes", default="1000,10000")
+    parser.add_argument("--iterations", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+    write_report({"commit": git_commit(), "benchmark": args.benchmark, "results": BENCHMARKS[args.benchmark](args)}, args.output)
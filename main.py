@@ -1,31 +1,39 @@
-from datetime import datetime, timedelta, timezone
+import asyncio
+from contextlib import asynccontextmanager
+from datetime import datetime
 from typing import Optional, List
 
-import jwt
 from jwt import PyJWTError
-from fastapi import Depends, FastAPI, HTTPException, status
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, Body, Depends, FastAPI, Header, HTTPException, Query, Request, Response, status
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from fastapi.middleware.cors import CORSMiddleware
-from passlib.context import CryptContext
-from pymongo import MongoClient
 from bson import ObjectId
 from pydantic import BaseModel, Field
 
-# Configuration settings
-class Settings:
-    mongodb_url = "mongodb://localhost:27017"
-    secret_key = "your_secret_key_here"
-    algorithm = "HS256"
-    access_token_expire_minutes = 30
-
-settings = Settings()
-
-# MongoDB setup
-client = MongoClient(settings.mongodb_url)
-db = client['notes-app']
-users_collection = db['users']
-notes_collection = db['notes']
+from app.compression import CompressionMiddleware
+from app.etags import (
+    etag_matches,
+    http_date,
+    if_none_match_tags,
+    list_etag,
+    note_etag,
+    parse_if_match,
+    parse_note_etag,
+)
+from app.events import sse_stream, watch_note_changes
+from app.bodies import BodyLimitMiddleware, body_chunks, check_note_size, expand_bodies, full_description, is_truncated
+from app.export import gzip_chunks, ndjson_chunks
+from app.metrics import REGISTRY, MetricsMiddleware, stage
+from app.notes_router import create_notebook_router
+from app.pagination import page_projection, page_size
+from app.ratelimit import RateLimitMiddleware
+from app.search import highlight, query_terms
+from app.serialization import FastJSONResponse, dumps, note_page
+from app.services import Services, get_repository, get_services
+from app.settings import Settings
+from app.storage import StorageBackend
+from app.tokens import REFRESH
 
 # Models
 class User(BaseModel):
@@ -38,6 +46,9 @@ class UserInDB(User):
 class Token(BaseModel):
     access_token: str
     token_type: str
+    refresh_token: Optional[str] = None
+    # Access token lifetime in seconds
+    expires_in: Optional[int] = None
 
 class TokenData(BaseModel):
     username: Optional[str] = None
@@ -50,6 +61,57 @@ class NoteEntry(BaseModel):
 class NoteEntryResponse(NoteEntry):
     id: str = Field(default_factory=lambda: str(ObjectId()))
 
+class NoteSummaryResponse(BaseModel):
+    id: str
+    user_id: str
+    title: Optional[str] = None
+    description: Optional[str] = None
+    # Set for large notes, whose description is only a preview
+    truncated: Optional[bool] = None
+    body_size: Optional[int] = None
+
+class NotePageResponse(BaseModel):
+    items: List[NoteSummaryResponse]
+    next_cursor: Optional[str] = None
+
+class NoteSearchHit(BaseModel):
+    id: str
+    title: str
+    snippet: str
+    score: float
+
+class NoteSearchResponse(BaseModel):
+    items: List[NoteSearchHit]
+    next_offset: Optional[int] = None
+
+class NoteBatchUpdate(BaseModel):
+    id: str
+    title: Optional[str] = None
+    description: Optional[str] = None
+
+class NoteBatchItemResult(BaseModel):
+    index: int
+    id: Optional[str] = None
+    status: str
+    error: Optional[str] = None
+
+class NoteBatchResponse(BaseModel):
+    ordered: bool
+    results: List[NoteBatchItemResult]
+
+class NoteChange(BaseModel):
+    op: str
+    id: str
+    revision: int
+    updated_at: Optional[datetime] = None
+    note: Optional[NoteEntryResponse] = None
+    truncated: Optional[bool] = None
+
+class NoteChangesResponse(BaseModel):
+    changes: List[NoteChange]
+    revision: int
+    has_more: bool
+
 class RegisterRequest(BaseModel):
     username: str
     email: str
@@ -59,121 +121,245 @@ class LoginRequest(BaseModel):
     email: str
     password: str
 
+class RefreshRequest(BaseModel):
+    refresh_token: str
+
 # Security
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token", auto_error=False)
 
-# Helper functions
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
-
-def get_password_hash(password):
-    return pwd_context.hash(password)
+# Helper functions; each application's shared state lives on app.state.services
+async def get_password_hash(services: Services, password):
+    return await services.password_hasher.hash(password)
 
-def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
-    to_encode = data.copy()
-    expire = datetime.now(timezone.utc) + (expires_delta or timedelta(minutes=15))
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, settings.secret_key, algorithm=settings.algorithm)
-    return encoded_jwt
-
-def get_user(email: str):
-    user_dict = users_collection.find_one({"email": email})
+async def get_user(services: Services, email: str):
+    user_dict = await services.repository.get_user(email)
     if user_dict:
         return UserInDB(**user_dict)
 
-# FastAPI app
-app = FastAPI()
-
-# CORS settings
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],  # Adjust as needed
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+def invalidate_user(services: Services, email: str):
+    # Call whenever a user document changes or is removed
+    services.user_cache.invalidate(email)
+
+def issue_user_tokens(services: Services, user) -> dict:
+    # A short-lived access token plus a refresh token, so clients rarely log in
+    # (and pay for bcrypt) again
+    token_service = services.token_service
+    access_token, refresh_token = token_service.issue_pair({"sub": user.email, "username": user.username})
+    return {
+        "access_token": access_token,
+        "token_type": "bearer",
+        "refresh_token": refresh_token,
+        "expires_in": int(token_service.access_ttl.total_seconds()),
+    }
 
-async def get_current_user(token: str = Depends(oauth2_scheme)):
-    credentials_exception = HTTPException(
+def credentials_error() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+async def authenticate_user(services: Services, email: str, password: str):
+    user = await get_user(services, email)
+    if not user:
+        return None
+    valid, new_hash = await services.password_hasher.verify_and_update(password, user.hashed_password)
+    if not valid:
+        return None
+    if new_hash:
+        # Transparently upgrade hashes created with a different cost factor
+        await services.repository.update_user(user.email, {"hashed_password": new_hash})
+        invalidate_user(services, user.email)
+    return user
+
+# FastAPI app
+router = APIRouter()
+
+@asynccontextmanager
+async def lifespan(application: FastAPI):
+    services: Services = application.state.services
+    settings = services.settings
+    repository = services.repository
+    # The Motor client is created here, inside the worker's event loop
+    await repository.connect()
+    if settings.create_indexes_on_startup:
+        await repository.ensure_indexes()
+    await services.revocations.sync()
+    services.background_tasks.append(asyncio.create_task(services.revocations.run()))
+    if settings.change_streams_enabled and repository.change_streams:
+        services.background_tasks.append(asyncio.create_task(
+            watch_note_changes(repository.db, services.note_events, services.use_in_process_events)
+        ))
+    else:
+        services.use_in_process_events()
+    if services.insert_batcher is not None:
+        services.insert_batcher.start()
     try:
-        payload = jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm])
-        username: str = payload.get("sub")
-        if username is None:
-            raise credentials_exception
-        token_data = TokenData(username=username)
-    except jwt.ExpiredSignatureError:
+        yield
+    finally:
+        if services.insert_batcher is not None:
+            await services.insert_batcher.close()
+        for task in services.background_tasks:
+            task.cancel()
+        await repository.close()
+        services.password_hasher.shutdown()
+
+async def resolve_user(services: Services, token: Optional[str]):
+    credentials_exception = credentials_error()
+    if not token:
         raise credentials_exception
+    try:
+        with stage("auth"):
+            payload = services.token_service.verify(token)
     except PyJWTError:
         raise credentials_exception
-    user = get_user(token_data.username)
-    if user is None:
+    username: str = payload.get("sub")
+    if username is None or services.revocations.is_revoked(payload.get("jti")):
         raise credentials_exception
+    token_data = TokenData(username=username)
+    if services.settings.trust_token_claims and payload.get("username") is not None:
+        return User(username=payload["username"], email=token_data.username)
+    user = services.user_cache.get(token_data.username)
+    if user is None:
+        user = await get_user(services, token_data.username)
+        if user is None:
+            raise credentials_exception
+        services.user_cache.set(token_data.username, user)
     return user
 
-@app.post("/register")
-async def register(user: RegisterRequest):
-    existing_user = users_collection.find_one({"email": user.email})
+async def get_current_user(token: str = Depends(oauth2_scheme), services: Services = Depends(get_services)):
+    return await resolve_user(services, token)
+
+async def get_stream_user(
+    token: Optional[str] = Depends(optional_oauth2_scheme),
+    access_token: Optional[str] = Query(None),
+    services: Services = Depends(get_services),
+):
+    # EventSource cannot set headers, so browsers pass the token as a query parameter
+    return await resolve_user(services, token or access_token)
+
+@router.post("/register")
+async def register(user: RegisterRequest, services: Services = Depends(get_services)):
+    existing_user = await services.repository.get_user(user.email)
     if existing_user:
         raise HTTPException(status_code=400, detail="Email already registered")
-    hashed_password = get_password_hash(user.password)
+    hashed_password = await get_password_hash(services, user.password)
     user_dict = {"username": user.username, "email": user.email, "hashed_password": hashed_password}
-    users_collection.insert_one(user_dict)
-    access_token = create_access_token(data={"sub": user.email})
-    return {"access_token": access_token, "token_type": "bearer"}
-
-@app.post("/login", response_model=Token)
-async def login(user_cred: LoginRequest):
-    user = get_user(user_cred.email)
-    if not user or not verify_password(user_cred.password, user.hashed_password):
+    await services.repository.create_user(user_dict)
+    invalidate_user(services, user.email)
+    return issue_user_tokens(services, user)
+
+@router.post("/login", response_model=Token)
+async def login(user_cred: LoginRequest, services: Services = Depends(get_services)):
+    user = await authenticate_user(services, user_cred.email, user_cred.password)
+    if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    access_token_expires = timedelta(minutes=settings.access_token_expire_minutes)
-    access_token = create_access_token(data={"sub": user.email}, expires_delta=access_token_expires)
-    return {"access_token": access_token, "token_type": "bearer"}
+    return issue_user_tokens(services, user)
 
-@app.post("/logout")
-async def logout(token: str = Depends(oauth2_scheme)):
+@router.post("/logout")
+async def logout(
+    refresh: Optional[RefreshRequest] = None,
+    token: str = Depends(oauth2_scheme),
+    services: Services = Depends(get_services)
+):
+    # Revokes the access token and, when the client sends it, its refresh token
     try:
-        payload = jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm])
-        response = JSONResponse(content={"message": "Logout successful"})
-        response.delete_cookie(key="Authorization")
-        return response
+        claims = services.token_service.verify(token)
     except PyJWTError:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Could not validate credentials",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
+        raise credentials_error()
+    await services.revocations.revoke(claims)
+    if refresh is not None:
+        try:
+            refresh_claims = services.token_service.verify(refresh.refresh_token, REFRESH)
+        except PyJWTError:
+            refresh_claims = None
+        if refresh_claims is not None and refresh_claims.get("sub") == claims.get("sub"):
+            await services.revocations.revoke(refresh_claims)
+    response = JSONResponse(content={"message": "Logout successful"})
+    response.delete_cookie(key="Authorization")
+    return response
 
-@app.post("/token", response_model=Token)
-async def login(form_data: OAuth2PasswordRequestForm = Depends()):
-    user = get_user(form_data.username)
-    if not user or not verify_password(form_data.password, user.hashed_password):
+@router.post("/token", response_model=Token)
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), services: Services = Depends(get_services)):
+    user = await authenticate_user(services, form_data.username, form_data.password)
+    if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    access_token = create_access_token(data={"sub": user.email})
-    return {"access_token": access_token, "token_type": "bearer"}
+    return issue_user_tokens(services, user)
 
-@app.post("/notes/", response_class=JSONResponse, response_model=NoteEntryResponse)
+@router.post("/token/refresh", response_model=Token)
+async def refresh_tokens(request: RefreshRequest, services: Services = Depends(get_services)):
+    # Trades a refresh token for a new pair without touching the password hash;
+    # each refresh token is accepted once
+    try:
+        payload = services.token_service.verify(request.refresh_token, REFRESH)
+    except PyJWTError:
+        raise credentials_error()
+    # Revoking is the single-use check: a concurrent or repeated refresh with
+    # the same token finds its jti already recorded
+    if not await services.revocations.revoke(payload):
+        raise credentials_error()
+    email = payload.get("sub")
+    user = services.user_cache.get(email) if email else None
+    if user is None:
+        user = await get_user(services, email) if email else None
+        if user is None:
+            raise credentials_error()
+        services.user_cache.set(email, user)
+    return issue_user_tokens(services, user)
+
+# Probes are mounted whatever the routers setting says
+health_router = APIRouter()
+
+@health_router.get("/health/live")
+async def liveness():
+    # Answering at all shows the worker's event loop is responsive
+    return {"status": "ok"}
+
+@health_router.get("/health/ready")
+async def readiness(services: Services = Depends(get_services)):
+    try:
+        reachable = await asyncio.wait_for(services.repository.ping(), timeout=services.settings.readiness_timeout_seconds)
+    except asyncio.TimeoutError:
+        reachable = False
+    if not reachable:
+        return JSONResponse(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, content={"status": "unavailable", "storage": False})
+    return {"status": "ok", "storage": True}
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def read_metrics():
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+# Component counters for operators; unauthenticated, so only mounted when
+# internal_stats_enabled is set for a deployment that keeps it off the public port
+internal_router = APIRouter()
+
+@internal_router.get("/internal/stats")
+async def read_stats(services: Services = Depends(get_services)):
+    return services.stats()
+
+@router.post("/notes/", response_class=JSONResponse, response_model=NoteEntryResponse)
 async def create_note_entry(
     entry: NoteEntry,
-    current_user: UserInDB = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    services: Services = Depends(get_services)
 ):
+    check_note_size(entry.title, entry.description, services.settings)
     entry_dict = entry.dict()
     entry_dict['user_id'] = current_user.email
-    result = notes_collection.insert_one(entry_dict)
-    entry_id = str(result.inserted_id)
+    if services.insert_batcher is not None:
+        entry_id = await services.insert_batcher.submit(current_user.email, entry_dict)
+    else:
+        entry_id = await services.repository.create_note(entry_dict)
+    await invalidate_notes(services, current_user.email)
 
     response_data = {
         "id": entry_id,
@@ -183,68 +369,400 @@ async def create_note_entry(
     }
     return response_data
 
-@app.get("/notes/", response_class=JSONResponse, response_model=List[NoteEntryResponse])
-async def read_note_entries(current_user: UserInDB = Depends(get_current_user)):
-    entries = list(notes_collection.find({"user_id": current_user.email}))
-    
-    response_data = []
+async def invalidate_notes(services: Services, user_id: str):
+    # Cache keys carry the notes version, so this frees memory early rather than
+    # guarding correctness; other workers' entries simply stop being looked up
+    if services.notes_cache is not None:
+        await services.notes_cache.invalidate_group(user_id)
+
+def check_batch_size(settings: Settings, items: list):
+    if len(items) > settings.max_batch_size:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Batches are limited to {settings.max_batch_size} items",
+        )
+
+@router.post("/notes/batch", response_model=NoteBatchResponse)
+async def create_note_entries(
+    entries: List[NoteEntry],
+    ordered: bool = True,
+    current_user: User = Depends(get_current_user),
+    services: Services = Depends(get_services)
+):
+    check_batch_size(services.settings, entries)
+    notes = []
     for entry in entries:
-        response_data.append(NoteEntryResponse(
-            id=str(entry.get('_id')),
-            title=entry.get('title'),
-            description=entry.get('description'),
-            user_id=entry.get('user_id')
+        check_note_size(entry.title, entry.description, services.settings)
+        entry_dict = entry.dict()
+        entry_dict.pop('user_id')
+        notes.append(entry_dict)
+    results = await services.repository.create_notes(current_user.email, notes, ordered)
+    await invalidate_notes(services, current_user.email)
+    return {"ordered": ordered, "results": results}
+
+@router.patch("/notes/batch", response_model=NoteBatchResponse)
+async def update_note_entries(
+    updates: List[NoteBatchUpdate],
+    ordered: bool = True,
+    current_user: User = Depends(get_current_user),
+    services: Services = Depends(get_services)
+):
+    check_batch_size(services.settings, updates)
+    for update in updates:
+        check_note_size(update.title, update.description, services.settings)
+    results = await services.repository.update_notes(current_user.email, [update.dict() for update in updates], ordered)
+    await invalidate_notes(services, current_user.email)
+    return {"ordered": ordered, "results": results}
+
+@router.delete("/notes/batch", response_model=NoteBatchResponse)
+async def delete_note_entries(
+    entry_ids: List[str] = Body(...),
+    ordered: bool = True,
+    current_user: User = Depends(get_current_user),
+    services: Services = Depends(get_services)
+):
+    check_batch_size(services.settings, entry_ids)
+    results = await services.repository.delete_notes(current_user.email, entry_ids, ordered)
+    await invalidate_notes(services, current_user.email)
+    return {"ordered": ordered, "results": results}
+
+def set_validators(response: Response, etag: str, last_modified: Optional[str]):
+    # no-cache makes browsers revalidate with If-None-Match instead of refetching
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "private, no-cache"
+    if last_modified:
+        response.headers["Last-Modified"] = last_modified
+
+def not_modified(etag: str, last_modified: Optional[str]) -> Response:
+    response = Response(status_code=status.HTTP_304_NOT_MODIFIED)
+    set_validators(response, etag, last_modified)
+    return response
+
+def cached_response(body: bytes, etag: str, last_modified: Optional[str]) -> Response:
+    response = FastJSONResponse(body)
+    set_validators(response, etag, last_modified)
+    return response
+
+@router.get("/notes/", response_class=JSONResponse, response_model=NotePageResponse, response_model_exclude_none=True)
+async def read_note_entries(
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1),
+    after: Optional[str] = None,
+    fields: Optional[str] = None,
+    preview: Optional[int] = Query(None, ge=0),
+    compact: bool = False,
+    if_none_match: Optional[str] = Header(None),
+    current_user: User = Depends(get_current_user),
+    services: Services = Depends(get_services)
+):
+    settings, repository, notes_cache = services.settings, services.repository, services.notes_cache
+    limit = page_size(limit, settings.notes_page_size, settings.notes_max_page_size)
+    # The version is read before the notes so a tag never claims newer content than it covers
+    notes_version, updated_at = await repository.get_notes_version(current_user.email)
+    etag = list_etag(current_user.email, notes_version, f"{limit}|{after}|{fields}|{preview}|{compact}")
+    last_modified = http_date(updated_at)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag, last_modified)
+
+    cache_key = f"notes:{current_user.email}:{notes_version}:list:{limit}|{after}|{fields}|{preview}|{compact}"
+    if notes_cache is not None:
+        body = await notes_cache.get(cache_key)
+        if body is not None:
+            return cached_response(body, etag, last_modified)
+
+    # The compact shape (user_id hoisted to the envelope) has no Pydantic model
+    fast_path = compact or settings.fast_serialization
+    projection = page_projection(fields, preview)
+    if fast_path:
+        projection = projection or {"_id": 1, "user_id": 1, "title": 1, "description": 1, "body.size": 1}
+    entries, next_cursor = await repository.list_notes_page(current_user.email, limit, after, projection)
+
+    if fast_path:
+        with stage("serialize"):
+            body = dumps(note_page(entries, next_cursor, current_user.email if compact else None))
+        if notes_cache is not None:
+            await notes_cache.set(cache_key, body, group=current_user.email)
+        return cached_response(body, etag, last_modified)
+
+    response_data = []
+    with stage("serialize"):
+        for entry in entries:
+            response_data.append(NoteSummaryResponse(
+                id=str(entry.get('_id')),
+                title=entry.get('title'),
+                description=entry.get('description'),
+                user_id=entry.get('user_id'),
+                truncated=True if is_truncated(entry) else None,
+                body_size=entry['body'].get('size') if is_truncated(entry) else None
+            ))
+        if notes_cache is not None:
+            # Validated like any other response, then encoded once for the cache
+            page = NotePageResponse(items=response_data, next_cursor=next_cursor)
+            body = dumps(page.dict(exclude_none=True))
+
+    if notes_cache is not None:
+        await notes_cache.set(cache_key, body, group=current_user.email)
+        return cached_response(body, etag, last_modified)
+    set_validators(response, etag, last_modified)
+    return {"items": response_data, "next_cursor": next_cursor}
+
+@router.get("/notes/search", response_model=NoteSearchResponse)
+async def search_note_entries(
+    q: str = Query(..., min_length=1, max_length=256),
+    limit: Optional[int] = Query(None, ge=1),
+    offset: int = Query(0, ge=0),
+    current_user: User = Depends(get_current_user),
+    services: Services = Depends(get_services)
+):
+    limit = page_size(limit, services.settings.search_page_size, services.settings.search_max_page_size)
+    entries = await services.repository.search_notes(current_user.email, q, limit, offset)
+    next_offset = offset + limit if len(entries) > limit else None
+    terms = query_terms(q)
+
+    hits = []
+    for entry in entries[:limit]:
+        hits.append(NoteSearchHit(
+            id=str(entry['_id']),
+            title=highlight(entry.get('title'), terms),
+            snippet=highlight(entry.get('description'), terms),
+            score=entry.get('score', 0.0)
         ))
-    
-    return response_data
+    return {"items": hits, "next_offset": next_offset}
+
+@router.get("/notes/changes", response_model=NoteChangesResponse, response_model_exclude_none=True)
+async def read_note_changes(
+    since: int = Query(0, ge=0),
+    limit: Optional[int] = Query(None, ge=1),
+    current_user: User = Depends(get_current_user),
+    services: Services = Depends(get_services)
+):
+    limit = page_size(limit, services.settings.changes_page_size, services.settings.changes_max_page_size)
+    changes, has_more = await services.repository.list_changes(current_user.email, since, limit)
+
+    response_data = []
+    for change in changes:
+        if change['op'] == "delete":
+            response_data.append(NoteChange(op="delete", id=str(change['note_id']), revision=change['revision']))
+            continue
+        entry = change['note']
+        response_data.append(NoteChange(
+            op=change['op'],
+            id=str(entry['_id']),
+            revision=change['revision'],
+            updated_at=entry.get('updated_at'),
+            note=NoteEntryResponse(
+                id=str(entry['_id']),
+                title=entry.get('title'),
+                description=entry.get('description'),
+                user_id=entry.get('user_id')
+            ),
+            truncated=True if is_truncated(entry) else None
+        ))
+
+    # Clients pass this back as ?since= on their next sync
+    revision = changes[-1]['revision'] if changes else since
+    return {"changes": response_data, "revision": revision, "has_more": has_more}
 
-@app.get("/notes/{entry_id}", response_class=JSONResponse, response_model=NoteEntryResponse)
+@router.get("/notes/stream")
+async def stream_note_events(
+    request: Request,
+    current_user: User = Depends(get_stream_user),
+    services: Services = Depends(get_services)
+):
+    note_events = services.note_events
+    subscription = note_events.subscribe(current_user.email)
+    body = sse_stream(note_events, subscription, services.settings.stream_heartbeat_seconds, request.is_disconnected)
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    return StreamingResponse(body, media_type="text/event-stream", headers=headers)
+
+@router.get("/notes/export")
+async def export_note_entries(
+    compress: Optional[str] = Query(None, pattern="^gzip$"),
+    current_user: User = Depends(get_current_user),
+    services: Services = Depends(get_services)
+):
+    repository = services.repository
+    notes = expand_bodies(repository, repository.iter_notes(current_user.email, services.settings.export_batch_size))
+    body = ndjson_chunks(notes)
+    headers = {"Content-Disposition": 'attachment; filename="notes.ndjson"'}
+    if compress == "gzip":
+        body = gzip_chunks(body)
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(body, media_type="application/x-ndjson", headers=headers)
+
+@router.get("/notes/{entry_id}", response_class=JSONResponse, response_model=NoteEntryResponse)
 async def read_note_entry(
     entry_id: str,
-    current_user: UserInDB = Depends(get_current_user)
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    current_user: User = Depends(get_current_user),
+    services: Services = Depends(get_services)
 ):
-    entry = notes_collection.find_one({"_id": ObjectId(entry_id), "user_id": current_user.email})
+    repository, notes_cache = services.repository, services.notes_cache
+    notes_version, updated_at = await repository.get_notes_version(current_user.email)
+    last_modified = http_date(updated_at)
+    client_tags = [parse_note_etag(tag) for tag in if_none_match_tags(if_none_match)]
+    for tag in client_tags:
+        # Nothing in the notebook was written since this tag was issued
+        if tag and tag[1] == notes_version:
+            return not_modified(note_etag({"version": tag[0]}, notes_version), last_modified)
+
+    # Cached values are the ETag and the JSON body separated by a newline
+    cache_key = f"notes:{current_user.email}:{notes_version}:note:{entry_id}"
+    if notes_cache is not None:
+        cached = await notes_cache.get(cache_key)
+        if cached is not None:
+            etag, _, body = cached.decode().partition("\n")
+            if any(tag and tag[0] == parse_note_etag(etag)[0] for tag in client_tags):
+                return not_modified(etag, last_modified)
+            return cached_response(body.encode(), etag, last_modified)
+
+    entry = await repository.get_note(entry_id, current_user.email)
     if entry:
+        etag = note_etag(entry, notes_version)
+        if any(tag and tag[0] == entry.get('version', 0) for tag in client_tags):
+            return not_modified(etag, last_modified)
         response_data = {
             "id": str(entry.get('_id')),
             "title": entry.get('title'),
-            "description": entry.get('description'),
+            "description": await full_description(repository, entry),
             "user_id": entry.get('user_id')
         }
+        if notes_cache is not None:
+            body = dumps(response_data)
+            await notes_cache.set(cache_key, etag.encode() + b"\n" + body, group=current_user.email)
+            return cached_response(body, etag, last_modified)
+        set_validators(response, etag, last_modified)
         return response_data
     raise HTTPException(status_code=404, detail="Note entry not found")
 
-@app.put("/notes/{entry_id}", response_class=JSONResponse, response_model=NoteEntryResponse)
+@router.get("/notes/{entry_id}/body")
+async def read_note_body(
+    entry_id: str,
+    current_user: User = Depends(get_current_user),
+    repository: StorageBackend = Depends(get_repository)
+):
+    # Streams the full text of a note, decompressing large bodies chunk by chunk
+    if not ObjectId.is_valid(entry_id):
+        raise HTTPException(status_code=404, detail="Note entry not found")
+    entry = await repository.get_note(entry_id, current_user.email)
+    if not entry:
+        raise HTTPException(status_code=404, detail="Note entry not found")
+    headers = {"ETag": note_etag(entry), "Cache-Control": "no-cache"}
+    return StreamingResponse(body_chunks(repository, entry), media_type="text/plain; charset=utf-8", headers=headers)
+
+@router.put("/notes/{entry_id}", response_class=JSONResponse, response_model=NoteEntryResponse)
 async def update_note_entry(
     entry_id: str,
     entry: NoteEntry,
-    current_user: UserInDB = Depends(get_current_user)
+    response: Response,
+    if_match: Optional[str] = Header(None),
+    current_user: User = Depends(get_current_user),
+    services: Services = Depends(get_services)
 ):
+    repository = services.repository
+    check_note_size(entry.title, entry.description, services.settings)
     entry_dict = entry.dict()
     entry_dict.pop('user_id')
-    existing_entry = notes_collection.find_one({"_id": ObjectId(entry_id), "user_id": current_user.email})
-    if existing_entry:
-        result = notes_collection.update_one({"_id": ObjectId(entry_id)}, {"$set": entry_dict})
-        if result.modified_count == 1:
-            response_data = {
-                "id": entry_id,
-                "title": entry.title,
-                "description": entry.description,
-                "user_id": entry.user_id
-            }
-            return response_data
-    raise HTTPException(status_code=404, detail="Note entry not found")
+    expected_version = parse_if_match(if_match)
+    updated_entry = await repository.update_note(entry_id, current_user.email, entry_dict, expected_version)
+    if updated_entry is None:
+        # Only the failure path pays for a second lookup to tell a conflict from a miss
+        if expected_version is not None and await repository.get_note(entry_id, current_user.email):
+            raise HTTPException(
+                status_code=status.HTTP_412_PRECONDITION_FAILED,
+                detail="Note entry was modified by another request",
+            )
+        raise HTTPException(status_code=404, detail="Note entry not found")
+    await invalidate_notes(services, current_user.email)
+    response.headers["ETag"] = note_etag(updated_entry)
+    response_data = {
+        "id": entry_id,
+        "title": updated_entry.get('title'),
+        "description": entry.description,
+        "user_id": updated_entry.get('user_id')
+    }
+    return response_data
 
-@app.delete("/notes/{entry_id}", response_class=JSONResponse)
+@router.delete("/notes/{entry_id}", response_class=JSONResponse)
 async def delete_note_entry(
     entry_id: str,
-    current_user: UserInDB = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    services: Services = Depends(get_services)
 ):
-    result = notes_collection.delete_one({"_id": ObjectId(entry_id), "user_id": current_user.email})
-    if result.deleted_count == 1:
+    deleted_count = await services.repository.delete_note(entry_id, current_user.email)
+    if deleted_count == 1:
+        await invalidate_notes(services, current_user.email)
         return {"message": "Note entry deleted successfully"}
     raise HTTPException(status_code=404, detail="Note entry not found")
 
+def create_app(app_settings: Optional[Settings] = None, repository: Optional[StorageBackend] = None) -> FastAPI:
+    # Each call builds an independent application; nothing is shared through module state
+    settings = app_settings or Settings()
+    services = Services(settings, repository)
+    services.register_metrics()
+    application = FastAPI(lifespan=lifespan)
+    application.state.services = services
+    application.include_router(health_router)
+    if settings.internal_stats_enabled:
+        application.include_router(internal_router)
+    if "notes" in settings.routers:
+        application.include_router(router)
+    if "notebook" in settings.routers:
+        application.include_router(
+            create_notebook_router(get_repository, get_current_user),
+            prefix="/api",
+            tags=["notes"],
+        )
+
+    # Innermost, so refused bodies still get CORS headers and metrics
+    application.add_middleware(
+        BodyLimitMiddleware,
+        max_bytes=settings.note_max_request_bytes,
+        batch_max_bytes=settings.batch_max_request_bytes,
+    )
+
+    # Rate limiting; registered before CORS so throttled responses still carry CORS headers
+    if settings.rate_limit_enabled:
+        application.add_middleware(
+            RateLimitMiddleware,
+            store=services.rate_limit_store,
+            paths=["/login", "/token", "/register"],
+            ip_rate=(settings.rate_limit_ip[0] / 60, settings.rate_limit_ip[1]),
+            account_rate=(settings.rate_limit_account[0] / 60, settings.rate_limit_account[1]),
+            trust_forwarded_for=settings.rate_limit_trust_forwarded_for,
+            proxy_hops=settings.rate_limit_proxy_hops,
+        )
+
+    application.add_middleware(
+        CORSMiddleware,
+        allow_origins=list(settings.cors_origins),
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+
+    if settings.compression_enabled:
+        application.add_middleware(
+            CompressionMiddleware,
+            minimum_size=settings.compression_minimum_size,
+            gzip_level=settings.gzip_level,
+            brotli_quality=settings.brotli_quality,
+        )
+
+    # Outermost, so timings include every other middleware
+    if settings.metrics_enabled:
+        application.add_middleware(MetricsMiddleware)
+    return application
+
+def __getattr__(name: str):
+    # `uvicorn main:app` builds the default application on first access
+    if name == "app":
+        global app
+        app = create_app()
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 if __name__ == "__main__":
-    import uvicorn
-    uvicorn.run(app, host="127.0.0.1", port=8000)
\ No newline at end of file
+    from app.serve import main as serve_main
+    serve_main()
@@ -1,4 +1,4 @@
-import React, { useState } from 'react';
+import React, { useState, useEffect } from 'react';
 import {
   BrowserRouter as Router,
   Routes,
@@ -14,6 +14,45 @@ const API_BASE_URL = 'http://localhost:8000';
 
 function App() {
   const [accessToken, setAccessToken] = useState(Cookies.get('accessToken') || '');
+  const [refreshToken, setRefreshToken] = useState(Cookies.get('refreshToken') || '');
+  const [expiresIn, setExpiresIn] = useState(0);
+
+  const storeTokens = (data) => {
+    setAccessToken(data.access_token);
+    Cookies.set('accessToken', data.access_token, { expires: 7 }); // Set cookie for 7 days
+    if (data.refresh_token) {
+      setRefreshToken(data.refresh_token);
+      Cookies.set('refreshToken', data.refresh_token, { expires: 14 });
+    }
+    setExpiresIn(data.expires_in || 0);
+  };
+
+  useEffect(() => {
+    // Access tokens are short-lived; trade the refresh token for a new pair
+    // shortly before expiry (or straight away after a reload)
+    if (!refreshToken) {
+      return undefined;
+    }
+    const refresh = async () => {
+      try {
+        const response = await fetch(`${API_BASE_URL}/token/refresh`, {
+          method: 'POST',
+          headers: {
+            'Content-Type': 'application/json',
+          },
+          body: JSON.stringify({ refresh_token: refreshToken }),
+        });
+        if (!response.ok) {
+          throw new Error('Token refresh failed');
+        }
+        storeTokens(await response.json());
+      } catch (error) {
+        console.error('Token refresh error:', error);
+      }
+    };
+    const timer = setTimeout(refresh, expiresIn ? expiresIn * 800 : 0);
+    return () => clearTimeout(timer);
+  }, [refreshToken, expiresIn]);
 
   const register = async (userData) => {
     try {
@@ -27,9 +66,7 @@ function App() {
       if (!response.ok) {
         throw new Error('Registration failed');
       }
-      const data = await response.json();
-      setAccessToken(data.access_token);
-      Cookies.set('accessToken', data.access_token, { expires: 7 }); // Set cookie for 7 days
+      storeTokens(await response.json());
     } catch (error) {
       console.error('Registration error:', error);
       alert('Registration failed.');
@@ -48,9 +85,7 @@ function App() {
       if (!response.ok) {
         throw new Error('Login failed');
       }
-      const data = await response.json();
-      setAccessToken(data.access_token);
-      Cookies.set('accessToken', data.access_token, { expires: 7 }); // Set cookie for 7 days
+      storeTokens(await response.json());
     } catch (error) {
       console.error('Login error:', error);
       alert('Login failed.');
@@ -59,14 +94,19 @@ function App() {
 
   const logout = async () => {
     try {
+      // Revokes both tokens server-side
       await fetch(`${API_BASE_URL}/logout`, {
         method: 'POST',
         headers: {
+          'Content-Type': 'application/json',
           'Authorization': `Bearer ${accessToken}`
-        }
+        },
+        body: JSON.stringify(refreshToken ? { refresh_token: refreshToken } : null),
       });
       setAccessToken('');
+      setRefreshToken('');
       Cookies.remove('accessToken'); // Remove the access token cookie
+      Cookies.remove('refreshToken');
     } catch (error) {
       console.error('Logout error:', error);
       alert('Logout failed.');
@@ -17,16 +17,26 @@ const Dashboard = ({ accessToken }) => {
 
   const fetchNotes = async () => {
     try {
-      const response = await fetch('http://localhost:8000/notes/', {
-        headers: {
-          Authorization: `Bearer ${accessToken}`,
-        },
-      });
-      if (!response.ok) {
-        throw new Error('Failed to fetch notes');
-      }
-      const data = await response.json();
-      setNotes(data);
+      // The list endpoint is paginated; follow next_cursor until exhausted
+      let allNotes = [];
+      let cursor = null;
+      do {
+        const url = cursor
+          ? `http://localhost:8000/notes/?after=${encodeURIComponent(cursor)}`
+          : 'http://localhost:8000/notes/';
+        const response = await fetch(url, {
+          headers: {
+            Authorization: `Bearer ${accessToken}`,
+          },
+        });
+        if (!response.ok) {
+          throw new Error('Failed to fetch notes');
+        }
+        const data = await response.json();
+        allNotes = allNotes.concat(data.items);
+        cursor = data.next_cursor;
+      } while (cursor);
+      setNotes(allNotes);
     } catch (error) {
       console.error('Fetch notes error:', error);
       // Handle error
@@ -72,7 +82,7 @@ const Dashboard = ({ accessToken }) => {
         throw new Error('Failed to update note');
       }
       const updatedNotes = notes.map(note =>
-        note.id === id ? { ...note, ...updatedNote } : note
+        note.id === id ? { ...note, ...updatedNote, truncated: false } : note
       );
       setNotes(updatedNotes);
       setEditMode(false);
@@ -104,10 +114,28 @@ const Dashboard = ({ accessToken }) => {
     }
   };
 
-  const startEditNote = (note) => {
+  const startEditNote = async (note) => {
+    let fullDescription = note.description;
+    if (note.truncated) {
+      // Lists only carry a preview of large notes; edit the full text
+      try {
+        const response = await fetch(`http://localhost:8000/notes/${note.id}/body`, {
+          headers: {
+            Authorization: `Bearer ${accessToken}`,
+          },
+        });
+        if (!response.ok) {
+          throw new Error('Failed to fetch note body');
+        }
+        fullDescription = await response.text();
+      } catch (error) {
+        console.error('Fetch note body error:', error);
+        return;
+      }
+    }
     setSelectedNoteId(note.id);
     setTitle(note.title);
-    setDescription(note.description);
+    setDescription(fullDescription);
     setEditMode(true);
   };
 
@@ -144,7 +172,7 @@ const Dashboard = ({ accessToken }) => {
           {notes.map((note) => (
             <div key={note.id} className="note-item">
               <strong>{note.title}</strong>
-              <p>{note.description}</p>
+              <p>{note.description}{note.truncated ? '…' : ''}</p>
               <div>
                 <button className="btn btn-info" onClick={() => startEditNote(note)}>Update</button>
                 <button className="btn btn-danger" onClick={() => handleDeleteNote(note.id)}>Delete</button>
@@ -0,0 +1,67 @@
+import inspect
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from app.settings import Settings
+
+PASSWORD = "correct horse battery staple"
+
+TEST_SETTINGS = {
+    "secret_key": "tests-only-secret-key-0123456789abcdef",
+    "bcrypt_rounds": 4,
+    "rate_limit_enabled": False,
+    "change_streams_enabled": False,
+    "token_revocation_sync_seconds": 3600.0,
+    # Small enough that the body tests reach the inline and chunked layouts
+    "note_compress_threshold_bytes": 1024,
+    "note_inline_max_bytes": 2048,
+    "note_chunk_bytes": 1024,
+    "note_preview_chars": 200,
+}
+
+
+def build_app(storage_backend: str, **overrides):
+    # Environment variables are ignored so a developer's NOTES_* settings cannot leak in
+    settings = Settings(environ={}, **{**TEST_SETTINGS, **overrides})
+    repository = None
+    if storage_backend == "sqlite":
+        settings.storage_backend = "sqlite"
+        settings.sqlite_path = ":memory:"
+    else:
+        mongomock_motor = pytest.importorskip("mongomock_motor")
+        from app.repository import MongoRepository
+
+        settings.create_indexes_on_startup = False
+        repository = MongoRepository(settings, client=mongomock_motor.AsyncMongoMockClient(tz_aware=True))
+    return main.create_app(settings, repository)
+
+
+def mongomock_bulk_updates() -> bool:
+    # pymongo 4.9+ passes sort= to the bulk builder, which older mongomock releases reject
+    from mongomock.collection import BulkOperationBuilder
+
+    return "sort" in inspect.signature(BulkOperationBuilder.add_update).parameters
+
+
+@pytest.fixture(params=["sqlite", "mongodb"])
+def storage_backend(request):
+    return request.param
+
+
+@pytest.fixture
+def client(storage_backend):
+    with TestClient(build_app(storage_backend)) as test_client:
+        yield test_client
+
+
+def register(client, email: str = "ada@example.com") -> dict:
+    response = client.post("/register", json={"username": email.split("@")[0], "email": email, "password": PASSWORD})
+    assert response.status_code == 200, response.text
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+@pytest.fixture
+def auth(client):
+    return register(client)
@@ -0,0 +1,245 @@
+import random
+import string
+from concurrent.futures import ThreadPoolExecutor
+
+import jwt
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from app.settings import Settings
+from tests.conftest import PASSWORD, TEST_SETTINGS, build_app, mongomock_bulk_updates, register
+
+
+def create(client, auth, title="Groceries", description="milk, eggs"):
+    response = client.post("/notes/", json={"user_id": "ignored", "title": title, "description": description}, headers=auth)
+    assert response.status_code == 200, response.text
+    return response.json()["id"]
+
+
+def test_crud(client, auth):
+    note_id = create(client, auth)
+    response = client.get(f"/notes/{note_id}", headers=auth)
+    assert response.status_code == 200
+    assert response.json() == {"id": note_id, "title": "Groceries", "description": "milk, eggs", "user_id": "ada@example.com"}
+
+    response = client.put(f"/notes/{note_id}", json={"user_id": "ignored", "title": "Shopping", "description": "bread"}, headers=auth)
+    assert response.status_code == 200
+    assert client.get(f"/notes/{note_id}", headers=auth).json()["title"] == "Shopping"
+
+    assert client.delete(f"/notes/{note_id}", headers=auth).status_code == 200
+    assert client.get(f"/notes/{note_id}", headers=auth).status_code == 404
+    assert client.delete(f"/notes/{note_id}", headers=auth).status_code == 404
+
+
+def test_list_carries_last_modified(client, auth):
+    note_id = create(client, auth)
+    response = client.get("/notes/", headers=auth)
+    assert response.status_code == 200
+    assert [item["id"] for item in response.json()["items"]] == [note_id]
+    assert response.headers["Last-Modified"].endswith(" GMT")
+    response = client.get(f"/notes/{note_id}", headers=auth)
+    assert response.status_code == 200
+    assert response.headers["Last-Modified"].endswith(" GMT")
+
+
+def test_change_times_are_utc(client, auth):
+    create(client, auth)
+    change = client.get("/notes/changes", headers=auth).json()["changes"][0]
+    assert change["updated_at"].endswith("Z")
+
+
+def test_list_pages_and_conditional_get(client, auth):
+    ids = [create(client, auth, title=f"note {index}") for index in range(5)]
+    response = client.get("/notes/", params={"limit": 3}, headers=auth)
+    assert response.status_code == 200
+    page = response.json()
+    assert [item["id"] for item in page["items"]] == ids[:3]
+    assert response.headers["Last-Modified"].endswith("GMT")
+
+    response = client.get("/notes/", params={"limit": 3, "after": page["next_cursor"]}, headers=auth)
+    assert [item["id"] for item in response.json()["items"]] == ids[3:]
+    assert response.json().get("next_cursor") is None
+
+    etag = client.get("/notes/", headers=auth).headers["ETag"]
+    assert client.get("/notes/", headers={**auth, "If-None-Match": etag}).status_code == 304
+    create(client, auth)
+    assert client.get("/notes/", headers={**auth, "If-None-Match": etag}).status_code == 200
+
+
+def test_notes_are_private(client, auth):
+    note_id = create(client, auth)
+    other = register(client, "grace@example.com")
+    assert client.get(f"/notes/{note_id}", headers=other).status_code == 404
+    assert client.get("/notes/", headers=other).json()["items"] == []
+
+
+def test_if_match(client, auth):
+    note_id = create(client, auth)
+    etag = client.get(f"/notes/{note_id}", headers=auth).headers["ETag"]
+    update = {"user_id": "ignored", "title": "first", "description": "x"}
+    response = client.put(f"/notes/{note_id}", json=update, headers={**auth, "If-Match": etag})
+    assert response.status_code == 200
+    # The tag is now stale
+    response = client.put(f"/notes/{note_id}", json={**update, "title": "second"}, headers={**auth, "If-Match": etag})
+    assert response.status_code == 412
+    assert client.get(f"/notes/{note_id}", headers=auth).json()["title"] == "first"
+    response = client.put(f"/notes/{note_id}", json=update, headers={**auth, "If-Match": '"garbage'})
+    assert response.status_code == 412
+
+
+def create_batch(client, auth, count=3):
+    notes = [{"user_id": "ignored", "title": f"batch {index}", "description": "text"} for index in range(count)]
+    response = client.post("/notes/batch", json=notes, headers=auth)
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [result["status"] for result in results] == ["created"] * count
+    return [result["id"] for result in results]
+
+
+def test_batch_create_and_delete(client, auth):
+    ids = create_batch(client, auth)
+    response = client.request("DELETE", "/notes/batch", json=[ids[2], "bad-id", ids[0]], headers=auth)
+    assert [result["status"] for result in response.json()["results"]] == ["deleted", "error", "skipped"]
+    assert client.get(f"/notes/{ids[0]}", headers=auth).status_code == 200
+    assert client.get(f"/notes/{ids[2]}", headers=auth).status_code == 404
+
+    response = client.request("DELETE", "/notes/batch", json=[ids[2], ids[1]], params={"ordered": "false"}, headers=auth)
+    assert [result["status"] for result in response.json()["results"]] == ["not_found", "deleted"]
+
+
+def test_batch_update(client, auth, storage_backend):
+    if storage_backend == "mongodb" and not mongomock_bulk_updates():
+        pytest.skip("this mongomock cannot run pymongo's UpdateOne in bulk_write")
+    ids = create_batch(client, auth)
+    missing = "0" * 24
+    updates = [{"id": ids[0], "title": "renamed"}, {"id": missing, "title": "nope"}, {"id": ids[1], "title": "also"}]
+    response = client.patch("/notes/batch", json=updates, params={"ordered": "false"}, headers=auth)
+    assert [result["status"] for result in response.json()["results"]] == ["updated", "not_found", "updated"]
+    assert client.get(f"/notes/{ids[0]}", headers=auth).json()["title"] == "renamed"
+
+    response = client.patch("/notes/batch", json=updates, headers=auth)
+    assert [result["status"] for result in response.json()["results"]] == ["updated", "not_found", "skipped"]
+
+
+def test_changes_feed(client, auth):
+    first = create(client, auth, title="one")
+    second = create(client, auth, title="two")
+    client.put(f"/notes/{first}", json={"user_id": "ignored", "title": "one!", "description": "x"}, headers=auth)
+    client.delete(f"/notes/{second}", headers=auth)
+
+    feed = client.get("/notes/changes", headers=auth).json()
+    assert [(change["id"], change["op"]) for change in feed["changes"]] == [(first, "insert"), (second, "delete")]
+    assert feed["changes"][0]["note"]["title"] == "one!"
+    revisions = [change["revision"] for change in feed["changes"]]
+    assert revisions == sorted(revisions)
+    assert feed["revision"] == revisions[-1]
+
+    assert client.get("/notes/changes", params={"since": feed["revision"]}, headers=auth).json()["changes"] == []
+    third = create(client, auth, title="three")
+    feed = client.get("/notes/changes", params={"since": feed["revision"]}, headers=auth).json()
+    assert [change["id"] for change in feed["changes"]] == [third]
+
+
+def test_large_bodies_stream_in_full(client, auth):
+    rng = random.Random(7)
+    for size in (1500, 20000):
+        # Random text so the compressed body stays large enough to be chunked
+        text = "".join(rng.choice(string.ascii_letters + " ") for _ in range(size))
+        note_id = create(client, auth, description=text)
+        listed = client.get("/notes/", headers=auth).json()["items"][-1]
+        assert listed["truncated"] is True
+        assert len(listed["description"]) == 200
+        assert client.get(f"/notes/{note_id}", headers=auth).json()["description"] == text
+        response = client.get(f"/notes/{note_id}/body", headers=auth)
+        assert response.status_code == 200
+        assert response.text == text
+
+
+def test_failed_writes_keep_list_etag(client, auth):
+    note_id = create(client, auth)
+    etag = client.get("/notes/", headers=auth).headers["ETag"]
+    update = {"user_id": "ignored", "title": "x", "description": "y"}
+    assert client.put(f"/notes/{note_id}", json=update, headers={**auth, "If-Match": '"99"'}).status_code == 412
+    assert client.put(f"/notes/{'0' * 24}", json=update, headers=auth).status_code == 404
+    assert client.get("/notes/", headers={**auth, "If-None-Match": etag}).status_code == 304
+
+
+def test_search_covers_large_bodies(client, auth, storage_backend):
+    if storage_backend == "mongodb":
+        pytest.skip("mongomock does not implement $text")
+    # Far past the 200-character preview the fixture configures
+    description = "filler " * 1000 + "zanzibar"
+    note_id = create(client, auth, title="Trip", description=description)
+    response = client.get("/notes/search", params={"q": "zanzibar"}, headers=auth)
+    assert [hit["id"] for hit in response.json()["items"]] == [note_id]
+    # Replacing the body drops the old text from the index
+    client.put(f"/notes/{note_id}", json={"user_id": "ignored", "title": "Trip", "description": "short"}, headers=auth)
+    assert client.get("/notes/search", params={"q": "zanzibar"}, headers=auth).json()["items"] == []
+    export = client.get("/notes/export", headers=auth).text
+    assert "search_text" not in export
+
+
+@pytest.mark.parametrize("cache_enabled", [True, False])
+def test_lists_are_validated_unless_fast_serialization(storage_backend, cache_enabled, monkeypatch):
+    def fast_encoder(*args):
+        raise AssertionError("fast_serialization is off")
+
+    monkeypatch.setattr(main, "note_page", fast_encoder)
+    with TestClient(build_app(storage_backend, notes_cache_enabled=cache_enabled)) as client:
+        auth = register(client)
+        create(client, auth, description="x" * 1500)
+        first = client.get("/notes/", headers=auth)
+        assert first.status_code == 200
+        assert first.json()["items"][0]["truncated"] is True
+        # Served from the cache when it is on
+        assert client.get("/notes/", headers=auth).content == first.content
+
+
+def test_internal_stats_are_off_by_default(client):
+    assert client.get("/internal/stats").status_code == 404
+    with TestClient(build_app("sqlite", internal_stats_enabled=True)) as internal:
+        assert "user_cache" in internal.get("/internal/stats").json()
+
+
+def test_default_secret_key_is_refused():
+    with pytest.raises(ValueError):
+        build_app("sqlite", secret_key=Settings.secret_key)
+    # Unused once signing keys replace it
+    build_app("sqlite", secret_key=Settings.secret_key, signing_keys=("k1:" + "k" * 32,))
+
+
+def test_kid_less_tokens_are_rejected_with_signing_keys(storage_backend):
+    keys = {"signing_keys": ("k1:" + "k" * 32,)}
+    with TestClient(build_app(storage_backend, **keys)) as client:
+        auth = register(client)
+        assert client.get("/notes/", headers=auth).status_code == 200
+        forged = jwt.encode({"sub": "ada@example.com", "exp": 9999999999}, TEST_SETTINGS["secret_key"], algorithm="HS256")
+        assert client.get("/notes/", headers={"Authorization": f"Bearer {forged}"}).status_code == 401
+
+
+def test_refresh_tokens_are_single_use(client):
+    tokens = client.post("/register", json={"username": "ada", "email": "ada@example.com", "password": PASSWORD}).json()
+    refresh = {"refresh_token": tokens["refresh_token"]}
+    with ThreadPoolExecutor(max_workers=5) as pool:
+        responses = list(pool.map(lambda _: client.post("/token/refresh", json=refresh), range(5)))
+    assert sorted(response.status_code for response in responses) == [200, 401, 401, 401, 401]
+    assert client.post("/token/refresh", json=refresh).status_code == 401
+
+
+def test_request_bodies_are_capped_before_parsing(storage_backend):
+    caps = {"note_max_request_bytes": 4096, "batch_max_request_bytes": 16384}
+    with TestClient(build_app(storage_backend, **caps)) as client:
+        auth = register(client)
+        note = {"user_id": "ignored", "title": "big", "description": "x" * 5000}
+        assert client.post("/notes/", json=note, headers=auth).status_code == 413
+        # Without a Content-Length the body is counted as it streams in
+        chunks = iter([b'{"user_id": "ignored", "title": "big", "description": "', b"x" * 5000, b'"}'])
+        streamed = client.post("/notes/", content=chunks, headers={**auth, "Content-Type": "application/json"})
+        assert streamed.status_code == 413
+        assert client.post("/notes/batch", json=[note, note], headers=auth).status_code == 200
+        assert client.post("/notes/batch", json=[note] * 4, headers=auth).status_code == 413
+
+
+def test_note_body_of_malformed_id_is_not_found(client, auth):
+    assert client.get("/notes/not-an-id/body", headers=auth).status_code == 404
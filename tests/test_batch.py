@@ -0,0 +1,55 @@
+from bson import ObjectId
+
+from app.batch import apply_write_errors, mark_unmatched, mark_written, new_results, owned_targets, parse_ids
+
+
+def statuses(results):
+    return [result["status"] for result in results]
+
+
+def test_apply_write_errors_unordered_marks_only_failed_items():
+    results = new_results(3)
+    apply_write_errors(results, [0, 1, 2], {"writeErrors": [{"index": 1, "errmsg": "boom"}]}, False, "created")
+    assert statuses(results) == ["created", "error", "created"]
+    assert results[1]["error"] == "boom"
+
+
+def test_apply_write_errors_ordered_skips_after_first_failure():
+    results = new_results(4)
+    apply_write_errors(results, [0, 1, 2, 3], {"writeErrors": [{"index": 1, "errmsg": "boom"}]}, True, "created")
+    assert statuses(results) == ["created", "error", "skipped", "skipped"]
+
+
+def test_apply_write_errors_maps_ops_back_to_items():
+    # Item 1 never became an operation (e.g. it failed validation)
+    results = new_results(3)
+    results[1]["status"] = "error"
+    apply_write_errors(results, [0, 2], {"writeErrors": [{"index": 1, "errmsg": "boom"}]}, False, "updated")
+    assert statuses(results) == ["updated", "error", "error"]
+    assert results[2]["error"] == "boom"
+
+
+def test_owned_targets_reports_missing_ids():
+    owned_id, other_id = ObjectId(), ObjectId()
+    results = new_results(3)
+    parsed = parse_ids(results, [str(owned_id), "not-an-id", str(other_id)])
+    targets = owned_targets(results, parsed, [owned_id], ordered=False)
+    assert targets == [(0, owned_id)]
+    assert statuses(results) == ["pending", "error", "not_found"]
+
+
+def test_owned_targets_ordered_stops_at_first_failure():
+    first, second, third = ObjectId(), ObjectId(), ObjectId()
+    results = new_results(3)
+    parsed = parse_ids(results, [str(first), str(second), str(third)])
+    targets = owned_targets(results, parsed, [first, third], ordered=True)
+    assert targets == [(0, first)]
+    assert statuses(results) == ["pending", "not_found", "skipped"]
+
+
+def test_mark_unmatched_reports_notes_deleted_before_the_write():
+    kept, deleted = ObjectId(), ObjectId()
+    results = new_results(2)
+    mark_written(results, [0, 1], "updated")
+    mark_unmatched(results, [(0, kept), (1, deleted)], [kept], "updated")
+    assert statuses(results) == ["updated", "not_found"]
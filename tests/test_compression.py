@@ -0,0 +1,30 @@
+from app import compression
+from app.compression import choose_encoding, compressible
+
+
+def test_choose_encoding_without_header():
+    assert choose_encoding(None) is None
+    assert choose_encoding("") is None
+    assert choose_encoding("identity") is None
+
+
+def test_choose_encoding_respects_q_values():
+    assert choose_encoding("gzip") == "gzip"
+    assert choose_encoding("gzip;q=0") is None
+    assert choose_encoding("*;q=0.5") in ("br", "gzip")
+    assert choose_encoding("*, gzip;q=0") == ("br" if compression.brotli is not None else None)
+
+
+def test_choose_encoding_prefers_brotli_when_available(monkeypatch):
+    monkeypatch.setattr(compression, "brotli", object())
+    assert choose_encoding("gzip, br") == "br"
+    assert choose_encoding("gzip, br;q=0.5") == "gzip"
+    monkeypatch.setattr(compression, "brotli", None)
+    assert choose_encoding("gzip, br") == "gzip"
+
+
+def test_compressible():
+    assert compressible("application/json")
+    assert compressible("text/plain; charset=utf-8")
+    assert not compressible("text/event-stream")
+    assert not compressible("image/png")
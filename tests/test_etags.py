@@ -0,0 +1,47 @@
+from datetime import datetime, timedelta, timezone
+
+from bson.tz_util import FixedOffset, utc
+
+import pytest
+from fastapi import HTTPException
+
+from app.etags import etag_matches, http_date, list_etag, note_etag, parse_if_match, parse_note_etag
+
+
+def test_note_etag_round_trip():
+    assert parse_note_etag(note_etag({"version": 3}, 7)) == (3, 7)
+    assert parse_note_etag(note_etag({"version": 3})) == (3, None)
+    assert parse_note_etag('W/"4.9"') == (4, 9)
+    assert parse_note_etag('"abc"') is None
+
+
+def test_parse_if_match():
+    assert parse_if_match(None) is None
+    assert parse_if_match("*") is None
+    assert parse_if_match('"5.12"') == 5
+    with pytest.raises(HTTPException) as error:
+        parse_if_match('"nope"')
+    assert error.value.status_code == 412
+
+
+def test_etag_matches_uses_weak_comparison():
+    etag = list_etag("a@example.com", 3, "limit=10")
+    assert etag_matches(f'W/{etag}', etag)
+    assert etag_matches(f'"other", {etag}', etag)
+    assert etag_matches("*", etag)
+    assert not etag_matches('"other"', etag)
+    assert not etag_matches(None, etag)
+
+
+def test_list_etag_depends_on_version_and_params():
+    etag = list_etag("a@example.com", 3, "limit=10")
+    assert etag != list_etag("a@example.com", 4, "limit=10")
+    assert etag != list_etag("a@example.com", 3, "limit=20")
+
+
+def test_http_date():
+    assert http_date(datetime(2024, 1, 2, 3, 4, 5, tzinfo=timezone.utc)) == "Tue, 02 Jan 2024 03:04:05 GMT"
+    assert http_date(datetime(2024, 1, 2, 3, 4, 5)) == "Tue, 02 Jan 2024 03:04:05 GMT"
+    assert http_date(datetime(2024, 1, 2, 3, 4, 5, tzinfo=utc)) == "Tue, 02 Jan 2024 03:04:05 GMT"
+    assert http_date(datetime(2024, 1, 2, 5, 4, 5, tzinfo=FixedOffset(timedelta(hours=2), "+02"))) == "Tue, 02 Jan 2024 03:04:05 GMT"
+    assert http_date(None) is None
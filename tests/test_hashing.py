@@ -0,0 +1,36 @@
+import asyncio
+
+from app.hashing import HasherSaturated, PasswordHasher
+
+
+def test_verify_and_update_rehashes_outdated_costs():
+    async def check():
+        old = PasswordHasher(rounds=4)
+        current = PasswordHasher(rounds=5)
+        try:
+            hashed = await old.hash("secret")
+            assert await current.verify_and_update("wrong", hashed) == (False, None)
+            valid, new_hash = await current.verify_and_update("secret", hashed)
+            assert valid and new_hash
+            assert await current.verify_and_update("secret", new_hash) == (True, None)
+            assert current.stats()["rehashed"] == 1
+        finally:
+            old.shutdown()
+            current.shutdown()
+
+    asyncio.run(check())
+
+
+def test_saturated_hasher_rejects_work():
+    async def check():
+        hasher = PasswordHasher(rounds=4, max_workers=1, max_queue=0)
+        try:
+            results = await asyncio.gather(hasher.hash("a"), hasher.hash("b"), return_exceptions=True)
+            assert isinstance(results[0], str)
+            assert isinstance(results[1], HasherSaturated)
+            assert results[1].status_code == 429
+            assert hasher.stats()["rejected"] == 1
+        finally:
+            hasher.shutdown()
+
+    asyncio.run(check())
@@ -0,0 +1,32 @@
+import asyncio
+import os
+import uuid
+
+import pytest
+
+from app.indexes import ensure_indexes, find_collscans
+
+MONGODB_URL = os.environ.get("MONGODB_URL", "mongodb://localhost:27017")
+
+
+def test_hot_queries_use_indexes():
+    motor = pytest.importorskip("motor.motor_asyncio")
+
+    async def check():
+        client = motor.AsyncIOMotorClient(MONGODB_URL, serverSelectionTimeoutMS=1000)
+        try:
+            try:
+                await client.admin.command("ping")
+            except Exception:
+                pytest.skip(f"no mongod reachable at {MONGODB_URL}")
+            database = f"notes_explain_{uuid.uuid4().hex[:8]}"
+            try:
+                db = client[database]
+                await ensure_indexes(db)
+                return await find_collscans(db)
+            finally:
+                await client.drop_database(database)
+        finally:
+            client.close()
+
+    assert asyncio.run(check()) == []
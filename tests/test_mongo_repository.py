@@ -0,0 +1,124 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.repository import MongoRepository
+from app.settings import Settings
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+USER = "ada@example.com"
+
+
+def run(test):
+    async def body():
+        repository = MongoRepository(Settings(environ={}), client=mongomock_motor.AsyncMongoMockClient(tz_aware=True))
+        await test(repository)
+
+    asyncio.run(body())
+
+
+def revisions(changes):
+    return [change["revision"] for change in changes]
+
+
+def test_feed_stops_below_writes_in_flight():
+    async def test(repository):
+        await repository.create_note({"user_id": USER, "title": "one", "description": "a"})
+        # A write that has reserved its revision but not landed yet
+        in_flight = await repository._reserve_revisions(USER, 1)
+        await repository.create_note({"user_id": USER, "title": "three", "description": "c"})
+        changes, _ = await repository.list_changes(USER, 0, 10)
+        assert revisions(changes) == [1]
+
+        await repository._release_revisions(USER, in_flight, False)
+        changes, _ = await repository.list_changes(USER, 0, 10)
+        assert revisions(changes) == [1, 3]
+
+    run(test)
+
+
+def test_abandoned_reservations_expire():
+    async def test(repository):
+        await repository._reserve_revisions(USER, 1)
+        await repository.create_note({"user_id": USER, "title": "two", "description": "b"})
+        assert revisions((await repository.list_changes(USER, 0, 10))[0]) == []
+        stale = datetime.now(timezone.utc) - timedelta(seconds=repository.settings.revision_lease_seconds + 1)
+        await repository.notes_meta_collection.update_one({"_id": USER}, {"$set": {"pending.0.at": stale}})
+        assert revisions((await repository.list_changes(USER, 0, 10))[0]) == [2]
+        # The next reservation drops the expired entry
+        await repository.create_note({"user_id": USER, "title": "three", "description": "c"})
+        meta = await repository.notes_meta_collection.find_one({"_id": USER})
+        assert meta["pending"] == []
+
+    run(test)
+
+
+def test_only_writes_that_land_change_the_version():
+    async def test(repository):
+        note_id = await repository.create_note({"user_id": USER, "title": "one", "description": "a"})
+        version, updated_at = await repository.get_notes_version(USER)
+        assert await repository.update_note(note_id, USER, {"title": "x"}, expected_version=7) is None
+        assert await repository.update_note("0" * 24, USER, {"title": "x"}) is None
+        assert await repository.get_notes_version(USER) == (version, updated_at)
+        assert await repository.update_note(note_id, USER, {"title": "x"}) is not None
+        assert (await repository.get_notes_version(USER))[0] == version + 1
+
+    run(test)
+
+
+def test_revisions_continue_from_legacy_version():
+    async def test(repository):
+        # Meta written while the version doubled as the revision
+        await repository.notes_meta_collection.insert_one({"_id": USER, "version": 41})
+        await repository.create_note({"user_id": USER, "title": "one", "description": "a"})
+        changes, _ = await repository.list_changes(USER, 41, 10)
+        assert revisions(changes) == [42]
+        assert (await repository.get_notes_version(USER))[0] == 42
+
+    run(test)
+
+
+def test_ensure_indexes_replaces_the_old_text_indexes():
+    async def test(repository):
+        await repository.notes_collection.create_index([("title", "text"), ("description", "text")], name="notes_text")
+        await repository.ensure_indexes()
+        names = set(await repository.notes_collection.index_information())
+        assert "notes_text" not in names
+        assert "user_id_notes_text" in names
+        await repository.notes_collection.drop_index("user_id_notes_text")
+        await repository.notes_collection.create_index([("title", "text"), ("search_text", "text")], name="notes_text_full")
+        await repository.ensure_indexes()
+        names = set(await repository.notes_collection.index_information())
+        assert "notes_text_full" not in names
+        assert "user_id_notes_text" in names
+
+    run(test)
+
+
+def test_racing_batch_deletes_report_each_note_once():
+    async def test(repository):
+        await repository.ensure_indexes()
+        entry_id = await repository.create_note({"user_id": USER, "title": "one", "description": "a"})
+        published = []
+        repository._publish = lambda user_id, event: published.append(event)
+        # Both deletes resolve the note before either removes it
+        resolve, resolved = repository._batch_targets, []
+        both_resolved = asyncio.Event()
+
+        async def batch_targets(*args):
+            targets = await resolve(*args)
+            resolved.append(targets)
+            if len(resolved) == 2:
+                both_resolved.set()
+            await both_resolved.wait()
+            return targets
+
+        repository._batch_targets = batch_targets
+        results = await asyncio.gather(*[repository.delete_notes(USER, [entry_id]) for _ in range(2)])
+        assert sorted(result[0]["status"] for result in results) == ["deleted", "not_found"]
+        assert await repository.tombstones_collection.count_documents({"user_id": USER}) == 1
+        assert len(published) == 1
+
+    run(test)
@@ -0,0 +1,50 @@
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException
+
+from app.pagination import decode_cursor, encode_cursor, finish_page, page_filter, page_projection, page_size
+
+
+def test_cursor_round_trip():
+    oid = ObjectId()
+    cursor = encode_cursor(oid)
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == oid
+    assert decode_cursor(encode_cursor(str(oid))) == oid
+
+
+@pytest.mark.parametrize("cursor", ["", "!!!", "YWJj"])
+def test_invalid_cursor_is_a_bad_request(cursor):
+    with pytest.raises(HTTPException) as error:
+        decode_cursor(cursor)
+    assert error.value.status_code == 400
+
+
+def test_page_filter():
+    oid = ObjectId()
+    assert page_filter({"user_id": "a"}, None) == {"user_id": "a"}
+    assert page_filter({"user_id": "a"}, encode_cursor(oid)) == {"user_id": "a", "_id": {"$gt": oid}}
+
+
+def test_page_size():
+    assert page_size(None) == 100
+    assert page_size(0) == 100
+    assert page_size(10) == 10
+    assert page_size(5000) == 1000
+
+
+def test_finish_page():
+    documents = [{"_id": ObjectId()} for _ in range(4)]
+    page, cursor = finish_page(list(documents), 3)
+    assert page == documents[:3]
+    assert decode_cursor(cursor) == documents[2]["_id"]
+    assert finish_page(documents[:2], 3) == (documents[:2], None)
+
+
+def test_page_projection():
+    assert page_projection(None) is None
+    assert page_projection("title") == {"_id": 1, "user_id": 1, "title": 1}
+    assert page_projection(None, preview=5)["description"] == {"$substrCP": ["$description", 0, 5]}
+    for unknown in ("secret", "content"):
+        with pytest.raises(HTTPException):
+            page_projection(unknown)
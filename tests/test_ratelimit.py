@@ -0,0 +1,86 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app import ratelimit
+from app.ratelimit import MemoryRateLimitStore, RateLimitMiddleware
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_bucket_allows_burst_then_refills(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(ratelimit.time, "monotonic", clock)
+    store = MemoryRateLimitStore()
+    assert [store.consume_sync("ip:1", rate=1.0, capacity=3) for _ in range(3)] == [0, 0, 0]
+    assert store.consume_sync("ip:1", rate=1.0, capacity=3) == 1.0
+    clock.now += 1.0
+    assert store.consume_sync("ip:1", rate=1.0, capacity=3) == 0
+
+
+def test_buckets_are_per_key(monkeypatch):
+    monkeypatch.setattr(ratelimit.time, "monotonic", FakeClock())
+    store = MemoryRateLimitStore()
+    assert store.consume_sync("ip:1", rate=1.0, capacity=1) == 0
+    assert store.consume_sync("ip:1", rate=1.0, capacity=1) > 0
+    assert store.consume_sync("ip:2", rate=1.0, capacity=1) == 0
+
+
+def test_least_recently_used_buckets_are_dropped(monkeypatch):
+    monkeypatch.setattr(ratelimit.time, "monotonic", FakeClock())
+    store = MemoryRateLimitStore(shards=1, max_keys_per_shard=2)
+    store.consume_sync("a", rate=1.0, capacity=1)
+    store.consume_sync("b", rate=1.0, capacity=1)
+    store.consume_sync("c", rate=1.0, capacity=1)
+    # "a" was evicted, so it starts again from a full bucket
+    assert store.consume_sync("a", rate=1.0, capacity=1) == 0
+    assert store.consume_sync("c", rate=1.0, capacity=1) > 0
+
+
+def limited_client(**options):
+    application = FastAPI()
+
+    @application.post("/login")
+    @application.post("/token")
+    async def accept():
+        return {}
+
+    options = {"ip_rate": (0.001, 2), "account_rate": (0.001, 100), **options}
+    application.add_middleware(RateLimitMiddleware, store=MemoryRateLimitStore(), paths=["/login", "/token"], **options)
+    return TestClient(application)
+
+
+def test_ip_bucket_is_shared_across_paths():
+    client = limited_client()
+    assert client.post("/login", json={}).status_code == 200
+    assert client.post("/token", json={}).status_code == 200
+    assert client.post("/login", json={}).status_code == 429
+
+
+def test_multipart_forms_use_the_account_bucket():
+    client = limited_client(ip_rate=(0.001, 100), account_rate=(0.001, 1))
+    form = {"username": (None, "Ada@example.com"), "password": (None, "secret")}
+    assert client.post("/token", files=form).status_code == 200
+    assert client.post("/token", data={"username": "ada@example.com", "password": "x"}).status_code == 429
+
+
+def test_oversized_credential_bodies_are_refused():
+    client = limited_client(ip_rate=(0.001, 100))
+    padded = {"email": "ada@example.com", "padding": "x" * ratelimit.MAX_BODY_BYTES}
+    assert client.post("/login", json=padded).status_code == 413
+
+
+def test_client_ip_is_the_rightmost_untrusted_hop():
+    client = limited_client(trust_forwarded_for=True)
+    spoofed = ["10.0.0.%d, 203.0.113.7" % index for index in range(3)]
+    statuses = [client.post("/login", json={}, headers={"X-Forwarded-For": value}).status_code for value in spoofed]
+    assert statuses == [200, 200, 429]
+    middleware = RateLimitMiddleware(None, MemoryRateLimitStore(), [], (1, 1), (1, 1), trust_forwarded_for=True, proxy_hops=2)
+    scope = {"client": ("192.0.2.1", 0), "headers": [(b"x-forwarded-for", b"1.1.1.1, 203.0.113.7"), (b"x-forwarded-for", b"198.51.100.2")]}
+    assert middleware._client_ip(scope) == "203.0.113.7"
+    assert middleware._client_ip({**scope, "headers": []}) == "192.0.2.1"
@@ -0,0 +1,42 @@
+import asyncio
+import sqlite3
+
+from app.settings import Settings
+from app.sqlite_repository import SQLiteRepository
+
+USER = "ada@example.com"
+
+# The notes table and full-text index as they were before search_text existed
+OLD_SCHEMA = """
+CREATE TABLE notes (
+    id TEXT PRIMARY KEY, user_id TEXT NOT NULL, title TEXT, description TEXT,
+    version INTEGER NOT NULL DEFAULT 1, revision INTEGER NOT NULL, created_revision INTEGER NOT NULL, updated_at TEXT,
+    body_id TEXT, body_codec TEXT, body_size INTEGER, body_chars INTEGER, body_data BLOB, body_chunks INTEGER
+);
+CREATE VIRTUAL TABLE notes_fts USING fts5(title, description, content='notes', content_rowid='rowid');
+CREATE TRIGGER notes_fts_insert AFTER INSERT ON notes BEGIN
+    INSERT INTO notes_fts (rowid, title, description) VALUES (new.rowid, new.title, new.description);
+END;
+INSERT INTO notes (id, user_id, title, description, version, revision, created_revision)
+    VALUES ('6500000000000000000000aa', 'ada@example.com', 'Old', 'kept from before', 1, 1, 1);
+"""
+
+
+def test_existing_database_gains_search_text(tmp_path):
+    path = str(tmp_path / "notes.db")
+    connection = sqlite3.connect(path)
+    connection.executescript(OLD_SCHEMA)
+    connection.close()
+
+    async def check():
+        settings = Settings(environ={}, storage_backend="sqlite", sqlite_path=path, note_compress_threshold_bytes=1024, note_preview_chars=100)
+        repository = SQLiteRepository(settings)
+        await repository.connect()
+        try:
+            assert [hit["title"] for hit in await repository.search_notes(USER, "before", 10)] == ["Old"]
+            await repository.create_note({"user_id": USER, "title": "New", "description": "x " * 1000 + "zanzibar"})
+            assert [hit["title"] for hit in await repository.search_notes(USER, "zanzibar", 10)] == ["New"]
+        finally:
+            await repository.close()
+
+    asyncio.run(check())
@@ -0,0 +1,77 @@
+from datetime import timedelta
+
+import jwt
+import pytest
+from jwt import InvalidTokenError
+
+from app.tokens import ACCESS, REFRESH, TokenService, parse_deadline, parse_signing_keys
+
+KEYS = {kid: f"{kid}-secret".ljust(32, "x") for kid in ("k1", "k2", "k3")}
+LEGACY = "legacy".ljust(32, "x")
+
+
+def service(**kwargs):
+    options = {"legacy_secret": LEGACY}
+    options.update(kwargs)
+    keys = options.pop("keys", {"k1": KEYS["k1"], "k2": KEYS["k2"]})
+    return TokenService(keys, options.pop("active_kid", "k2"), **options)
+
+
+def test_parse_signing_keys():
+    assert parse_signing_keys(("k1:one", " k2 : two "), "fallback") == {"k1": "one", "k2": "two"}
+    assert parse_signing_keys((), "fallback") == {"default": "fallback"}
+    with pytest.raises(ValueError):
+        parse_signing_keys(("missing-secret",), "fallback")
+
+
+def test_unknown_active_kid_is_rejected():
+    with pytest.raises(ValueError):
+        TokenService({"k1": "secret"}, "k2")
+
+
+def test_tokens_carry_active_kid_and_verify_after_rotation():
+    old = service(active_kid="k1")
+    token = old.issue({"sub": "a@example.com"})
+    assert jwt.get_unverified_header(token)["kid"] == "k1"
+    rotated = service(active_kid="k2")
+    assert rotated.verify(token)["sub"] == "a@example.com"
+
+
+def test_unknown_kid_is_rejected():
+    token = service(keys={"k3": KEYS["k3"]}, active_kid="k3").issue({"sub": "a@example.com"})
+    with pytest.raises(InvalidTokenError):
+        service().verify(token)
+
+
+def test_legacy_tokens_without_kid_or_type():
+    token = jwt.encode({"sub": "a@example.com", "exp": 9999999999}, LEGACY, algorithm="HS256")
+    assert service().verify(token)["sub"] == "a@example.com"
+    with pytest.raises(InvalidTokenError):
+        service(legacy_secret=None).verify(token)
+
+
+def test_legacy_tokens_stop_verifying_after_deadline():
+    token = jwt.encode({"sub": "a@example.com", "exp": 9999999999}, LEGACY, algorithm="HS256")
+    assert service(legacy_until=parse_deadline("2999-01-01T00:00:00"), cache_size=0).verify(token)
+    with pytest.raises(InvalidTokenError):
+        service(legacy_until=parse_deadline("2000-01-01T00:00:00+00:00"), cache_size=0).verify(token)
+
+
+@pytest.mark.parametrize("cache_size", [0, 100])
+def test_token_type_is_enforced(cache_size):
+    tokens = service(cache_size=cache_size)
+    access, refresh = tokens.issue_pair({"sub": "a@example.com"})
+    assert tokens.verify(access, ACCESS)["type"] == ACCESS
+    assert tokens.verify(refresh, REFRESH)["type"] == REFRESH
+    # Second calls hit the claims cache when it is enabled
+    with pytest.raises(InvalidTokenError):
+        tokens.verify(refresh, ACCESS)
+    with pytest.raises(InvalidTokenError):
+        tokens.verify(access, REFRESH)
+
+
+def test_expired_tokens_are_rejected():
+    tokens = service(access_ttl=timedelta(seconds=-1), cache_size=0)
+    token = tokens.issue({"sub": "a@example.com"})
+    with pytest.raises(jwt.ExpiredSignatureError):
+        tokens.verify(token)